@@ -0,0 +1,411 @@
+"""
+In-process catalog snapshot.
+
+POST /recommend needs every product (plus its category name) on every call.
+Rather than running two full-table queries per request, the catalog is
+loaded once into a snapshot shared by all request handlers of this process.
+
+Each load gets a new, monotonically increasing version number, so anything
+derived from a snapshot (scores, solver models, cached results) can key on
+it. CATALOG_TTL_SECONDS bounds how long a snapshot is trusted, which is
+what picks up writes handled by *other* uvicorn workers.
+
+Change feed
+-----------
+Write routes describe what they changed with record_change(): the products
+written (as ProductRow records) and the ids deleted. Each change gets the
+next version and is kept in a short log (changes_since()). The current
+snapshot is rolled forward in place of a reload: its columns are rebuilt
+from the previous ones touching only the changed rows, the changed rows are
+merged into each precomputed ranking, and the LP model is edited in place
+(see ProductColumns.apply, apply_rankings and BudgetModel.apply). Worker
+pools replay the log in their processes (see workers.py). Writes
+whose rows aren't known individually (bulk ingest) call invalidate_catalog()
+instead, which drops the snapshot and the log; the next reader reloads.
+
+Shared catalog file
+-------------------
+With CATALOG_FILE set, every snapshot loaded from the database is also
+written to that file (see catalog_file.py), and a process that needs a
+snapshot maps the file instead of querying while it is fresh (younger than
+CATALOG_TTL_SECONDS). Snapshots then hold no per-product objects until
+rows are read (recorded changes are layered over the mapped rows, see
+columnar.EditedProducts), and the file's pages are shared by all workers. A snapshot
+stays current only while the file it came from, and its delta file, are
+still in place: a worker that records a change writes the edits since the
+file was written to the delta file (rewriting the file itself once there
+are more than CATALOG_DELTA_MAX_ROWS of them; both are atomic renames),
+which the other workers notice on their next get_catalog() and map; an
+invalidation deletes it, so they reload from the database. Recording a
+change holds a lock on the file and first maps the current file if this
+worker's snapshot is behind (or it has none), so each worker's change is
+applied on top of the others'; with no current file to map, the change
+removes it instead, and every worker reloads. A rewritten file keeps the time of the load it descends
+from: CATALOG_TTL_SECONDS after that, it is reloaded from the database.
+"""
+import asyncio
+import contextlib
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import NamedTuple
+
+from . import catalog_file
+from .catalog_file import CATALOG_FILE
+from .columnar import ProductColumns
+from .queries import load_product_rows
+from .recommendation import LP_AVAILABLE, LP_SHARED_MODEL, apply_rankings, precompute_rankings
+
+# Seconds a snapshot stays fresh. 0 disables expiry (reload only on writes).
+CATALOG_TTL_SECONDS = float(os.getenv("CATALOG_TTL_SECONDS", "300"))
+# Changes kept for changes_since()
+CHANGE_LOG_SIZE = int(os.getenv("CHANGE_LOG_SIZE", "1000"))
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogChange(NamedTuple):
+    version: int
+    upserts: tuple   # ProductRow records, new or replacing the same id
+    deletes: tuple   # deleted product ids
+
+
+class CatalogSnapshot:
+    """Read-only view of the products/categories tables at one version."""
+
+    def __init__(self, version: int, products):
+        self.version = version
+        self.products = tuple(products)
+        self.loaded_at = time.monotonic()
+        self._columns = None
+        self._lp_model = None
+        self._lp_model_lock = threading.Lock()
+        # The CatalogFile this snapshot maps, if any, the edits made since
+        # (a CatalogDelta), and the identity of the shared file and delta
+        # file it matches (see is_fresh())
+        self.catalog_file = None
+        self.delta = None
+        self.file_path = None
+        self.file_id = None
+        self.delta_id = None
+
+    @classmethod
+    def from_file(cls, version: int, mapped, delta=None) -> "CatalogSnapshot":
+        """
+        Snapshot over a mapped CatalogFile, with `delta` (a CatalogDelta
+        read from its delta file) applied; rows are read on demand.
+        """
+        snapshot = cls(version, ())
+        snapshot.products = mapped.products
+        snapshot.loaded_at = time.monotonic() - mapped.age()  # TTL counts from the write
+        snapshot.catalog_file = mapped
+        snapshot.delta = delta if delta is not None else catalog_file.CatalogDelta(mapped.file_id)
+        snapshot.file_path = mapped.path
+        snapshot.file_id = mapped.file_id
+        snapshot.delta_id = snapshot.delta.file_id
+        if snapshot.delta:
+            columns = snapshot.delta.apply(mapped.columns())
+            precompute_rankings(columns)
+            snapshot._columns = columns
+            snapshot.products = columns.products
+        return snapshot
+
+    def __len__(self):
+        return len(self.products)
+
+    @property
+    def columns(self) -> ProductColumns:
+        """
+        Columnar view used by the recommendation engine, built on first use
+        with every condition's ranking precomputed.
+        """
+        if self._columns is None:
+            if self.catalog_file is not None:
+                columns = self.catalog_file.columns()
+            else:
+                columns = ProductColumns(self.products)
+            precompute_rankings(columns)
+            self._columns = columns
+        return self._columns
+
+    @property
+    def lp_model(self):
+        """
+        Reusable BudgetModel for this version, or None unless LP_SHARED_MODEL
+        is set (and PuLP installed); LP solves then build a fresh problem.
+
+        Over a mapped catalog file the model grows with the products LP
+        requests rank, instead of reading every row up front.
+        """
+        if self._lp_model is None and LP_AVAILABLE and LP_SHARED_MODEL:
+            from .lp_optimizer import BudgetModel  # imports PuLP on first use
+
+            with self._lp_model_lock:
+                if self._lp_model is None:
+                    if self.catalog_file is not None:
+                        self._lp_model = BudgetModel(grow=True)
+                    else:
+                        self._lp_model = BudgetModel(self.products)
+        return self._lp_model
+
+    def apply(self, change: CatalogChange) -> "CatalogSnapshot":
+        """The snapshot after `change`, derived from this one."""
+        columns = self.columns.apply(change.upserts, change.deletes)
+        apply_rankings(self.columns, columns, change.upserts, change.deletes)
+        precompute_rankings(columns)  # at write time, not on the next request
+        snapshot = CatalogSnapshot(change.version, ())
+        snapshot.products = columns.products  # lazy if this snapshot's are
+        snapshot.loaded_at = self.loaded_at  # the TTL still counts from the load
+        snapshot._columns = columns
+        if self.delta is not None:
+            # same file underneath, one more edit on top (see _publish())
+            snapshot.catalog_file = self.catalog_file
+            snapshot.delta = self.delta.add(change.upserts, change.deletes)
+        model = self._lp_model
+        if model is not None:
+            with model.lock:
+                model.apply(change.upserts, change.deletes)
+            snapshot._lp_model = model
+        return snapshot
+
+    def is_fresh(self) -> bool:
+        if self.file_id is not None and (
+            catalog_file.file_id(self.file_path) != self.file_id
+            or catalog_file.file_id(catalog_file.delta_path(self.file_path)) != self.delta_id
+        ):
+            return False  # the shared file (or its delta) was replaced or removed
+        if CATALOG_TTL_SECONDS <= 0:
+            return True
+        return time.monotonic() - self.loaded_at < CATALOG_TTL_SECONDS
+
+
+_lock = threading.Lock()
+_versions = itertools.count(1)
+_snapshot: CatalogSnapshot | None = None
+_invalidation_listeners = []
+# Bumped by invalidate_catalog(); an async load that straddles a write
+# must not install what it read.
+_generation = 0
+_async_lock = None
+_changes = deque(maxlen=CHANGE_LOG_SIZE)
+
+
+def get_catalog(db) -> CatalogSnapshot:
+    """
+    Return the current snapshot, loading it with `db` if missing or stale.
+
+    While the snapshot is fresh this does not touch the database at all.
+    """
+    global _snapshot
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.is_fresh():
+        return snapshot
+
+    with _lock:
+        # Another thread may have reloaded while we waited for the lock.
+        snapshot = _snapshot
+        if snapshot is not None and snapshot.is_fresh():
+            return snapshot
+        _snapshot = _open_shared() or _new_snapshot(load_product_rows(db))
+        _changes.clear()  # a reload isn't a replayable change
+        return _snapshot
+
+
+async def get_catalog_async(db) -> CatalogSnapshot:
+    """
+    get_catalog() for an AsyncSession.
+
+    The threading lock can't be held across an await (other coroutines on
+    the same loop would block on it), so concurrent coroutines are
+    serialized with an asyncio.Lock and the load runs unlocked.
+    """
+    global _snapshot, _async_lock
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.is_fresh():
+        return snapshot
+
+    if _async_lock is None:
+        _async_lock = asyncio.Lock()
+    async with _async_lock:
+        snapshot = _snapshot
+        if snapshot is not None and snapshot.is_fresh():
+            return snapshot
+        generation = _generation
+        snapshot = _open_shared()
+        if snapshot is None:
+            rows = await db.run_sync(load_product_rows)
+        with _lock:
+            if snapshot is None:
+                # rows a write may have overtaken are used once, not shared
+                snapshot = (_new_snapshot(rows) if generation == _generation
+                            else CatalogSnapshot(next(_versions), rows))
+            if generation == _generation:
+                _snapshot = snapshot
+                _changes.clear()
+        return snapshot
+
+
+def record_change(upserts=(), deletes=()) -> CatalogChange:
+    """
+    Record a committed write and roll the current snapshot forward.
+
+    `upserts` are ProductRow records (new products or new versions of
+    existing ids), `deletes` product ids.
+    """
+    global _snapshot, _generation
+    with _lock, _shared_lock():
+        if CATALOG_FILE and (_snapshot is None or not _snapshot.is_fresh()):
+            # No snapshot yet, or another worker replaced the file (or it
+            # expired): roll the file's version forward, not ours, or its
+            # writes would be lost
+            _snapshot = _open_shared()
+            _changes.clear()
+        change = CatalogChange(next(_versions), tuple(upserts), tuple(deletes))
+        _changes.append(change)
+        _generation += 1
+        if _snapshot is not None:
+            _snapshot = _snapshot.apply(change)
+            if CATALOG_FILE:
+                _publish(_snapshot)
+        elif CATALOG_FILE:
+            _remove_shared()  # nothing current to roll forward: every worker reloads
+    for callback in _invalidation_listeners:
+        callback()
+    return change
+
+
+def changes_since(version: int) -> list[CatalogChange] | None:
+    """
+    Changes recorded after `version`, oldest first.
+
+    None when they can't be replayed (the log was reset or has been trimmed
+    past `version`); rebuild from get_catalog() instead.
+    """
+    with _lock:
+        changes = list(_changes)
+        snapshot = _snapshot
+    if snapshot is not None and version >= snapshot.version:
+        return []
+    if not changes or changes[0].version > version + 1:
+        return None
+    return [change for change in changes if change.version > version]
+
+
+def invalidate_catalog():
+    """Drop the snapshot and the change log; the next get_catalog() reloads."""
+    global _snapshot, _generation
+    with _lock, _shared_lock():
+        _snapshot = None
+        _changes.clear()
+        _generation += 1
+        if CATALOG_FILE:
+            _remove_shared()
+    for callback in _invalidation_listeners:
+        callback()
+
+
+def on_invalidate(callback):
+    """Register callback() to run after every record_change() and invalidate_catalog()."""
+    _invalidation_listeners.append(callback)
+    return callback
+
+
+# ── Shared catalog file ──
+
+
+def _open_shared() -> CatalogSnapshot | None:
+    """Snapshot mapping CATALOG_FILE, or None if it's missing, stale or unreadable."""
+    if not CATALOG_FILE:
+        return None
+    try:
+        mapped = catalog_file.open_catalog_file(CATALOG_FILE)
+        if CATALOG_TTL_SECONDS > 0 and mapped.age() >= CATALOG_TTL_SECONDS:
+            return None
+        delta = catalog_file.read_delta(CATALOG_FILE, mapped.file_id)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning("ignoring catalog file %s: %s", CATALOG_FILE, e)
+        return None
+    return CatalogSnapshot.from_file(next(_versions), mapped, delta)
+
+
+def _new_snapshot(rows) -> CatalogSnapshot:
+    """Snapshot of freshly loaded rows, shared through CATALOG_FILE if set."""
+    if CATALOG_FILE:
+        try:
+            mapped = catalog_file.write_catalog_file(CATALOG_FILE, rows)
+        except (OSError, ValueError) as e:
+            logger.warning("catalog not shared through %s: %s", CATALOG_FILE, e)
+            _remove_shared()
+        else:
+            _remove_delta()  # edits to the file this one replaces
+            return CatalogSnapshot.from_file(next(_versions), mapped)
+    return CatalogSnapshot(next(_versions), rows)
+
+
+def _shared_lock():
+    """Cross-process lock for rolling CATALOG_FILE forward (no-op without it)."""
+    if CATALOG_FILE:
+        return catalog_file.locked(CATALOG_FILE)
+    return contextlib.nullcontext()
+
+
+def _publish(snapshot: CatalogSnapshot):
+    """
+    Share a rolled-forward snapshot with the other workers.
+
+    Its edits since CATALOG_FILE was written go to the delta file, which
+    costs the size of the edits; past CATALOG_DELTA_MAX_ROWS edits (or with
+    no file underneath) the whole catalog is rewritten instead, O(catalog).
+    This process keeps `snapshot` (and its edited LP model); it is tied to
+    the files written, so only a later write makes it stale. A rewritten
+    file keeps the time of the database load it descends from, so the TTL
+    still forces a reload however many changes were applied on top.
+    """
+    delta = snapshot.delta
+    try:
+        if delta is not None and len(delta) <= catalog_file.CATALOG_DELTA_MAX_ROWS:
+            snapshot.delta_id = catalog_file.write_delta(CATALOG_FILE, delta)
+            snapshot.file_path = CATALOG_FILE
+            snapshot.file_id = snapshot.catalog_file.file_id
+            return
+        written_at = time.time() - (time.monotonic() - snapshot.loaded_at)
+        mapped = catalog_file.write_catalog_file(CATALOG_FILE, snapshot.products, written_at)
+    except (OSError, ValueError) as e:
+        logger.warning("catalog not shared through %s: %s", CATALOG_FILE, e)
+        _remove_shared()
+        return
+    snapshot.catalog_file = mapped  # what a new worker pool maps
+    snapshot.delta = catalog_file.CatalogDelta(mapped.file_id)
+    snapshot.file_path = mapped.path
+    snapshot.file_id = mapped.file_id
+    _remove_delta()  # folded into the new file
+
+
+def _remove_shared():
+    try:
+        os.unlink(CATALOG_FILE)
+    except FileNotFoundError:
+        pass
+    _remove_delta()
+
+
+def _remove_delta():
+    try:
+        os.unlink(catalog_file.delta_path(CATALOG_FILE))
+    except FileNotFoundError:
+        pass
+
+
+def load_products(db, health_condition: str | None = None):
+    """
+    Products passing the hard constraints of `health_condition`, straight
+    from the database (the filter runs in SQL), as ProductRow records.
+
+    Bypasses the snapshot; used when CATALOG_CACHE is off.
+    """
+    return load_product_rows(db, health_condition)
@@ -0,0 +1,460 @@
+"""
+Binary columnar catalog file shared by every worker process.
+
+Each uvicorn worker otherwise holds its own copy of the catalog: one
+ProductRow object per product plus its strings, repeated per process. With
+CATALOG_FILE set, the catalog is written once per version to a compact
+file that every worker maps read-only with mmap, so its pages live in the
+OS page cache once however many workers read it.
+
+What a worker still holds privately: the decoded float columns and the
+rankings (a few MB per 100k products), plus a ProductRow for every row it
+reads. Greedy requests read the top of a ranking; LP and knapsack requests
+read every product their condition leaves eligible (those rows then stay
+built, and the LP model grows a column for each), so a worker serving
+unfiltered LP requests ends up holding every row.
+
+Layout (little-endian, every section 64-byte aligned):
+
+    header     magic, format version, section count, rows, written_at
+    sections   (name, dtype, offset, count) per section
+    id             int64
+    category_id    int32 (-1 = none)
+    price          int64 fixed-point, hundredths
+    <nutrient>     int32 fixed-point, hundredths, one per NUTRIENT_FIELDS
+    null.<field>   packed bitmap (bit i set = row i is null) for price and
+                   every nutrient
+    name, category_name, image_url
+                   int32 index into the string table (-1 = none)
+    str_offsets    uint64, start of each string in str_data (+ end)
+    str_data       UTF-8 bytes; each distinct string is stored once
+
+Database columns are NUMERIC(_, 2), so hundredths hold every value exactly
+and n / 100 gives the same float the database driver returns. Values with
+more decimals can't be stored and make write_catalog_file() raise.
+
+A new version is written to a temporary file next to CATALOG_FILE and
+renamed over it (os.replace), so readers see the old file or the new one,
+never a partial one. A process keeps its mapping of the old file until it
+maps the new one; the old pages are freed when the last mapping goes.
+Writers that derive a version from the current file hold locked(path)
+around reading it and replacing it, so concurrent edits don't overwrite
+each other.
+
+Delta file
+----------
+Rewriting the whole file for a one-product edit costs O(catalog) per
+write. Edits are instead collected in a small delta file next to it
+(delta_path(path), JSON, also replaced atomically): the ids removed and the
+rows written since the file was written (see CatalogDelta). Readers
+layer it over the mapped rows with two ProductColumns.apply() calls. Once
+it holds more than CATALOG_DELTA_MAX_ROWS edits, the next write rewrites
+the file with every edit folded in and the delta starts over. A delta
+names the file it applies to and is ignored once that file is replaced.
+"""
+import json
+import mmap
+import os
+import struct
+import tempfile
+import time
+from collections.abc import Sequence
+from contextlib import contextmanager
+
+import numpy as np
+
+from .columnar import NUTRIENT_FIELDS, ProductColumns
+from .queries import ProductRow
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock
+    fcntl = None
+
+# Path of the shared catalog file ("" = every process keeps its own copy)
+CATALOG_FILE = os.getenv("CATALOG_FILE", "")
+# Edits kept in the delta file before a write rewrites CATALOG_FILE
+CATALOG_DELTA_MAX_ROWS = int(os.getenv("CATALOG_DELTA_MAX_ROWS", "1000"))
+
+MAGIC = b"NKCATLG\x00"
+FORMAT_VERSION = 1
+_HEADER = struct.Struct("<8sIIQd")
+_SECTION = struct.Struct("<32s8sQQ")
+_ALIGN = 64
+
+# Numeric fields stored fixed-point, with their dtype
+_FIXED = (("price", "price_per_unit", "<i8"),) + tuple(
+    (field, field, "<i4") for field in NUTRIENT_FIELDS
+)
+_STRINGS = ("name", "category_name", "image_url")
+
+
+def write_catalog_file(path: str, products, written_at: float | None = None) -> "CatalogFile":
+    """
+    Write `products` (ProductRow-like records) to `path`, atomically.
+
+    written_at (a time.time() value, default now) is when the data was
+    read from the database; age() counts from it. Returns the new file,
+    mapped. Raises ValueError if a value doesn't fit the format (more than
+    two decimals, out of range).
+    """
+    if hasattr(products, "peek_all"):
+        products = products.peek_all()  # a mapped catalog: don't keep every row
+    products = list(products)
+    sections = _encode(products)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".catalog-", suffix=".tmp")
+    try:
+        os.fchmod(fd, 0o644)  # readable by every worker, like a normal file
+        with os.fdopen(fd, "wb") as f:
+            f.write(_layout(len(products), sections, time.time() if written_at is None else written_at))
+            f.flush()
+            os.fsync(f.fileno())
+        catalog_file = open_catalog_file(tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+    catalog_file.path = path
+    return catalog_file
+
+
+def open_catalog_file(path: str) -> "CatalogFile":
+    """Map `path` read-only. Raises ValueError if it isn't a catalog file."""
+    with open(path, "rb") as f:
+        file_id = _file_id(os.fstat(f.fileno()))
+        if file_id[2] < _HEADER.size:
+            raise ValueError(f"{path}: not a catalog file")
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    catalog_file = CatalogFile(buffer)
+    catalog_file.path = path
+    catalog_file.file_id = file_id
+    return catalog_file
+
+
+@contextmanager
+def locked(path: str):
+    """Hold an exclusive lock on `path` (through path.lock) across processes."""
+    if fcntl is None:
+        yield
+        return
+    with open(path + ".lock", "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        yield  # unlocked when the file is closed
+
+
+def file_id(path: str) -> tuple | None:
+    """Identity of the file now at `path` (changes on every rewrite), or None."""
+    try:
+        return _file_id(os.stat(path))
+    except FileNotFoundError:
+        return None
+
+
+def _file_id(stat) -> tuple:
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+class CatalogFile:
+    """
+    A catalog file's sections as read-only NumPy views of its buffer.
+
+    `products` materializes ProductRow records only for the rows that are
+    read; columns() decodes the numeric columns once for the pipeline.
+    """
+
+    path = None
+    file_id = None
+
+    def __init__(self, buffer):
+        self._buffer = buffer
+        magic, version, count, rows, written_at = _HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError("not a catalog file (or an unsupported format version)")
+        self.rows = rows
+        self.written_at = written_at
+        self.arrays = {}
+        offsets = {}
+        for i in range(count):
+            name, dtype, offset, n = _SECTION.unpack_from(buffer, _HEADER.size + i * _SECTION.size)
+            name = name.rstrip(b"\x00").decode()
+            offsets[name] = offset
+            self.arrays[name] = np.frombuffer(
+                buffer, dtype=dtype.rstrip(b"\x00").decode(), count=n, offset=offset
+            )
+        self._data_offset = offsets["str_data"]
+        self._offsets = self.arrays["str_offsets"]
+        self._strings = {}
+        self._decoded = None
+        self.products = MappedProducts(self)
+
+    def __len__(self):
+        return self.rows
+
+    def __reduce__(self):
+        # Pickled (e.g. for a "spawn" worker) as a private copy of the bytes
+        return _from_bytes, (bytes(self._buffer),)
+
+    def age(self) -> float:
+        """Seconds since this version's data was read from the database."""
+        return max(time.time() - self.written_at, 0.0)
+
+    def decoded(self) -> dict:
+        """field -> float64 column, NaN where null (built once)."""
+        if self._decoded is None:
+            decoded = {}
+            for name, field, _ in _FIXED:
+                nulls = np.unpackbits(
+                    self.arrays["null." + name], count=self.rows, bitorder="little"
+                ).astype(bool)
+                column = self.arrays[name] / 100.0
+                column[nulls] = np.nan
+                decoded[field] = column
+            self._decoded = decoded
+        return self._decoded
+
+    def columns(self) -> ProductColumns:
+        """ProductColumns over these rows, without building a ProductRow each."""
+        decoded = self.decoded()
+        return ProductColumns.from_columns(
+            self.products,
+            {field: decoded[field] for field in NUTRIENT_FIELDS},
+            decoded["price_per_unit"],
+            self.arrays["id"],
+        )
+
+    def string(self, index: int) -> str | None:
+        if index < 0:
+            return None
+        value = self._strings.get(index)
+        if value is None:
+            start = self._data_offset + int(self._offsets[index])
+            end = self._data_offset + int(self._offsets[index + 1])
+            value = self._strings.setdefault(index, str(self._buffer[start:end], "utf-8"))
+        return value
+
+    def row(self, i: int) -> ProductRow:
+        arrays = self.arrays
+        decoded = self.decoded()
+        category_id = int(arrays["category_id"][i])
+        values = [
+            int(arrays["id"][i]),
+            self.string(int(arrays["name"][i])),
+            None if category_id < 0 else category_id,
+            self.string(int(arrays["category_name"][i])),
+        ]
+        for field in ProductRow.__slots__[4:12]:
+            value = float(decoded[field][i])
+            values.append(None if value != value else value)
+        values.append(self.string(int(arrays["image_url"][i])))
+        return ProductRow(*values)
+
+
+class MappedProducts(Sequence):
+    """
+    Read-only sequence of a CatalogFile's rows as ProductRow records.
+
+    A record is built on first access and then reused, so the same row is
+    always the same object (the LP model keys on identity).
+    """
+
+    def __init__(self, catalog_file: CatalogFile):
+        self._file = catalog_file
+        self._rows = {}
+
+    def __len__(self):
+        return self._file.rows
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("catalog row out of range")
+        row = self._rows.get(i)
+        if row is None:
+            # setdefault is atomic: racing threads end up with one record
+            row = self._rows.setdefault(i, self._file.row(i))
+        return row
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def peek(self, i: int) -> ProductRow:
+        """Row i without keeping it: the shared record if built, else a new one."""
+        row = self._rows.get(i)
+        return row if row is not None else self._file.row(i)
+
+    def peek_all(self):
+        for i in range(len(self)):
+            yield self.peek(i)
+
+
+def _from_bytes(data: bytes) -> CatalogFile:
+    return CatalogFile(data)
+
+
+# ── Delta ──
+
+
+def delta_path(path: str) -> str:
+    return path + ".delta"
+
+
+class CatalogDelta:
+    """
+    Edits on top of the catalog file identified by `base_id` (its file_id).
+
+    `deletes` holds the ids whose base row is gone, `upserts` the rows
+    written since, by id, in the order ProductColumns.apply() would have
+    appended them: applying the deletes and then the upserts gives the same
+    rows, in the same order, as applying every change one by one.
+    """
+
+    file_id = None  # of the delta file this was read from or written to
+
+    def __init__(self, base_id, deletes=(), upserts=()):
+        self.base_id = tuple(base_id)
+        self.deletes = set(deletes)
+        self.upserts = {product.id: product for product in upserts}
+
+    def __len__(self):
+        return len(self.deletes) + len(self.upserts)
+
+    def add(self, upserts=(), deletes=()) -> "CatalogDelta":
+        """This delta followed by one change (upserts written before deletes, like apply())."""
+        delta = CatalogDelta(self.base_id, self.deletes, self.upserts.values())
+        for product in upserts:
+            delta.upserts[product.id] = product  # an id already there keeps its place
+        for product_id in deletes:
+            delta.upserts.pop(product_id, None)  # written again later, it goes last
+            delta.deletes.add(product_id)
+        return delta
+
+    def apply(self, columns: ProductColumns) -> ProductColumns:
+        """`columns` (of the base file) with these edits."""
+        if self.deletes:
+            columns = columns.apply(deletes=self.deletes)
+        if self.upserts:
+            columns = columns.apply(upserts=self.upserts.values())
+        return columns
+
+
+def write_delta(path: str, delta: CatalogDelta) -> tuple:
+    """Replace the delta file of catalog file `path` with `delta`; returns its file_id."""
+    data = json.dumps({
+        "base": list(delta.base_id),
+        "deletes": sorted(delta.deletes),
+        "upserts": [[getattr(p, name, None) for name in ProductRow.__slots__] for p in delta.upserts.values()],
+    }, default=float).encode()  # Numeric columns come back as Decimal
+    target = delta_path(path)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(target)), prefix=".delta-", suffix=".tmp")
+    try:
+        os.fchmod(fd, 0o644)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+            delta_id = _file_id(os.fstat(f.fileno()))
+        os.replace(tmp, target)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+    delta.file_id = delta_id
+    return delta_id
+
+
+def read_delta(path: str, base_id) -> CatalogDelta:
+    """
+    The delta file of catalog file `path` if it applies to `base_id`, else
+    an empty delta; its file_id is that of the file read (None if missing).
+    Raises ValueError if the file can't be parsed.
+    """
+    try:
+        with open(delta_path(path), "rb") as f:
+            delta_id = _file_id(os.fstat(f.fileno()))
+            data = f.read()
+    except FileNotFoundError:
+        return CatalogDelta(base_id)
+    try:
+        record = json.loads(data)
+        if tuple(record["base"]) != tuple(base_id):
+            delta = CatalogDelta(base_id)  # left over from a replaced file
+        else:
+            upserts = (ProductRow(*values) for values in record["upserts"])
+            delta = CatalogDelta(base_id, record["deletes"], upserts)
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"{delta_path(path)}: not a catalog delta ({e})") from None
+    delta.file_id = delta_id
+    return delta
+
+
+# ── Writing ──
+
+
+def _encode(products) -> list[tuple[str, np.ndarray]]:
+    n = len(products)
+    sections = [
+        ("id", np.array([p.id for p in products], dtype="<i8")),
+        ("category_id", np.array(
+            [-1 if p.category_id is None else p.category_id for p in products], dtype="<i4"
+        )),
+    ]
+    nulls = []
+    for name, field, dtype in _FIXED:
+        values = np.array(
+            [np.nan if getattr(p, field, None) is None else float(getattr(p, field)) for p in products],
+            dtype=np.float64,
+        )
+        null = np.isnan(values)
+        scaled = np.round(np.where(null, 0.0, values) * 100.0)
+        info = np.iinfo(dtype)
+        if np.any((scaled < info.min) | (scaled > info.max)):
+            raise ValueError(f"{field} out of range for the catalog file")
+        fixed = scaled.astype(dtype)
+        if np.any(fixed / 100.0 != np.where(null, 0.0, values)):
+            raise ValueError(f"{field} has values with more than two decimals")
+        sections.append((name, fixed))
+        nulls.append(("null." + name, np.packbits(null, bitorder="little")))
+    sections += nulls
+
+    strings = {}
+    for field in _STRINGS:
+        indexes = np.empty(n, dtype="<i4")
+        for i, p in enumerate(products):
+            value = getattr(p, field, None)
+            indexes[i] = -1 if value is None else strings.setdefault(value, len(strings))
+        sections.append((field, indexes))
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype="<u8")
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    sections.append(("str_offsets", offsets))
+    sections.append(("str_data", np.frombuffer(b"".join(encoded), dtype="u1")))
+    return sections
+
+
+def _layout(rows: int, sections, written_at: float) -> bytes:
+    table_end = _HEADER.size + _SECTION.size * len(sections)
+    offset = _aligned(table_end)
+    table = []
+    body = bytearray()
+    for name, array in sections:
+        assert len(name) <= 32, name
+        table.append(_SECTION.pack(name.encode(), array.dtype.str.encode(), offset, array.size))
+        data = array.tobytes()
+        padding = _aligned(offset + len(data)) - offset - len(data)
+        body += data + b"\x00" * padding
+        offset += len(data) + padding
+
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, len(sections), rows, written_at)
+    head = header + b"".join(table)
+    return head + b"\x00" * (_aligned(table_end) - len(head)) + bytes(body)
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // _ALIGN) * _ALIGN
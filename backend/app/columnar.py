@@ -0,0 +1,318 @@
+"""
+Columnar (NumPy) view of a product list for filtering and scoring.
+
+Every nutrient is stored once as a float64 column with NaN for missing
+values, so a health filter becomes one boolean mask and a score becomes a
+weighted sum of columns instead of a getattr/float() loop per product.
+
+Results match the per-product definitions in recommendation.py exactly:
+  - a missing value passes every hard constraint (NaN > max is False)
+  - a missing value contributes nothing to the score
+  - weights are accumulated in the same order as score_product(), and the
+    total is rounded like round(score, 2)
+  - ties keep input order, the same as a stable list.sort(reverse=True)
+
+apply() derives the columns of an edited catalog from these ones, touching
+only the changed rows, instead of re-reading every product. Columns over a
+lazily read product sequence (a mapped catalog file) stay lazy: the edits
+are layered over it (EditedProducts) rather than reading every row.
+"""
+from collections.abc import Sequence
+
+import numpy as np
+
+NUTRIENT_FIELDS = (
+    "calories",
+    "sugar",
+    "sodium",
+    "protein",
+    "fat",
+    "saturated_fat",
+    "fiber",
+)
+
+
+def _as_float(value) -> float:
+    return np.nan if value is None else float(value)
+
+
+def _column(products, field: str) -> np.ndarray:
+    return np.array(
+        [_as_float(getattr(p, field, None)) for p in products], dtype=np.float64
+    )
+
+
+def round2(raw: np.ndarray) -> np.ndarray:
+    """
+    Vectorized equivalent of round(x, 2) for every element.
+
+    np.round works on x * 100, which can land on the wrong side of .5 when
+    the multiplication is inexact. Those near-ties are rare, so they are
+    re-rounded with Python's correctly rounded round().
+    """
+    scaled = raw * 100.0
+    rounded = np.round(scaled) / 100.0
+    frac = np.abs(scaled - np.trunc(scaled))
+    near_tie = np.flatnonzero(np.abs(frac - 0.5) < 1e-6)
+    if near_tie.size:
+        rounded[near_tie] = [round(x, 2) for x in raw[near_tie].tolist()]
+    return rounded
+
+
+class ProductColumns:
+    """Products plus their nutrient and price columns, built once."""
+
+    def __init__(self, products):
+        self.products = tuple(products)
+        self.columns = {
+            field: _column(self.products, field) for field in NUTRIENT_FIELDS
+        }
+        self.price = _column(self.products, "price_per_unit")
+        self.ids = None
+        self._index = None
+        self._fill()
+        # Derived per-catalog data (e.g. rankings per health condition) that
+        # callers cache here; it lives and dies with these columns.
+        self.memo = {}
+
+    @classmethod
+    def from_columns(cls, products, columns: dict, price: np.ndarray,
+                     ids: np.ndarray | None = None) -> "ProductColumns":
+        """
+        Instance over `products` (any sequence) with ready-made columns,
+        without reading the products (see catalog_file.CatalogFile). With
+        `ids` (the products' ids, in order) index and apply() don't read
+        them either.
+        """
+        new = object.__new__(cls)
+        new.products = products
+        new.columns = columns
+        new.price = price
+        new.ids = ids
+        new._index = None
+        new._fill()
+        new.memo = {}
+        return new
+
+    def _fill(self):
+        # NaN-free copies for scoring: a missing value adds 0.0, which leaves
+        # the running total bit-for-bit unchanged.
+        self._filled = {
+            field: np.nan_to_num(col, nan=0.0) for field, col in self.columns.items()
+        }
+
+    def __len__(self):
+        return len(self.products)
+
+    @property
+    def index(self) -> dict:
+        """Product id -> row number."""
+        if self._index is None:
+            if self.ids is not None:
+                self._index = dict(zip(self.ids.tolist(), range(len(self.ids))))
+            else:
+                self._index = {p.id: i for i, p in enumerate(self.products)}
+        return self._index
+
+    def apply(self, upserts=(), deletes=()) -> "ProductColumns":
+        """
+        Columns for this catalog with `upserts` (products, matched by id)
+        written and the product ids in `deletes` removed.
+
+        Replaced products keep their row, new ones are appended, so the
+        result equals ProductColumns() of the edited product list. Only the
+        changed rows are read; self is left untouched (requests may still
+        be using it).
+        """
+        index = self.index
+        if self.ids is None:
+            products = list(self.products)
+        else:
+            products = EditedProducts.over(self.products)
+        columns = {field: col.copy() for field, col in self.columns.items()}
+        price = self.price.copy()
+        ids = None if self.ids is None else self.ids.copy()
+
+        appended = []
+        for product in upserts:
+            row = index.get(product.id)
+            if row is None:
+                appended.append(product)
+                continue
+            products[row] = product
+            for field, col in columns.items():
+                col[row] = _as_float(getattr(product, field, None))
+            price[row] = _as_float(getattr(product, "price_per_unit", None))
+
+        dropped = sorted({index[i] for i in deletes if i in index})
+        if dropped:
+            for row in reversed(dropped):
+                del products[row]
+            columns = {field: np.delete(col, dropped) for field, col in columns.items()}
+            price = np.delete(price, dropped)
+            if ids is not None:
+                ids = np.delete(ids, dropped)
+        if appended:
+            products += appended
+            columns = {
+                field: np.concatenate([col, _column(appended, field)])
+                for field, col in columns.items()
+            }
+            price = np.concatenate([price, _column(appended, "price_per_unit")])
+            if ids is not None:
+                ids = np.concatenate([ids, np.array([p.id for p in appended], dtype=ids.dtype)])
+
+        if ids is None:
+            products = tuple(products)
+        return ProductColumns.from_columns(products, columns, price, ids)
+
+    def mask(self, limits: dict[str, float]) -> np.ndarray:
+        """Boolean mask of products with no field above its limit."""
+        keep = np.ones(len(self.products), dtype=bool)
+        for field, max_value in limits.items():
+            # NaN compares False, so missing data passes
+            keep &= ~(self.columns[field] > max_value)
+        return keep
+
+    def scores(self, weights: dict[str, float], rows: np.ndarray | None = None) -> np.ndarray:
+        """Rounded scores for `rows` (all products when None)."""
+        n = len(self.products) if rows is None else len(rows)
+        total = np.zeros(n, dtype=np.float64)
+        for field, weight in weights.items():
+            col = self._filled[field]
+            total += (col if rows is None else col[rows]) * weight
+        return round2(total)
+
+    def order(self, weights: dict[str, float], rows: np.ndarray | None = None):
+        """
+        (row numbers, scores) of `rows`, best score first.
+
+        Both are arrays; ties keep input order.
+        """
+        if rows is None:
+            rows = np.arange(len(self.products))
+        scores = self.scores(weights, rows)
+        order = np.argsort(-scores, kind="stable")
+        return rows[order], scores[order]
+
+    def rank(self, weights: dict[str, float], rows: np.ndarray | None = None):
+        """
+        (product, score) tuples for `rows`, best score first.
+
+        Returns: list of (product, score) tuples, like rank_products().
+        """
+        return self.pairs(*self.order(weights, rows))
+
+    def pairs(self, rows: np.ndarray, scores: np.ndarray):
+        """[(product, score)] for parallel row-number and score arrays."""
+        products = self.products
+        return [(products[i], s) for i, s in zip(rows.tolist(), scores.tolist())]
+
+    def iter_ranked(self, weights: dict[str, float], rows: np.ndarray | None = None,
+                    batch_size: int = 64):
+        """
+        Yield the same (product, score) sequence as rank(), on demand.
+
+        Instead of sorting every row up front, the best `batch_size` rows are
+        selected with argpartition and sorted; each further batch doubles in
+        size. A consumer that stops after k items costs O(n + k log k).
+        """
+        if rows is None:
+            rows = np.arange(len(self.products))
+        scores = self.scores(weights, rows)
+        products = self.products
+        remaining = np.arange(len(rows))  # positions into rows, in input order
+        k = batch_size
+        while remaining.size:
+            top = _top_k(scores[remaining], k)
+            picked = remaining[top]
+            for i, s in zip(rows[picked].tolist(), scores[picked].tolist()):
+                yield products[i], s
+            if top.size == remaining.size:
+                return
+            keep = np.ones(remaining.size, dtype=bool)
+            keep[top] = False
+            remaining = remaining[keep]
+            k *= 2
+
+    def min_price(self, rows: np.ndarray | None = None) -> float | None:
+        """Cheapest positive unit price among `rows`, or None if there is none."""
+        prices = self.price if rows is None else self.price[rows]
+        prices = prices[prices > 0]
+        return float(prices.min()) if prices.size else None
+
+    def take(self, rows: np.ndarray | None):
+        if rows is None:
+            return list(self.products)
+        products = self.products
+        return [products[i] for i in rows.tolist()]
+
+
+class EditedProducts(Sequence):
+    """
+    A lazily read product sequence with edits layered on top, so editing
+    it doesn't read every row.
+
+    Row i is base[source[i]], or extra[-source[i] - 1] for a product written
+    since. Supports the list operations ProductColumns.apply() uses (item
+    assignment, deleting rows, +=) on a new instance from over().
+    """
+
+    def __init__(self, base, source: np.ndarray, extra: list):
+        self._base = base
+        self._source = source
+        self._extra = extra
+
+    @classmethod
+    def over(cls, products) -> "EditedProducts":
+        """An editable copy of `products`; the original is left untouched."""
+        if isinstance(products, EditedProducts):
+            return cls(products._base, products._source.copy(), list(products._extra))
+        return cls(products, np.arange(len(products)), [])
+
+    def __len__(self):
+        return len(self._source)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        source = int(self._source[i])
+        return self._base[source] if source >= 0 else self._extra[-source - 1]
+
+    def __setitem__(self, i, product):
+        self._extra.append(product)
+        self._source[i] = -len(self._extra)
+
+    def __delitem__(self, i):
+        self._source = np.delete(self._source, i)
+
+    def peek_all(self):
+        """Iterate the rows without the base keeping each row it reads (see MappedProducts.peek)."""
+        peek = getattr(self._base, "peek", self._base.__getitem__)
+        for source in self._source.tolist():
+            yield peek(source) if source >= 0 else self._extra[-source - 1]
+
+    def __iadd__(self, products):
+        start = len(self._extra)
+        self._extra.extend(products)
+        self._source = np.concatenate([
+            self._source, -np.arange(start + 1, len(self._extra) + 1),
+        ])
+        return self
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Positions of the k best scores, ordered like a stable descending sort.
+
+    argpartition alone picks arbitrary members of a tie at the k-th score,
+    so ties at the boundary are resolved by position, keeping the earliest.
+    """
+    if k >= scores.size:
+        return np.argsort(-scores, kind="stable")
+    kth = scores[np.argpartition(-scores, k - 1)[:k]].min()
+    above = np.flatnonzero(scores > kth)
+    ties = np.flatnonzero(scores == kth)[: k - above.size]
+    top = np.concatenate([above, ties])
+    top.sort()
+    return top[np.argsort(-scores[top], kind="stable")]
@@ -1,16 +1,82 @@
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
 import os
+import threading
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Checked when the engine is first needed, not at import, so the app (and
+# tools like the benchmarks) can be imported without a database configured.
 DATABASE_URL = os.getenv("DATABASE_URL")
-if not DATABASE_URL:
-    raise ValueError("DATABASE_URL is not set")
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# ── Connection pool ──
+# Per-process pool size; with N uvicorn workers the database sees up to
+# N x (DB_POOL_SIZE + DB_MAX_OVERFLOW) connections.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+# Seconds to wait for a free connection before failing the request
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Test connections before use (drops ones the pooler closed while idle)
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") != "0"
+# Replace connections older than this many seconds (-1 = never)
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+# DB_ASYNC=1 serves the read endpoints from an asyncio engine (asyncpg)
+DB_ASYNC = os.getenv("DB_ASYNC", "0") == "1"
+
+
+def _pool_options(url: str) -> dict:
+    if url.startswith("sqlite"):
+        return {}  # SQLite picks its own pool class; sizing doesn't apply
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+        "pool_recycle": DB_POOL_RECYCLE,
+    }
+
+
+def _database_url() -> str:
+    if not DATABASE_URL:
+        raise ValueError("DATABASE_URL is not set")
+    return DATABASE_URL
+
+
+# ── Engine (created on first use) ──
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """The process-wide engine; created by the first session, not at import."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = create_engine(_database_url(), **_pool_options(DATABASE_URL))
+    return _engine
+
+
+def __getattr__(name):
+    # `from app.database import engine` keeps working
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class _LazySessionmaker(sessionmaker):
+    """sessionmaker that binds to get_engine() when the first session is made."""
+
+    def __call__(self, **local_kw):
+        if self.kw.get("bind") is None and "bind" not in local_kw:
+            self.configure(bind=get_engine())
+        return super().__call__(**local_kw)
+
+
+SessionLocal = _LazySessionmaker(autocommit=False, autoflush=False)
 
 
 class Base(DeclarativeBase):
@@ -22,4 +88,42 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+# ── Async engine (DB_ASYNC=1) ──
+# Created on first use, so the async drivers are only needed when enabled.
+
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+_async_engine = None
+_async_sessionmaker = None
+
+
+def async_database_url(url: str) -> str:
+    """DATABASE_URL with its driver swapped for the asyncio equivalent."""
+    scheme, sep, rest = url.partition("://")
+    return ASYNC_DRIVERS.get(scheme, scheme) + sep + rest
+
+
+def get_async_sessionmaker():
+    global _async_engine, _async_sessionmaker
+    if _async_sessionmaker is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+        url = async_database_url(_database_url())
+        _async_engine = create_async_engine(url, **_pool_options(url))
+        _async_sessionmaker = async_sessionmaker(
+            _async_engine, autoflush=False, expire_on_commit=False
+        )
+    return _async_sessionmaker
+
+
+async def get_async_db():
+    async with get_async_sessionmaker()() as db:
+        yield db
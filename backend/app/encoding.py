@@ -0,0 +1,108 @@
+"""
+Fast JSON responses for results the pipeline builds itself.
+
+FastAPI validates whatever a route returns against its response_model and
+then runs it through jsonable_encoder and json.dumps. For /recommend that
+means re-validating every allocation dict that _build_allocation() has
+just produced, which costs more than the encoding itself for large
+baskets and batches.
+
+json_response() skips that: the dict is reshaped for the model's wire
+format by a function compiled once per schema (field order, defaults,
+int -> float for float fields, nested models and lists), then encoded
+with orjson when it is installed (json otherwise). The bytes are the
+same JSON FastAPI would send; the route keeps response_model for the
+OpenAPI schema. Only use it for trusted, internally built values.
+"""
+import json
+import types
+import typing
+from functools import lru_cache
+
+from fastapi import Response
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # optional speed-up
+    orjson = None
+
+_REQUIRED = object()
+
+
+def dumps(content) -> bytes:
+    """Compact UTF-8 JSON, as FastAPI's JSONResponse renders it."""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def json_response(annotation, content, status_code: int = 200, headers=None) -> Response:
+    """
+    `content` (dicts matching `annotation`, e.g. RecommendResponse or
+    list[BatchRecommendItem]) as a ready-to-send JSON response.
+    """
+    return Response(
+        dumps(shaper(annotation)(content)),
+        status_code=status_code,
+        headers=headers,
+        media_type="application/json",
+    )
+
+
+def response_headers(response: Response) -> dict:
+    """
+    Headers a route set on its injected `response`, to carry over to a
+    Response it returns itself (FastAPI only merges them into the ones it
+    builds).
+    """
+    return {k: v for k, v in response.headers.items() if k != "content-length"}
+
+
+@lru_cache(maxsize=None)
+def shaper(annotation):
+    """Function converting a trusted value to the wire shape of `annotation`."""
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return _model_shaper(annotation)
+
+    origin = typing.get_origin(annotation)
+    args = typing.get_args(annotation)
+    if origin in (typing.Union, types.UnionType):
+        inner = [arg for arg in args if arg is not type(None)]
+        if len(inner) == 1:
+            convert = shaper(inner[0])
+            return lambda value: None if value is None else convert(value)
+        return _identity
+    if origin is list:
+        convert = shaper(args[0]) if args else _identity
+        return lambda values: [convert(value) for value in values]
+    if origin is dict:
+        convert = shaper(args[1]) if args else _identity
+        return lambda values: {key: convert(value) for key, value in values.items()}
+    if annotation is float:
+        return float
+    if annotation is int:
+        return int
+    return _identity
+
+
+def _model_shaper(model: type[BaseModel]):
+    fields = []
+    for name, field in model.model_fields.items():
+        default = _REQUIRED if field.is_required() else field.get_default(call_default_factory=True)
+        fields.append((name, shaper(field.annotation), default))
+
+    def shape(obj: dict) -> dict:
+        out = {}
+        for name, convert, default in fields:
+            value = obj[name] if default is _REQUIRED else obj.get(name, default)
+            out[name] = convert(value)
+        return out
+
+    return shape
+
+
+def _identity(value):
+    return value
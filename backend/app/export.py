@@ -0,0 +1,73 @@
+"""
+Streaming catalog export (GET /products/export).
+
+Rows are read through a server-side cursor in EXPORT_BATCH_SIZE batches
+(yield_per + stream_results) and each batch is encoded and sent as one
+chunk, so memory stays bounded by the batch size no matter how many rows
+the catalog has. Nothing is hydrated into ORM objects: the query selects
+plain columns (see queries.product_list_statement).
+"""
+import csv
+import io
+import json
+import os
+from decimal import Decimal
+
+from .database import SessionLocal
+from .queries import PRODUCT_FIELDS, product_list_statement
+
+# Rows fetched from the database and encoded per streamed chunk
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def iter_export(
+    format: str,
+    fields: list[str] | None = None,
+    category_id: int | None = None,
+    health_condition: str | None = None,
+    session_factory=SessionLocal,
+):
+    """
+    Yield the catalog as NDJSON or CSV text chunks, one per batch.
+
+    Opens its own session: a StreamingResponse body is still being
+    produced after the request's dependencies have been cleaned up.
+    """
+    fields = fields or list(PRODUCT_FIELDS)
+    if format == "csv":
+        yield _csv_chunk([fields])
+
+    stmt = product_list_statement(
+        category_id, health_condition, fields=fields
+    ).execution_options(yield_per=EXPORT_BATCH_SIZE, stream_results=True)
+    with session_factory() as db:
+        for batch in db.execute(stmt).partitions():
+            if format == "ndjson":
+                yield _ndjson_chunk(fields, batch)
+            else:
+                yield _csv_chunk(batch)
+
+
+def _ndjson_chunk(fields, rows) -> str:
+    return "".join(
+        json.dumps(dict(zip(fields, row)), default=_encode_decimal) + "\n"
+        for row in rows
+    )
+
+
+def _csv_chunk(rows) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+
+def _encode_decimal(value):
+    # Same encoding ProductResponse uses for Decimal columns
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
@@ -0,0 +1,131 @@
+"""
+Conditional GET for the catalog read endpoints.
+
+GET /products, GET /products/{id} and GET /categories are polled by the
+frontend while the catalog rarely changes. Their responses carry an ETag
+derived from the catalog_version row and a Cache-Control header; a request
+whose If-None-Match holds the current tag is answered 304 with no body,
+after that one primary-key lookup and nothing else (the catalog snapshot
+isn't loaded). Every catalog write bumps the row in its own transaction
+(bump_catalog_version), so the tag changes for every worker as soon as the
+write commits. Writes made outside the app (SQL against the database)
+must bump it too, or clients keep their cached copies.
+
+Each process creates the catalog_version table on first use if it is
+missing (databases created before it existed). If it can't (no CREATE
+privilege), catalog responses are sent without ETags and writes skip the
+bump.
+"""
+import hashlib
+import logging
+import os
+
+from fastapi import Request, Response
+from sqlalchemy import inspect, select, update
+from sqlalchemy.exc import SQLAlchemyError
+
+from .models import CatalogVersion
+
+# CATALOG_ETAGS=0 turns conditional GET off (responses are always sent in full)
+CATALOG_ETAGS = os.getenv("CATALOG_ETAGS", "1") != "0"
+# max-age for catalog responses; 0 = clients must revalidate every time
+CATALOG_MAX_AGE_SECONDS = int(os.getenv("CATALOG_MAX_AGE_SECONDS", "0"))
+
+logger = logging.getLogger(__name__)
+
+# Whether the catalog_version table exists; None until checked
+_version_table = None
+
+
+def cache_control() -> str:
+    if CATALOG_MAX_AGE_SECONDS > 0:
+        return f"max-age={CATALOG_MAX_AGE_SECONDS}"
+    return "no-cache"
+
+
+def catalog_not_modified(request: Request, response: Response, db) -> Response | None:
+    """not_modified() against the catalog version read with `db`."""
+    if not CATALOG_ETAGS or not has_version_table(db.get_bind()):
+        return None
+    return not_modified(request, response, catalog_etag(db.scalar(_VERSION)))
+
+
+async def catalog_not_modified_async(request: Request, response: Response, db) -> Response | None:
+    """catalog_not_modified() for an AsyncSession."""
+    if not CATALOG_ETAGS:
+        return None
+    if _version_table is None:
+        await db.run_sync(lambda session: has_version_table(session.get_bind()))
+    if not _version_table:
+        return None
+    return not_modified(request, response, catalog_etag(await db.scalar(_VERSION)))
+
+
+def catalog_etag(version: int | None) -> str:
+    """Weak HTTP validator for catalog version `version` (None = no writes yet)."""
+    key = f"catalog:{version or 0}"
+    return 'W/"' + hashlib.blake2b(key.encode(), digest_size=8).hexdigest() + '"'
+
+
+def bump_catalog_version(db) -> None:
+    """
+    Count a catalog write in the caller's transaction: call it before the
+    commit that makes the write visible.
+    """
+    if not has_version_table(db.get_bind()):
+        return
+    bumped = db.execute(
+        update(CatalogVersion)
+        .where(CatalogVersion.id == 1)
+        .values(version=CatalogVersion.version + 1)
+    )
+    if bumped.rowcount == 0:
+        db.add(CatalogVersion(id=1, version=1))
+
+
+def has_version_table(bind) -> bool:
+    """
+    Whether the catalog_version table exists, creating it if missing.
+    Checked once per process, through `bind` (an engine).
+    """
+    global _version_table
+    if _version_table is None:
+        try:
+            CatalogVersion.__table__.create(bind, checkfirst=True)
+            _version_table = True
+        except SQLAlchemyError as e:
+            # e.g. another worker created it first, or no CREATE privilege
+            _version_table = inspect(bind).has_table(CatalogVersion.__tablename__)
+            if not _version_table:
+                logger.warning("catalog ETags off: can't create catalog_version: %s", e)
+    return _version_table
+
+
+_VERSION = select(CatalogVersion.version).where(CatalogVersion.id == 1)
+
+
+def not_modified(request: Request, response: Response, etag: str) -> Response | None:
+    """
+    Tag `response` with `etag`, or return a 304 to send instead of a body
+    when the client's copy (If-None-Match) is current.
+    """
+    headers = {"ETag": etag, "Cache-Control": cache_control()}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Weak comparison of `etag` against an If-None-Match header value."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = _opaque(etag)
+    return any(_opaque(tag) == opaque for tag in if_none_match.split(","))
+
+
+def _opaque(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
@@ -0,0 +1,247 @@
+"""
+Bulk product ingest from CSV or JSON lines.
+
+Used by POST /products/bulk and from the command line:
+
+    python -m app.ingest ../data/products.csv
+    python -m app.ingest scrape.ndjson --format ndjson
+
+Rows are validated with the same ProductBase schema as POST /products, in
+batches of INGEST_BATCH_SIZE. Each batch is written as executemany() calls
+of one cached statement, which SQLAlchemy sends as multi-row INSERTs
+("insertmanyvalues"):
+
+  - rows carrying an `id` (the CSV's external id) are upserted with
+    INSERT ... ON CONFLICT (id) DO UPDATE
+  - rows without an `id` update the product with the same name if there
+    is one, otherwise they are inserted
+
+Invalid rows (schema errors, unknown category_id, values the columns can't
+hold) are skipped and reported by row number; everything else is committed
+in one transaction.
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+from decimal import ROUND_HALF_UP, Decimal
+
+from pydantic import ValidationError
+from sqlalchemy import Numeric, func, select, text, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from .http_cache import bump_catalog_version
+from .models import Category, Product
+from .schemas import ProductBase
+
+# Rows validated and written per statement
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "1000"))
+
+INGEST_FORMATS = ("csv", "ndjson")
+
+_INSERTS = {
+    "postgresql": postgresql_insert,
+    "sqlite": sqlite_insert,
+}
+
+_COLUMNS = tuple(ProductBase.model_fields)
+
+# NUMERIC(precision, scale) columns of products, checked per row so a value
+# the database would reject is a row error rather than a failed load
+_NUMERIC_COLUMNS = {
+    column.name: (column.type.precision, column.type.scale)
+    for column in Product.__table__.columns
+    if isinstance(column.type, Numeric) and column.type.precision is not None
+}
+# INTEGER columns are 32-bit
+_MAX_INTEGER = 2**31 - 1
+
+
+# ── Parsing ──
+
+
+def parse_records(lines, format: str):
+    """
+    Yield (row_number, record) from CSV or NDJSON.
+
+    `lines` is a string or any iterable of lines (e.g. an open file, which
+    is then read as it goes). Undecodable NDJSON lines yield the exception
+    as the record so they are reported with their row number.
+    """
+    if isinstance(lines, str):
+        lines = io.StringIO(lines)
+    if format == "csv":
+        reader = csv.DictReader(lines)
+        for number, record in enumerate(reader, start=1):
+            # Empty CSV cells mean "no value"
+            yield number, {k: (v if v != "" else None) for k, v in record.items()}
+    elif format == "ndjson":
+        number = 0
+        for line in lines:
+            if not line.strip():
+                continue
+            number += 1
+            try:
+                yield number, json.loads(line)
+            except json.JSONDecodeError as e:
+                yield number, e
+    else:
+        raise ValueError(f"Unknown format: {format}")
+
+
+# ── Ingest ──
+
+
+def ingest(db, records, batch_size: int | None = None) -> dict:
+    """
+    Validate and upsert (row_number, record) pairs; commits on success.
+
+    Returns {"received", "inserted", "updated", "errors"} where errors is a
+    list of {"row": row_number, "errors": [message, ...]}.
+    """
+    batch_size = batch_size or INGEST_BATCH_SIZE
+    insert = _INSERTS.get(db.get_bind().dialect.name)
+    if insert is None:
+        raise ValueError(f"Bulk ingest is not supported on {db.get_bind().dialect.name}")
+
+    category_ids = set(db.scalars(select(Category.id)))
+    report = {"received": 0, "inserted": 0, "updated": 0, "errors": []}
+    batch = []
+    for number, record in records:
+        report["received"] += 1
+        row, errors = _validate(record, category_ids)
+        if errors:
+            report["errors"].append({"row": number, "errors": errors})
+            continue
+        batch.append(row)
+        if len(batch) >= batch_size:
+            _write_batch(db, insert, batch, report)
+            batch = []
+    if batch:
+        _write_batch(db, insert, batch, report)
+
+    if db.get_bind().dialect.name == "postgresql":
+        # Explicit ids don't advance the serial; keep POST /products working
+        db.execute(text(
+            "SELECT setval(pg_get_serial_sequence('products', 'id'), "
+            "(SELECT COALESCE(MAX(id), 1) FROM products))"
+        ))
+    if report["inserted"] or report["updated"]:
+        bump_catalog_version(db)
+    db.commit()
+    return report
+
+
+def _validate(record, category_ids: set[int]):
+    if isinstance(record, Exception):
+        return None, [f"invalid JSON: {record}"]
+    if not isinstance(record, dict):
+        return None, ["expected an object"]
+
+    try:
+        product = ProductBase.model_validate(record)
+    except ValidationError as e:
+        return None, [
+            f"{'.'.join(str(p) for p in error['loc'])}: {error['msg']}"
+            for error in e.errors()
+        ]
+    row = product.model_dump()
+
+    errors = _range_errors(row)
+    if product.category_id not in category_ids:
+        errors.append(f"category_id: unknown category {product.category_id}")
+    raw_id = record.get("id")
+    if raw_id is not None:
+        try:
+            row["id"] = int(raw_id)
+        except (TypeError, ValueError):
+            errors.append(f"id: not an integer: {raw_id!r}")
+        else:
+            if row["id"] < 1:
+                errors.append("id: must be positive")
+            elif row["id"] > _MAX_INTEGER:
+                errors.append(f"id: must be at most {_MAX_INTEGER}")
+    return row, errors
+
+
+def _range_errors(row: dict) -> list[str]:
+    """Values that overflow their NUMERIC(precision, scale) column."""
+    errors = []
+    for column, (precision, scale) in _NUMERIC_COLUMNS.items():
+        value = row.get(column)
+        if value is None:
+            continue
+        # the database rounds to `scale` decimals first, then checks the digits
+        limit = 10 ** (precision - scale)
+        if abs(value) >= limit or abs(
+            value.quantize(Decimal(1).scaleb(-scale), rounding=ROUND_HALF_UP)
+        ) >= limit:
+            errors.append(f"{column}: must be less than {limit} in absolute value")
+    return errors
+
+
+def _write_batch(db, insert, batch: list[dict], report: dict):
+    # Within a batch, the last row for an id or name wins
+    with_id = {row["id"]: row for row in batch if "id" in row}
+    by_name = {row["name"]: row for row in batch if "id" not in row}
+
+    if with_id:
+        existing = set(db.scalars(select(Product.id).where(Product.id.in_(with_id))))
+        stmt = insert(Product.__table__)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["id"],
+            set_={column: stmt.excluded[column] for column in _COLUMNS},
+        )
+        db.execute(stmt, list(with_id.values()))
+        report["updated"] += len(existing)
+        report["inserted"] += len(with_id) - len(existing)
+
+    if by_name:
+        matches = db.execute(
+            select(func.min(Product.id), Product.name)
+            .where(Product.name.in_(by_name))
+            .group_by(Product.name)
+        ).all()
+        if matches:
+            db.execute(
+                update(Product),
+                [{**by_name.pop(name), "id": product_id} for product_id, name in matches],
+            )
+            report["updated"] += len(matches)
+        if by_name:
+            db.execute(insert(Product.__table__), list(by_name.values()))
+            report["inserted"] += len(by_name)
+
+
+# ── CLI ──
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m app.ingest",
+        description="Bulk-load products from a CSV or NDJSON file.",
+    )
+    parser.add_argument("path", help="file to load, or - for stdin")
+    parser.add_argument("--format", choices=INGEST_FORMATS,
+                        help="default: from the file extension, else csv")
+    parser.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    format = args.format or ("ndjson" if args.path.endswith((".ndjson", ".jsonl")) else "csv")
+
+    from .database import SessionLocal
+
+    # Running API processes pick the changes up within CATALOG_TTL_SECONDS
+    f = sys.stdin if args.path == "-" else open(args.path, encoding="utf-8", newline="")
+    with f, SessionLocal() as db:
+        report = ingest(db, parse_records(f, format), args.batch_size)
+
+    print(json.dumps(report, indent=2))
+    return 1 if report["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,316 @@
+"""
+In-process bounded knapsack solver for budget allocation.
+
+Without diversity constraints, the ILP in lp_optimizer.py is a bounded
+integer knapsack:
+
+  Maximize:  Σ (score_i + offset) x qty_i
+  Subject to:
+    Σ (paise_i x qty_i) ≤ budget_paise
+    0 ≤ qty_i ≤ max_qty,  qty_i integer
+
+That doesn't need a MILP solver or a CBC subprocess. It is solved exactly
+with dynamic programming over integer paise:
+
+  - prices and budget are divided by the GCD of all prices, so whole-rupee
+    catalogs need one DP cell per rupee, not per paisa
+  - products sharing a price compete for at most budget // price units, so
+    only the best-scored units of each price class are kept (exact pruning
+    that bounds the item count by the budget, not the catalog size)
+  - each remaining 0..qty range is split into 1, 2, 4, ... unit bundles
+    (binary splitting), turning it into log2(max_qty) 0/1 items
+  - each 0/1 item updates the whole DP row with one NumPy operation; the
+    take/skip decisions are bit-packed for reconstructing the quantities
+
+Because best[c] is kept for every capacity c, one table also answers every
+smaller budget: budget_frontier() reads a whole budget grid (and the full
+score-vs-budget step function) off a single DP run.
+
+Category constraints (min_categories / max_per_category) don't fit a single
+knapsack row, so those calls are handed to allocate_budget_lp (CBC). So are
+instances whose DP table would exceed KNAPSACK_MAX_CELLS.
+"""
+import math
+import os
+import time
+
+import numpy as np
+
+# Max DP cells (0/1 items x capacity units) before handing off to CBC.
+# Decisions take one bit per cell, so the default is ~12 MB.
+KNAPSACK_MAX_CELLS = int(os.getenv("KNAPSACK_MAX_CELLS", "100000000"))
+
+
+def allocate_budget_knapsack(
+    ranked_products,
+    budget: float,
+    household_size: int = 1,
+    max_qty_per_product: int | None = None,
+    min_categories: int = 0,
+    max_per_category: int | None = None,
+):
+    """
+    Optimal budget allocation using a bounded-knapsack DP.
+
+    Same arguments, objective and return shape as allocate_budget_lp().
+
+    Returns:
+        allocations: list of dicts (same shape as greedy version)
+        remaining_budget: float
+    """
+    allocations, remaining, _ = solve_budget_knapsack(
+        ranked_products, budget, household_size,
+        max_qty_per_product=max_qty_per_product,
+        min_categories=min_categories, max_per_category=max_per_category,
+    )
+    return allocations, remaining
+
+
+def solve_budget_knapsack(
+    ranked_products,
+    budget: float,
+    household_size: int = 1,
+    max_qty_per_product: int | None = None,
+    min_categories: int = 0,
+    max_per_category: int | None = None,
+    time_limit: float | None = None,
+):
+    """
+    Like allocate_budget_knapsack(), plus the solver status.
+
+    The DP's result is always "optimal"; when the call is handed to CBC the
+    status is that of solve_budget_lp(). time_limit (seconds) bounds the
+    whole call, CBC hand-off included: if it runs out, allocations are
+    empty and the status is None, as when CBC finds nothing in time.
+    """
+    if not ranked_products or budget <= 0:
+        return [], round(budget, 2) if budget > 0 else 0.0, "optimal"
+    deadline = None if time_limit is None else time.perf_counter() + time_limit
+
+    if min_categories > 0 or max_per_category:
+        return _solve_with_cbc(
+            ranked_products, budget, household_size, max_qty_per_product,
+            min_categories, max_per_category, time_limit,
+        )
+
+    max_qty = max_qty_per_product or household_size
+    plan = _plan(ranked_products, budget, max_qty)
+    if plan is None:
+        return _solve_with_cbc(
+            ranked_products, budget, household_size, max_qty_per_product,
+            0, None, _time_left(deadline),
+        )
+    items, _, capacity, weights, values, bundles = plan
+    if not items:
+        return [], round(budget, 2), "optimal"
+
+    solved = _solve(capacity, weights, values, bundles, deadline)
+    if solved is None:
+        return [], round(budget, 2), None
+    _, decisions = solved
+    quantities = _reconstruct(capacity, weights, bundles, decisions)
+    allocations, remaining = _allocations(items, quantities, budget)
+    return allocations, remaining, "optimal"
+
+
+def budget_frontier(
+    ranked_products,
+    budgets,
+    household_size: int = 1,
+    max_qty_per_product: int | None = None,
+    time_limit: float | None = None,
+):
+    """
+    Optimal allocation for every budget in `budgets` from one DP table.
+
+    Returns a dict with:
+        points: list of (allocations, remaining_budget, objective) per
+            budget, in the order given; objective is the maximized
+            Σ (score + offset) x qty, non-decreasing in the budget
+        breakpoints: list of (budget, objective) at every budget (up to the
+            largest requested) where the optimum improves, i.e. the full
+            score-vs-budget step function. Empty when the DP table would
+            exceed KNAPSACK_MAX_CELLS and each budget is solved with CBC.
+    """
+    budgets = list(budgets)
+    max_budget = max(budgets, default=0)
+    if not ranked_products or max_budget <= 0:
+        return {"points": [_empty(b) for b in budgets], "breakpoints": []}
+
+    max_qty = max_qty_per_product or household_size
+    plan = _plan(ranked_products, max_budget, max_qty)
+    if plan is None:
+        points = []
+        for budget in budgets:
+            allocations, remaining, _ = _solve_with_cbc(
+                ranked_products, budget, household_size, max_qty_per_product,
+                0, None, time_limit,
+            )
+            points.append((allocations, remaining, _objective(allocations, ranked_products)))
+        return {"points": points, "breakpoints": []}
+
+    items, unit, capacity, weights, values, bundles = plan
+    if not items:
+        return {"points": [_empty(b) for b in budgets], "breakpoints": []}
+
+    best, decisions = _solve(capacity, weights, values, bundles)
+    points = []
+    for budget in budgets:
+        if budget <= 0:
+            points.append(_empty(budget))
+            continue
+        c = min(capacity, int(math.floor(budget * 100 + 1e-6)) // unit)
+        quantities = _reconstruct(c, weights, bundles, decisions)
+        allocations, remaining = _allocations(items, quantities, budget)
+        points.append((allocations, remaining, float(best[c])))
+
+    steps = np.flatnonzero(np.diff(best) > 0) + 1
+    breakpoints = [
+        (round(c * unit / 100, 2), value)
+        for c, value in zip(steps.tolist(), best[steps].tolist())
+    ]
+    return {"points": points, "breakpoints": breakpoints}
+
+
+def _empty(budget):
+    return [], round(budget, 2) if budget > 0 else 0.0, 0.0
+
+
+def _objective(allocations, ranked_products) -> float:
+    offset = abs(min(score for _, score in ranked_products)) + 1.0
+    return sum((a["score_raw"] + offset) * a["quantity"] for a in allocations)
+
+
+def _plan(ranked_products, budget: float, max_qty: int):
+    """
+    Integer instance for the DP, or None if it's too large.
+
+    Returns (items, unit, capacity, weights, values, bundles) where items is
+    the list of (product, score, price) considered, unit is the paise per
+    capacity unit, weights/values are per item (in capacity units / shifted
+    score) and bundles is the list of
+    (item_index, units) 0/1 items produced by binary splitting.
+    """
+    # Same positive shift as allocate_budget_lp
+    min_score = min(score for _, score in ranked_products)
+    offset = abs(min_score) + 1.0
+
+    budget_paise = int(math.floor(budget * 100 + 1e-6))
+    items, paise = [], []
+    for product, score in ranked_products:
+        price = float(product.price_per_unit) if product.price_per_unit else 0
+        if price <= 0:
+            continue
+        price_paise = int(round(price * 100))
+        if price_paise > budget_paise:
+            continue  # can never be bought
+        items.append((product, score, price))
+        paise.append(price_paise)
+
+    if not items:
+        return [], 1, 0, [], [], []
+
+    unit = math.gcd(*paise)
+    capacity = budget_paise // unit
+    weights = [p // unit for p in paise]
+    values = [score + offset for _, score, _ in items]
+
+    # At most capacity // w units of weight w fit, and a unit of a
+    # better-valued item with the same weight is always at least as good.
+    by_weight = {}
+    for i, weight in enumerate(weights):
+        by_weight.setdefault(weight, []).append(i)
+    allowed = {}
+    for weight, indices in by_weight.items():
+        room = capacity // weight
+        indices.sort(key=lambda i: values[i], reverse=True)
+        for i in indices:
+            if room <= 0:
+                break
+            allowed[i] = min(max_qty, room)
+            room -= allowed[i]
+
+    bundles = []
+    for i in sorted(allowed):
+        left = allowed[i]
+        size = 1
+        while left > 0:
+            units = min(size, left)
+            bundles.append((i, units))
+            left -= units
+            size *= 2
+
+    if len(bundles) * (capacity + 1) > KNAPSACK_MAX_CELLS:
+        return None
+    return items, unit, capacity, weights, values, bundles
+
+
+def _solve(capacity: int, weights, values, bundles, deadline: float | None = None):
+    """
+    Run the DP. Returns (best, decisions), or None once time.perf_counter()
+    passes `deadline`.
+
+    best[c] is the best objective with at most c capacity units, so one
+    table answers every budget up to `capacity`. decisions[r] holds the
+    bit-packed "take bundle r" flags for capacities weight_r..capacity.
+    """
+    best = np.zeros(capacity + 1, dtype=np.float64)
+    decisions = []
+    for i, units in bundles:
+        if deadline is not None and time.perf_counter() > deadline:
+            return None
+        w = weights[i] * units
+        v = values[i] * units
+        candidate = best[: capacity + 1 - w] + v
+        take = candidate > best[w:]
+        best[w:] = np.where(take, candidate, best[w:])
+        decisions.append(np.packbits(take))
+    return best, decisions
+
+
+def _time_left(deadline: float | None) -> float | None:
+    return None if deadline is None else deadline - time.perf_counter()
+
+
+def _reconstruct(capacity: int, weights, bundles, decisions) -> dict[int, int]:
+    """Walk the decisions backwards from `capacity`; returns {item_index: qty}."""
+    quantities = {}
+    c = capacity
+    for r in range(len(bundles) - 1, -1, -1):
+        i, units = bundles[r]
+        w = weights[i] * units
+        if c < w:
+            continue
+        pos = c - w
+        if (decisions[r][pos >> 3] >> (7 - (pos & 7))) & 1:
+            quantities[i] = quantities.get(i, 0) + units
+            c -= w
+    return quantities
+
+
+def _allocations(items, quantities: dict[int, int], budget: float):
+    # lazy: recommendation imports this module
+    from .recommendation import _build_allocation
+
+    allocations = []
+    total_spent = 0.0
+    for i, qty in quantities.items():
+        product, score, price = items[i]
+        subtotal = price * qty
+        total_spent += subtotal
+        allocations.append(_build_allocation(product, qty, subtotal, score))
+
+    allocations.sort(key=lambda a: a["score_raw"], reverse=True)
+    return allocations, round(budget - total_spent, 2)
+
+
+def _solve_with_cbc(ranked_products, budget, household_size, max_qty_per_product,
+                    min_categories, max_per_category, time_limit):
+    from .lp_optimizer import solve_budget_lp
+
+    return solve_budget_lp(
+        ranked_products, budget, household_size,
+        max_qty_per_product=max_qty_per_product,
+        min_categories=min_categories, max_per_category=max_per_category,
+        time_limit=time_limit,
+    )
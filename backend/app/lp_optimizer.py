@@ -14,9 +14,49 @@ Formulation:
 Big-M trick links binary indicators y_c to product quantities:
     Σ qty_i(in cat c) ≥ y_c
     Σ qty_i(in cat c) ≤ M x y_c
+
+BudgetModel keeps the basic (no diversity) model alive for a whole catalog
+version: variables and the budget row are built once, and each request only
+rewrites objective coefficients, the budget RHS and the quantity bounds
+before re-solving with a warm start.
+
+Every call gets a time limit (LP_TIME_LIMIT_SECONDS by default) that covers
+building the problem as well as CBC: CBC runs for whatever the build left,
+less the time writing the problem out and reading the solution back is
+expected to take (learned from earlier time-limited solves).
+If it expires, CBC's best incumbent is used and the solve is reported as
+"time_limited"; with no incumbent (or no time left) the caller falls back
+to greedy.
 """
+import os
+import threading
+import time
+from collections import deque
+
 import pulp
 
+from .metrics import StageTimer
+
+# Default wall-clock limit for one CBC solve, in seconds.
+LP_TIME_LIMIT_SECONDS = float(os.getenv("LP_TIME_LIMIT_SECONDS", "2"))
+
+# Solve outcomes (RecommendSummary.solver_status)
+SOLVER_OPTIMAL = "optimal"
+SOLVER_TIME_LIMITED = "time_limited"
+
+_cbc_available = None
+# Seconds per column a CBC run takes beyond its timeLimit (see _cbc_time_limit)
+_overhead_per_column = 0.0
+
+
+def cbc_available() -> bool:
+    """Whether the CBC binary can run here; probed once per process."""
+    global _cbc_available
+    if _cbc_available is None:
+        _cbc_available = pulp.PULP_CBC_CMD(msg=0).available()
+    return _cbc_available
+
+
 def allocate_budget_lp(
     ranked_products,
     budget: float,
@@ -24,10 +64,41 @@ def allocate_budget_lp(
     max_qty_per_product: int | None = None,
     min_categories: int = 0,
     max_per_category: int | None = None,
+    model: "BudgetModel | None" = None,
+    time_limit: float | None = None,
 ):
     """
     Optimal budget allocation using Integer Linear Programming.
 
+    See solve_budget_lp() for the arguments; this drops the solver status.
+
+    Returns:
+        allocations: list of dicts (same shape as greedy version)
+        remaining_budget: float
+    """
+    allocations, remaining, _ = solve_budget_lp(
+        ranked_products, budget, household_size,
+        max_qty_per_product=max_qty_per_product,
+        min_categories=min_categories, max_per_category=max_per_category,
+        model=model, time_limit=time_limit,
+    )
+    return allocations, remaining
+
+
+def solve_budget_lp(
+    ranked_products,
+    budget: float,
+    household_size: int = 1,
+    max_qty_per_product: int | None = None,
+    min_categories: int = 0,
+    max_per_category: int | None = None,
+    model: "BudgetModel | None" = None,
+    time_limit: float | None = None,
+    timer: StageTimer | None = None,
+):
+    """
+    Budget allocation using Integer Linear Programming, with solver status.
+
     Args:
         ranked_products: list of (product, score) tuples from rank_products()
         budget: total budget in ₹
@@ -35,13 +106,39 @@ def allocate_budget_lp(
         max_qty_per_product: max units per product (default: household_size × 3)
         min_categories: minimum distinct categories required in result
         max_per_category: max total units from any single category
+        model: reusable BudgetModel for the catalog the products come from.
+            Used when no diversity constraints are requested and the model
+            isn't busy with another request; otherwise a fresh problem is built.
+        time_limit: seconds this call may take (default LP_TIME_LIMIT_SECONDS);
+            CBC gets what building the problem leaves of it
+        timer: StageTimer that gets the time spent building or updating the
+            problem ("model") and in CBC ("solve")
 
     Returns:
         allocations: list of dicts (same shape as greedy version)
         remaining_budget: float
+        status: SOLVER_OPTIMAL, SOLVER_TIME_LIMITED (best incumbent when the
+            time limit hit), or None when no solution was found in time or
+            CBC is unavailable; allocations are then empty
     """
     if not ranked_products or budget <= 0:
-        return [], round(budget, 2) if budget > 0 else 0.0
+        return [], round(budget, 2) if budget > 0 else 0.0, SOLVER_OPTIMAL
+
+    if time_limit is None:
+        time_limit = LP_TIME_LIMIT_SECONDS
+    if timer is None:
+        timer = StageTimer()
+    started = time.perf_counter()
+
+    if model is not None and not min_categories and not max_per_category:
+        if model.lock.acquire(blocking=False):
+            try:
+                return model.solve(
+                    ranked_products, budget, household_size, max_qty_per_product,
+                    time_limit=time_limit, timer=timer,
+                )
+            finally:
+                model.lock.release()
 
     # Align with greedy behavior: typically 1 unit per person in household.
     # While the user suggested household_size * 3, using household_size ensures
@@ -49,6 +146,7 @@ def allocate_budget_lp(
     # hoarding a single item when scores are negative.
     max_qty = max_qty_per_product or household_size
 
+    building = time.perf_counter()
     prob = pulp.LpProblem("NutriKart_Budget", pulp.LpMaximize)
 
     # ── Decision variables ──
@@ -59,13 +157,15 @@ def allocate_budget_lp(
         price = float(product.price_per_unit) if product.price_per_unit else 0
         if price <= 0:
             continue
+        if time.perf_counter() - started > time_limit:
+            return [], round(budget, 2), None  # building alone used up the limit
         qty_vars[idx] = pulp.LpVariable(
             f"qty_{idx}", lowBound=0, upBound=max_qty, cat="Integer"
         )
         valid_products.append((idx, product, score, price))
 
     if not valid_products:
-        return [], round(budget, 2)
+        return [], round(budget, 2), SOLVER_OPTIMAL
 
     # ── Objective: maximize total nutrition score ──
     # Note: Scores can be negative due to weights (e.g., penalties for sugar).
@@ -75,13 +175,15 @@ def allocate_budget_lp(
     min_score = min(score for _, score in ranked_products)
     offset = abs(min_score) + 1.0
 
-    prob += pulp.lpSum(
-        (score + offset) * qty_vars[idx] for idx, _, score, _ in valid_products
+    # (LpAffineExpression from (variable, coefficient) pairs: lpSum() over
+    # coefficient x variable products builds a throwaway expression per term)
+    prob += pulp.LpAffineExpression(
+        [(qty_vars[idx], score + offset) for idx, _, score, _ in valid_products]
     ), "Total_Nutrition_Score"
 
     # ── Budget constraint ──
-    prob += pulp.lpSum(
-        price * qty_vars[idx] for idx, _, _, price in valid_products
+    prob += pulp.LpAffineExpression(
+        [(qty_vars[idx], price) for idx, _, _, price in valid_products]
     ) <= budget, "Budget_Limit"
 
     # ── Category diversity constraints ──
@@ -115,24 +217,36 @@ def allocate_budget_lp(
                     qty_vars[i] for i in product_indices
                 ) <= max_per_category, f"Cat_{cat_id}_max"
 
+    timer.add("model", time.perf_counter() - building)
+
     # ── Solve ──
-    solver = pulp.PULP_CBC_CMD(msg=0)
-    if not solver.available():
+    if not cbc_available():
         # If CBC is not found, we can't solve LP. 
         # The recommendation pipeline will fall back to greedy.
-        return [], round(budget, 2)
+        return [], round(budget, 2), None
+    columns = prob.numVariables()
+    cbc_limit = _cbc_time_limit(time_limit - (time.perf_counter() - started), columns)
+    if cbc_limit is None:
+        return [], round(budget, 2), None
+    solver = pulp.PULP_CBC_CMD(msg=0, timeLimit=cbc_limit)
         
+    solving = time.perf_counter()
     prob.solve(solver)
+    status = _solver_status(prob)
+    _record_overhead(timer, time.perf_counter() - solving, cbc_limit, columns, status)
 
-    if prob.status != pulp.constants.LpStatusOptimal:
-        # Fallback to a simpler model if diversity constraints make it infeasible
-        if min_categories > 0 or max_per_category:
-            return allocate_budget_lp(
+    if status is None:
+        # Fallback to a simpler model if diversity constraints make it
+        # infeasible, using whatever is left of the time limit
+        time_left = time_limit - (time.perf_counter() - started)
+        if (min_categories > 0 or max_per_category) and time_left > 0:
+            return solve_budget_lp(
                 ranked_products, budget, household_size,
                 max_qty_per_product=max_qty_per_product,
                 min_categories=0, max_per_category=None,
+                time_limit=time_left, timer=timer,
             )
-        return [], round(budget, 2)
+        return [], round(budget, 2), None
 
     # ── Extract results ──
     allocations = []
@@ -147,7 +261,235 @@ def allocate_budget_lp(
 
     allocations.sort(key=lambda a: a["score_raw"], reverse=True)
     remaining = round(budget - total_spent, 2)
-    return allocations, remaining
+    return allocations, remaining, status
+
+
+def _cbc_time_limit(time_left: float, columns: int) -> float | None:
+    """
+    CBC's timeLimit when `time_left` seconds remain for a problem with
+    `columns` variables, or None if that leaves CBC no time at all.
+
+    timeLimit only covers CBC's search: writing the MPS file, starting CBC
+    and reading the solution back come on top, and grow with the problem.
+    That overhead is estimated per column from earlier solves.
+    """
+    limit = time_left - _overhead_per_column * columns
+    return limit if limit > 0 else None
+
+
+def _record_overhead(timer: StageTimer, elapsed: float, cbc_limit: float, columns: int, status):
+    """Record a solve taking `elapsed` seconds in `timer` and the overhead estimate."""
+    global _overhead_per_column
+    timer.add("solve", elapsed)
+    if status == SOLVER_TIME_LIMITED:
+        # CBC searched for its whole limit, the rest was overhead
+        _overhead_per_column = max(elapsed - cbc_limit, 0.0) / columns
+    else:
+        # CBC may have stopped early: elapsed only bounds the overhead
+        _overhead_per_column = min(_overhead_per_column, elapsed / columns)
+
+
+def _solver_status(prob):
+    """
+    Map CBC's result to a solve outcome.
+
+    prob.status can't tell a timeout from infeasibility (CBC stopped before
+    finding a solution reads as "Infeasible"), so sol_status is used.
+    """
+    if prob.sol_status == pulp.constants.LpSolutionOptimal:
+        return SOLVER_OPTIMAL
+    if prob.sol_status == pulp.constants.LpSolutionIntegerFeasible:
+        return SOLVER_TIME_LIMITED
+    return None
+
+
+class BudgetModel:
+    """
+    Persistent budget ILP over every priced product of the catalog.
+
+    Products that a request doesn't rank (filtered out by its health
+    condition) get an upper bound of 0, so one model serves every condition.
+    Catalog edits are applied in place with apply().
+    With grow=True the model starts from `products` (typically none) and
+    adds a column for each product the first time a request ranks it, so
+    products no request has ranked are never read (see
+    catalog_file.MappedProducts).
+    Not thread-safe: callers hold `lock` around solve() and apply().
+    """
+
+    HISTORY_SIZE = 8
+
+    def __init__(self, products=(), grow: bool = False):
+        self.lock = threading.Lock()
+        self.grow = grow
+        self.prob = pulp.LpProblem("NutriKart_Budget", pulp.LpMaximize)
+        self._vars = {}    # id(product) -> (LpVariable, price)
+        self._by_product_id = {}  # product.id -> id(product)
+        # Every product ever added, so their id() values are never reused
+        self._products = []
+        for product in products:
+            self._add(product)
+
+        self.prob += pulp.lpSum(
+            price * var for var, price in self._vars.values()
+        ) <= 0, "Budget_Limit"
+        self._budget_row = self.prob.constraints["Budget_Limit"]
+        self._active = []
+        # recent solutions as {id(product): qty}, used as warm starts
+        self._history = deque(maxlen=self.HISTORY_SIZE)
+
+    def __len__(self):
+        return len(self._vars)
+
+    def _add(self, product, var=None):
+        """Register `product`; returns its variable, or None if it has no price."""
+        price = float(product.price_per_unit) if product.price_per_unit else 0
+        if price <= 0:
+            return None
+        if var is None:
+            var = pulp.LpVariable(
+                f"qty_{len(self._products)}", lowBound=0, upBound=0, cat="Integer"
+            )
+        self._vars[id(product)] = (var, price)
+        self._by_product_id[product.id] = id(product)
+        self._products.append(product)
+        return var
+
+    def apply(self, upserts=(), deletes=()):
+        """
+        Update the model in place for edited products (matched by id).
+
+        A replaced product keeps its variable with the new price as its
+        budget coefficient, a new product gets a new column and a deleted
+        one's column is fixed at 0. Caller holds `lock`.
+        """
+        for product_id in deletes:
+            self._drop(product_id)
+        for product in upserts:
+            old = self._drop(product.id)
+            var = self._add(product, old)
+            if var is not None:
+                self._budget_row.expr[var] = self._vars[id(product)][1]
+
+    def _drop(self, product_id):
+        key = self._by_product_id.pop(product_id, None)
+        if key is None:
+            return None
+        var, _ = self._vars.pop(key)
+        # PuLP can't remove a column from a problem, so a retired variable
+        # stays in the budget row, fixed at 0 (the next reload rebuilds).
+        var.upBound = 0
+        return var
+
+    def solve(self, ranked_products, budget, household_size=1, max_qty_per_product=None,
+              time_limit=None, timer=None):
+        """Same contract and results as solve_budget_lp() without diversity."""
+        if not ranked_products or budget <= 0:
+            return [], round(budget, 2) if budget > 0 else 0.0, SOLVER_OPTIMAL
+        if time_limit is None:
+            time_limit = LP_TIME_LIMIT_SECONDS
+        if timer is None:
+            timer = StageTimer()
+
+        started = updating = time.perf_counter()
+        max_qty = max_qty_per_product or household_size
+        candidates = []
+        for product, score in ranked_products:
+            entry = self._vars.get(id(product))
+            if entry is None and self.grow and self._add(product) is not None:
+                entry = self._vars[id(product)]
+                self._budget_row.expr[entry[0]] = entry[1]
+            if entry is not None:
+                candidates.append((product, score, entry[0], entry[1]))
+        if not candidates:
+            return [], round(budget, 2), SOLVER_OPTIMAL
+
+        # Same positive shift as allocate_budget_lp
+        min_score = min(score for _, score in ranked_products)
+        offset = abs(min_score) + 1.0
+
+        # ── Update bounds, objective and budget RHS ──
+        for var in self._active:
+            var.upBound = 0
+            var.setInitialValue(0)
+        self._active = [var for _, _, var, _ in candidates]
+        for var in self._active:
+            var.upBound = max_qty
+        self.prob.setObjective(pulp.LpAffineExpression(
+            [(var, score + offset) for _, score, var, _ in candidates]
+        ))
+        self._budget_row.changeRHS(budget)
+
+        # ── Warm start ──
+        # Columns outside this request keep value 0 (their bound), so the
+        # start only has to cover the candidates.
+        start = self._warm_start(candidates, budget, max_qty)
+        for product, _, var, _ in candidates:
+            var.setInitialValue(start.get(id(product), 0))
+        timer.add("model", time.perf_counter() - updating)
+
+        if not cbc_available():
+            return [], round(budget, 2), None
+        # every column is written out, including those bounded to 0
+        columns = len(self._products)
+        cbc_limit = _cbc_time_limit(time_limit - (time.perf_counter() - started), columns)
+        if cbc_limit is None:
+            return [], round(budget, 2), None
+        solver = pulp.PULP_CBC_CMD(msg=0, warmStart=True, timeLimit=cbc_limit)
+        solving = time.perf_counter()
+        self.prob.solve(solver)
+        status = _solver_status(self.prob)
+        _record_overhead(timer, time.perf_counter() - solving, cbc_limit, columns, status)
+
+        if status is None:
+            return [], round(budget, 2), None
+
+        # ── Extract results ──
+        allocations = []
+        solution = {}
+        total_spent = 0.0
+        for product, score, var, price in candidates:
+            qty = int(var.value() or 0)
+            if qty <= 0:
+                continue
+            solution[id(product)] = qty
+            subtotal = price * qty
+            total_spent += subtotal
+            allocations.append(_build_allocation_lp(product, qty, subtotal, score))
+        self._history.append(solution)
+
+        allocations.sort(key=lambda a: a["score_raw"], reverse=True)
+        remaining = round(budget - total_spent, 2)
+        return allocations, remaining, status
+
+    def _warm_start(self, candidates, budget, max_qty):
+        """
+        Feasible starting point for this request.
+
+        Previous solutions are clipped to the new bounds (dropping products
+        outside this request's candidates); the feasible one spending the
+        most is used. Without one, a greedy fill in rank order is used.
+        """
+        prices = {id(product): price for product, _, _, price in candidates}
+        best, best_spent = None, -1.0
+        for solution in self._history:
+            clipped = {
+                key: min(qty, max_qty) for key, qty in solution.items() if key in prices
+            }
+            spent = sum(prices[key] * qty for key, qty in clipped.items())
+            if best_spent < spent <= budget:
+                best, best_spent = clipped, spent
+        if best is not None:
+            return best
+
+        start, remaining = {}, budget
+        for product, _, _, price in candidates:
+            qty = min(max_qty, int(remaining // price))
+            if qty > 0:
+                start[id(product)] = qty
+                remaining -= price * qty
+        return start
+
 
 def _build_allocation_lp(product, quantity: int, subtotal: float, score: float) -> dict:
     """Build allocation dict. Same shape as greedy for drop-in swap."""
@@ -1,12 +1,25 @@
-from fastapi import FastAPI
-from .routes import categories, products, recommend
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Response
+from . import warmup
+from .database import DB_ASYNC
+from .metrics import METRICS_ENABLED
+from .routes import aio, categories, metrics, products, recommend
 from fastapi.middleware.cors import CORSMiddleware
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
-app = FastAPI(title="NutriKart API")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if warmup.WARMUP:
+        warmup.start()  # in the background; GET /ready reports when done
+    yield
+
+
+app = FastAPI(title="NutriKart API", lifespan=lifespan)
 
 # In production set ALLOWED_ORIGINS to your Vercel URL, e.g.:
 #   ALLOWED_ORIGINS=https://nutrikart.vercel.app
@@ -27,10 +40,24 @@ app.add_middleware(
 )
 
 # Include routers
+if DB_ASYNC:
+    # Registered first, so the async read endpoints take precedence
+    app.include_router(aio.router)
 app.include_router(categories.router)
 app.include_router(products.router)
 app.include_router(recommend.router)
+if METRICS_ENABLED:
+    app.include_router(metrics.router)
 
 @app.get("/")
 def read_root():
     return {"message": "NutriKart API is Running!"}
+
+
+@app.get("/ready")
+def read_ready(response: Response):
+    """503 until the startup warm-up (WARMUP=1) has finished, then 200."""
+    state = warmup.status()
+    if not state["ready"]:
+        response.status_code = 503
+    return state
@@ -0,0 +1,207 @@
+"""
+In-process metrics in the Prometheus text format, served at GET /metrics.
+
+Histograms and counters are plain thread-safe objects created at import
+time; modules observe into them directly. Values that already live
+elsewhere (cache counters) are read at scrape time by callbacks registered
+with on_collect(). With several uvicorn workers each process reports its
+own numbers, as with any in-process Prometheus client.
+
+StageTimer measures the stages of one request (db, cache, filter, rank,
+model, solve, ...). The /recommend route hands one to get_recommendation()
+(pool workers send theirs back with the result) and feeds it into
+RECOMMEND_STAGE_SECONDS and the Server-Timing header.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# METRICS_ENABLED=0 removes GET /metrics (timings are still collected)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") != "0"
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+class StageTimer:
+    """Wall time per named stage: `with timer.stage("rank"): ...`."""
+
+    def __init__(self):
+        self.seconds = {}
+        self.started = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def add(self, name: str, seconds: float):
+        self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+
+    def update(self, timings_ms: dict):
+        """Merge {stage: milliseconds} recorded elsewhere (see as_ms())."""
+        for name, ms in timings_ms.items():
+            self.add(name, ms / 1000)
+
+    def elapsed(self) -> float:
+        """Seconds since the timer was created."""
+        return time.perf_counter() - self.started
+
+    def as_ms(self) -> dict:
+        return {name: round(seconds * 1000, 3) for name, seconds in self.seconds.items()}
+
+
+def server_timing(timings_ms: dict) -> str:
+    """Server-Timing header value, e.g. "db;dur=0.41, rank;dur=1.2"."""
+    return ", ".join(f"{name};dur={ms:g}" for name, ms in timings_ms.items())
+
+
+# ── Metric types ──
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name: str, help: str, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(label, "")) for label in self.labels)
+
+    def _label_text(self, key: tuple, extra: str = "") -> str:
+        pairs = [f'{label}="{_escape(value)}"' for label, value in zip(self.labels, key)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labels=()):
+        super().__init__(name, help, labels)
+        self._values = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def render(self) -> list[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return super().render() + [
+            f"{self.name}{self._label_text(key)} {_number(value)}" for key, value in values
+        ]
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # key -> [bucket counts..., count, sum]
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            return series[-2] if series else 0
+
+    def render(self) -> list[str]:
+        with self._lock:
+            series = sorted((key, list(values)) for key, values in self._series.items())
+        lines = super().render()
+        for key, values in series:
+            bounds = [f"{bound:g}" for bound in self.buckets] + ["+Inf"]
+            for bound, count in zip(bounds, values):
+                le = self._label_text(key, 'le="' + bound + '"')
+                lines.append(f"{self.name}_bucket{le} {count}")
+            lines.append(f"{self.name}_sum{self._label_text(key)} {_number(values[-1])}")
+            lines.append(f"{self.name}_count{self._label_text(key)} {values[-2]}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# ── Registry ──
+
+_registry: list[_Metric] = []
+_collectors = []
+
+
+def on_collect(callback):
+    """
+    Register callback() -> [(name, type, help, value)] for values read at scrape time.
+
+    type is "gauge" or "counter"; value is a number or a {labels: number}
+    dict keyed by tuples of (label, value) pairs.
+    """
+    _collectors.append(callback)
+    return callback
+
+
+def render() -> str:
+    """Every metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    for callback in _collectors:
+        for name, type, help, value in callback():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {type}")
+            samples = value.items() if isinstance(value, dict) else [((), value)]
+            for labels, number in samples:
+                text = ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels)
+                lines.append(f"{name}{{{text}}} {_number(number)}" if text else f"{name} {_number(number)}")
+    return "\n".join(lines) + "\n"
+
+
+# ── Recommendation metrics ──
+
+RECOMMEND_STAGE_SECONDS = Histogram(
+    "nutrikart_recommend_stage_seconds",
+    "Time spent per POST /recommend stage (db, cache, filter, rank, model, solve, allocate, total).",
+    labels=("stage",),
+)
+SOLVER_STATUS = Counter(
+    "nutrikart_solver_status_total",
+    "Recommendation solves by allocation method and solver status.",
+    labels=("method", "status"),
+)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Numeric, Text, ForeignKey, Index
+from sqlalchemy import BigInteger, Column, Integer, String, Numeric, Text, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from .database import Base
 
@@ -33,4 +33,18 @@ class Product(Base):
 
     __table_args__ = (
         Index("ix_products_name", "name"),
-    )
\ No newline at end of file
+        # Columns with hard health constraints (see app/queries.py)
+        Index("ix_products_sugar", "sugar"),
+        Index("ix_products_sodium", "sodium"),
+        Index("ix_products_calories", "calories"),
+        Index("ix_products_fat", "fat"),
+        Index("ix_products_saturated_fat", "saturated_fat"),
+    )
+
+
+class CatalogVersion(Base):
+    """One row (id 1) counting catalog writes; the catalog ETag derives from it."""
+    __tablename__ = "catalog_version"
+
+    id      = Column(Integer, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
@@ -0,0 +1,193 @@
+"""
+SQL read paths for the recommendation engine.
+
+Health constraints
+------------------
+
+HEALTH_CONSTRAINTS is applied in Python by filter_products(); the helpers
+here compile the same rules into a WHERE clause so the database only
+returns eligible rows. Missing nutrition data passes, exactly like the
+Python filter:
+
+    (sugar IS NULL OR sugar <= 5.0) AND (calories IS NULL OR calories <= 200.0)
+
+Each constrained column has a b-tree index (see models.Product), which lets
+Postgres answer the OR per column with a BitmapOr of the IS NULL and range
+scans instead of reading the whole table.
+
+Product listing
+---------------
+product_list_statement() builds the GET /products query: the category name
+comes from a join (no second query), pages are keyset-paginated on the
+primary key (WHERE id > :after_id ORDER BY id LIMIT n, so every page costs
+the same however deep it is), and with `fields` only the requested columns
+are selected. product_batch_statement() fetches a list of ids the same
+way (GET /products/batch, GET /products/{id}).
+
+Lightweight rows
+----------------
+The pipeline reads 13 fields per product. load_product_rows() selects just
+those with a Core select() (category name via a join) and returns
+ProductRow records: plain __slots__ objects with the numbers already
+converted to float. That skips ORM identity-map bookkeeping, relationship
+state and Decimal objects, which dominate memory for large catalogs.
+"""
+from sqlalchemy import Float, and_, or_, select, type_coerce
+
+from .models import Category, Product
+from .recommendation import CONSTRAINT_FIELD_MAP, HEALTH_CONSTRAINTS
+
+
+def health_filter_clause(health_condition: str | None):
+    """
+    WHERE clause for the hard constraints of `health_condition`.
+
+    Returns None when nothing is filtered (no or unknown condition), the
+    same cases in which filter_products() returns every product.
+    """
+    if not health_condition or health_condition not in HEALTH_CONSTRAINTS:
+        return None
+
+    clauses = []
+    for constraint_key, max_value in HEALTH_CONSTRAINTS[health_condition].items():
+        column = getattr(Product, CONSTRAINT_FIELD_MAP[constraint_key])
+        clauses.append(or_(column.is_(None), column <= max_value))
+    return and_(*clauses)
+
+
+# Selectable GET /products fields (sat_fat is the response alias of saturated_fat)
+PRODUCT_FIELDS = {
+    "id": Product.id,
+    "name": Product.name,
+    "category_id": Product.category_id,
+    "category_name": Category.name,
+    "price_per_unit": Product.price_per_unit,
+    "serving_size": Product.serving_size,
+    "calories": Product.calories,
+    "sugar": Product.sugar,
+    "sodium": Product.sodium,
+    "protein": Product.protein,
+    "fat": Product.fat,
+    "saturated_fat": Product.saturated_fat,
+    "sat_fat": Product.saturated_fat,
+    "fiber": Product.fiber,
+    "image_url": Product.image_url,
+}
+
+
+def product_list_statement(
+    category_id: int | None = None,
+    health_condition: str | None = None,
+    after_id: int | None = None,
+    limit: int | None = None,
+    fields: list[str] | None = None,
+):
+    """
+    SELECT for GET /products, ordered by id.
+
+    Rows are (Product, category_name) or, with `fields`, one column per
+    requested field in that order.
+    """
+    if fields:
+        columns = [PRODUCT_FIELDS[field].label(field) for field in fields]
+    else:
+        columns = [Product, Category.name.label("category_name")]
+    stmt = (
+        select(*columns)
+        .select_from(Product)
+        .outerjoin(Category, Product.category_id == Category.id)
+        .order_by(Product.id)
+    )
+
+    clause = health_filter_clause(health_condition)
+    if clause is not None:
+        stmt = stmt.where(clause)
+    if category_id:
+        stmt = stmt.where(Product.category_id == category_id)
+    if after_id is not None:
+        stmt = stmt.where(Product.id > after_id)
+    if limit:
+        stmt = stmt.limit(limit)
+    return stmt
+
+
+def product_batch_statement(ids):
+    """SELECT of (Product, category_name) for the products in `ids`, any order."""
+    return (
+        select(Product, Category.name.label("category_name"))
+        .select_from(Product)
+        .outerjoin(Category, Product.category_id == Category.id)
+        .where(Product.id.in_(ids))
+    )
+
+
+class ProductRow:
+    """Read-only product record used by the recommendation pipeline."""
+
+    __slots__ = (
+        "id",
+        "name",
+        "category_id",
+        "category_name",
+        "price_per_unit",
+        "calories",
+        "sugar",
+        "sodium",
+        "protein",
+        "fat",
+        "saturated_fat",
+        "fiber",
+        "image_url",
+    )
+
+    def __init__(self, *values, **fields):
+        """ProductRow(*values) in __slots__ order, or by keyword."""
+        for name, value in zip(self.__slots__, values):
+            setattr(self, name, value)
+        for name in self.__slots__[len(values):]:
+            setattr(self, name, fields.get(name))
+
+    def __repr__(self):
+        return f"ProductRow(id={self.id!r}, name={self.name!r})"
+
+    @classmethod
+    def from_product(cls, product, category_name: str | None = None) -> "ProductRow":
+        """Record for a Product instance (e.g. one just written by a route)."""
+        row = cls(**{name: getattr(product, name, None) for name in cls.__slots__})
+        row.category_name = category_name
+        for name in cls.__slots__[4:12]:
+            value = getattr(row, name)
+            if value is not None:
+                setattr(row, name, float(value))
+        return row
+
+
+# Selected in ProductRow.__slots__ order. Numeric columns are read as float
+# by the result processor, so no Decimal is ever built.
+_ROW_COLUMNS = (
+    Product.id,
+    Product.name,
+    Product.category_id,
+    Category.name,
+    *(
+        type_coerce(getattr(Product, field), Float)
+        for field in ProductRow.__slots__[4:12]
+    ),
+    Product.image_url,
+)
+
+
+def load_product_rows(db, health_condition: str | None = None) -> list[ProductRow]:
+    """
+    Products passing the hard constraints of `health_condition` (filtered in
+    SQL) as ProductRow records, in id order.
+    """
+    stmt = (
+        select(*_ROW_COLUMNS)
+        .outerjoin(Category, Product.category_id == Category.id)
+        .order_by(Product.id)
+    )
+    clause = health_filter_clause(health_condition)
+    if clause is not None:
+        stmt = stmt.where(clause)
+    return [ProductRow(*row) for row in db.execute(stmt).tuples()]
@@ -1,5 +1,14 @@
+import importlib.util
+import os
+import time
 from decimal import Decimal
 
+import numpy as np
+
+from app.columnar import ProductColumns
+from app.knapsack import budget_frontier, solve_budget_knapsack
+from app.metrics import StageTimer
+
 # HARD Constraints
 
 HEALTH_CONSTRAINTS = {
@@ -30,34 +39,32 @@ CONSTRAINT_FIELD_MAP = {
 
 # Remove products that violate hard constraints for the given condition.
 # If health_condition is None or not recognized, return all products.
+# Accepts a product list or a prebuilt ProductColumns.
 
 
 def filter_products(products, health_condition: str | None):
-    if not health_condition or health_condition not in HEALTH_CONSTRAINTS:
-        return list(products)  # no filtering
-
-    constraints = HEALTH_CONSTRAINTS[health_condition]
-    filtered = []
+    columns = _as_columns(products)
+    return columns.take(_eligible_rows(columns, health_condition))
 
-    for product in products:
-        passes = True
-        for constraint_key, max_value in constraints.items():
-            field_name = CONSTRAINT_FIELD_MAP[constraint_key]
-            product_value = getattr(product, field_name, None)
 
-            # If nutrition data is missing, let the product through
-            # (don't penalize incomplete data)
-            if product_value is None:
-                continue
+def _as_columns(products) -> ProductColumns:
+    if isinstance(products, ProductColumns):
+        return products
+    return ProductColumns(products)
 
-            if product_value > max_value:
-                passes = False
-                break  # one violation = out
 
-        if passes:
-            filtered.append(product)
+def _eligible_rows(columns: ProductColumns, health_condition: str | None):
+    """Row indices passing the hard constraints, or None for "all rows"."""
+    if not health_condition or health_condition not in HEALTH_CONSTRAINTS:
+        return None  # no filtering
 
-    return filtered
+    limits = {
+        CONSTRAINT_FIELD_MAP[constraint_key]: float(max_value)
+        for constraint_key, max_value in HEALTH_CONSTRAINTS[health_condition].items()
+    }
+    # If nutrition data is missing the product passes
+    # (don't penalize incomplete data)
+    return np.flatnonzero(columns.mask(limits))
 
 
 
@@ -116,15 +123,20 @@ def score_product(product, health_condition: str | None) -> float:
 
 
 # Score all products, return sorted best-first.
-# Returns: list of (product, score) tuples.None
+# Returns: list of (product, score) tuples.
+# Scores are identical to score_product(); ties keep input order.
 
 def rank_products(products, health_condition: str | None):
-    scored = [
-        (product, score_product(product, health_condition))
-        for product in products
-    ]
-    scored.sort(key=lambda x: x[1], reverse=True)
-    return scored
+    weights = SCORING_WEIGHTS.get(health_condition, DEFAULT_WEIGHTS)
+    return _as_columns(products).rank(weights)
+
+
+# Same order as rank_products(), but produced lazily (top-K batches)
+# so a consumer that stops early never sorts the whole list.
+
+def iter_ranked_products(products, health_condition: str | None):
+    weights = SCORING_WEIGHTS.get(health_condition, DEFAULT_WEIGHTS)
+    return _as_columns(products).iter_ranked(weights)
 
 ### How to read a score
 
@@ -142,12 +154,17 @@ def allocate_budget(
     ranked_products,
     budget: float,
     household_size: int = 1,
+    min_price: float | None = None,
 ):
     """
     Greedy budget allocation: buy from best-scored products first.
     
     household_size multiplies the base quantity per product.
     A family of 4 gets 4 units where a single person gets 1.
+
+    ranked_products may be a lazy iterator (iter_ranked_products). When
+    min_price (cheapest candidate price) is given, allocation stops as soon
+    as the remaining budget can't buy anything, without pulling the rest.
     
     Returns:
         allocations: list of dicts (product info + quantity + subtotal)
@@ -160,7 +177,7 @@ def allocate_budget(
     allocations = []
 
     for product, score in ranked_products:
-        if remaining <= 0:
+        if remaining <= 0 or (min_price is not None and remaining < min_price):
             break
 
         price = float(product.price_per_unit) if product.price_per_unit else 0
@@ -185,11 +202,26 @@ def allocate_budget(
 
     return allocations, round(remaining, 2)
 
-try:
-    from app.lp_optimizer import allocate_budget_lp
-    LP_AVAILABLE = True
-except ImportError:
-    LP_AVAILABLE = False
+# PuLP is only imported by the first LP solve (app.lp_optimizer is imported
+# lazily below), keeping it off the startup path.
+LP_AVAILABLE = importlib.util.find_spec("pulp") is not None
+# Same setting as lp_optimizer's default solver time limit
+LP_TIME_LIMIT_SECONDS = float(os.getenv("LP_TIME_LIMIT_SECONDS", "2"))
+# LP_SHARED_MODEL=1 reuses one BudgetModel per catalog version for LP solves.
+# Off by default: CBC is handed the whole problem through a file on every
+# solve, so the shared model (which writes every catalog column) measures
+# slower than a fresh problem over the request's candidates.
+LP_SHARED_MODEL = os.getenv("LP_SHARED_MODEL", "0") == "1"
+
+
+def solve_budget_lp(*args, **kwargs):
+    """app.lp_optimizer.solve_budget_lp(), importing PuLP on first use."""
+    from app.lp_optimizer import solve_budget_lp
+    return solve_budget_lp(*args, **kwargs)
+
+
+# allocation_method values accepted by get_recommendation()
+ALLOCATION_METHODS = ("greedy", "lp", "knapsack")
 
 
 def get_recommendation(
@@ -198,24 +230,304 @@ def get_recommendation(
     budget: float,
     household_size: int = 1,
     use_lp: bool = True,
+    lp_model=None,
+    allocation_method: str | None = None,
+    time_limit: float | None = None,
+    timer: StageTimer | None = None,
 ):
-    # filter (1)
-    filtered = filter_products(products, health_condition)
-
-    # score and rank
-    ranked = rank_products(filtered, health_condition)
+    # time_limit is the latency budget (seconds) for this call, counted from
+    # when `timer` started (the request start, for the routes): the solver
+    # gets whatever came before it left. When the solver can't produce an
+    # answer in time, the greedy result is returned instead.
+    # timer, if given, gets the time spent per stage (filter, rank, model,
+    # solve, allocate).
+    if timer is None:
+        timer = StageTimer()
+    started = timer.started
+    columns = _as_columns(products)
+
+    # filter (1), then score and rank: done once per catalog and condition
+    with timer.stage("filter"):
+        ranking = _ranking_for(columns, health_condition)
 
     # allocate budget
-    if use_lp and LP_AVAILABLE:
-        allocations, remaining_budget = allocate_budget_lp(
-            ranked, budget, household_size
-        )
-        allocation_method = "lp"
-    else:
-        allocations, remaining_budget = allocate_budget(
-            ranked, budget, household_size
-        )
+    return _recommend(
+        ranking, budget, household_size,
+        _resolve_method(use_lp, allocation_method), lp_model,
+        deadline=started + (LP_TIME_LIMIT_SECONDS if time_limit is None else time_limit),
+        timer=timer,
+    )
+
+
+def get_recommendations(
+    products,
+    requests,
+    use_lp: bool = True,
+    lp_model=None,
+    allocation_method: str | None = None,
+    time_limit: float | None = None,
+):
+    """
+    get_recommendation() for many (health_condition, budget, household_size)
+    requests at once, returning results in the same order.
+
+    Filtering and ranking run once per distinct health_condition, and all LP
+    solves share one BudgetModel (lp_model, or with LP_SHARED_MODEL one
+    built for the batch). time_limit applies to each request separately.
+
+    Args:
+        requests: iterable of dicts with health_condition, budget and
+            (optionally) household_size
+    """
+    columns = _as_columns(products)
+    method = _resolve_method(use_lp, allocation_method)
+    if method == "lp" and lp_model is None and LP_AVAILABLE and LP_SHARED_MODEL:
+        from app.lp_optimizer import BudgetModel
+        lp_model = BudgetModel(columns.products)
+    if time_limit is None:
+        time_limit = LP_TIME_LIMIT_SECONDS
+
+    rankings = {}
+    results = []
+    for request in requests:
+        started = time.perf_counter()
+        timer = StageTimer()
+        condition = request.get("health_condition")
+        if condition not in rankings:
+            with timer.stage("filter"):
+                rankings[condition] = _ranking_for(columns, condition)
+        results.append(_recommend(
+            rankings[condition], request["budget"], request.get("household_size", 1),
+            method, lp_model, deadline=started + time_limit, timer=timer,
+        ))
+    return results
+
+
+def get_budget_frontier(
+    products,
+    health_condition: str | None,
+    budgets,
+    household_size: int = 1,
+    time_limit: float | None = None,
+):
+    """
+    Optimal allocations for a grid of budgets, plus the score-vs-budget curve.
+
+    One knapsack DP over the largest budget answers every budget, instead of
+    one solve per budget. "objective" is the maximized shifted score
+    Σ (score + offset) x qty, which never decreases as the budget grows.
+    """
+    ranking = _ranking_for(_as_columns(products), health_condition)
+    frontier = budget_frontier(
+        ranking.ranked(), budgets, household_size,
+        time_limit=LP_TIME_LIMIT_SECONDS if time_limit is None else time_limit,
+    )
+
+    points = []
+    for budget, (allocations, remaining, objective) in zip(budgets, frontier["points"]):
+        points.append({
+            "budget": budget,
+            "total_products": len(allocations),
+            "total_spent": round(sum(a["subtotal"] for a in allocations), 2),
+            "remaining_budget": round(remaining, 2),
+            "objective": round(objective, 2),
+            "total_calories": round(sum(a["calories"] * a["quantity"] for a in allocations), 2),
+            "total_protein": round(sum(a["protein"] * a["quantity"] for a in allocations), 2),
+            "recommendations": allocations,
+        })
+    return {
+        "health_condition": health_condition,
+        "household_size": household_size,
+        "products_after_filter": len(ranking),
+        "points": points,
+        "breakpoints": [
+            {"budget": budget, "objective": round(objective, 2)}
+            for budget, objective in frontier["breakpoints"]
+        ],
+    }
+
+
+def _resolve_method(use_lp: bool, allocation_method: str | None) -> str:
+    # allocation_method picks the backend explicitly; when None, use_lp
+    # chooses between "lp" and "greedy" as before.
+    if allocation_method is None:
+        allocation_method = "lp" if use_lp else "greedy"
+    if allocation_method == "lp" and not LP_AVAILABLE:
         allocation_method = "greedy"
+    return allocation_method
+
+
+def precompute_rankings(columns: ProductColumns, conditions=None):
+    """
+    Filter, score and sort `columns` for every condition up front.
+
+    conditions defaults to every condition in SCORING_WEIGHTS plus None
+    (default weights). Rankings are kept in columns.memo, so each catalog
+    version is filtered and scored once per condition; requests then read
+    a ranked, pre-filtered list directly.
+    """
+    if conditions is None:
+        conditions = (*SCORING_WEIGHTS, None)
+    for condition in conditions:
+        _ranking_for(columns, condition).sort()
+
+
+def apply_rankings(old: ProductColumns, new: ProductColumns, upserts=(), deletes=()):
+    """
+    Carry the rankings computed for `old` over to `new` (which must be
+    old.apply(upserts, deletes)).
+
+    Only the changed rows are filtered and scored; they are merged into the
+    existing order instead of sorting every row again. Rankings `old`
+    hasn't sorted are left for precompute_rankings() or first use.
+    """
+    index = old.index
+    replaced = {index[p.id] for p in upserts if p.id in index}
+    dropped = np.array(sorted({index[i] for i in deletes if i in index}), dtype=np.intp)
+    stale = np.union1d(np.fromiter(replaced, dtype=np.intp, count=len(replaced)), dropped)
+    # rows to score in `new`: replaced ones where they moved to, then appended ones
+    kept = np.setdiff1d(stale, dropped)
+    fresh = np.concatenate([
+        kept - np.searchsorted(dropped, kept),
+        np.arange(len(old) - len(dropped), len(new)),
+    ])
+    for key, ranking in list(old.memo.items()):
+        if key[0] != "ranking" or ranking._order is None:
+            continue
+        patched = _Ranking(new, ranking.health_condition)
+        patched._order = patched._merge(ranking._order, stale, dropped, fresh)
+        new.memo.setdefault(key, patched)
+
+
+_UNSET = object()
+
+
+def _ranking_for(columns: ProductColumns, health_condition: str | None) -> "_Ranking":
+    """The shared _Ranking of `columns` for a condition, created on first use."""
+    key = ("ranking", health_condition)
+    ranking = columns.memo.get(key)
+    if ranking is None:
+        # Concurrent first uses may both build one; either is correct
+        ranking = columns.memo.setdefault(key, _Ranking(columns, health_condition))
+    return ranking
+
+
+class _Ranking:
+    """
+    Filtered rows of a catalog for one condition, ranked on first use.
+
+    Instances from _ranking_for() are shared by every request against the
+    same columns, so the filter/score/sort work is done once per version.
+    """
+
+    def __init__(self, columns: ProductColumns, health_condition: str | None):
+        self.columns = columns
+        self.health_condition = health_condition
+        self.rows = _eligible_rows(columns, health_condition)
+        self.weights = SCORING_WEIGHTS.get(health_condition, DEFAULT_WEIGHTS)
+        self._order = None   # (row numbers, scores), best first
+        self._ranked = None
+        self._min_price = _UNSET
+
+    def __len__(self):
+        return len(self.columns) if self.rows is None else len(self.rows)
+
+    def sort(self):
+        """Compute the full order (without building the tuple list)."""
+        if self._order is None:
+            self._order = self.columns.order(self.weights, self.rows)
+        return self._order
+
+    def _merge(self, order, stale, dropped, fresh):
+        """
+        This ranking's order, from the `order` of the catalog it was edited
+        from (see apply_rankings()), or None if too many rows changed for a
+        merge to beat sorting.
+        """
+        rows, scores = order
+        keep = ~np.isin(rows, stale)
+        rows, scores = rows[keep], scores[keep]
+        rows = rows - np.searchsorted(dropped, rows)  # renumber past deleted rows
+        if self.rows is not None:
+            fresh = fresh[np.isin(fresh, self.rows)]
+        if fresh.size > len(rows) // 16:
+            return None
+        fresh_scores = self.columns.scores(self.weights, fresh)
+        by_rank = np.lexsort((fresh, -fresh_scores))
+        fresh, fresh_scores = fresh[by_rank], fresh_scores[by_rank]
+
+        # rows is sorted by (-score, row), as a stable sort leaves it
+        negated = -scores
+        positions = np.empty(fresh.size, dtype=np.intp)
+        for j, (row, score) in enumerate(zip(fresh.tolist(), fresh_scores.tolist())):
+            lo = np.searchsorted(negated, -score, "left")
+            hi = np.searchsorted(negated, -score, "right")
+            positions[j] = lo + np.searchsorted(rows[lo:hi], row)
+        return np.insert(rows, positions, fresh), np.insert(scores, positions, fresh_scores)
+
+    def ranked(self):
+        """Full (product, score) list, best first."""
+        if self._ranked is None:
+            self._ranked = self.columns.pairs(*self.sort())
+        return self._ranked
+
+    def min_price(self) -> float | None:
+        if self._min_price is _UNSET:
+            self._min_price = self.columns.min_price(self.rows)
+        return self._min_price
+
+    def lazy(self):
+        """Same order as ranked(), without sorting everything if not done yet."""
+        if self._ranked is not None:
+            return iter(self._ranked)
+        if self._order is not None:
+            return _iter_pairs(self.columns.products, *self._order)
+        return self.columns.iter_ranked(self.weights, self.rows)
+
+
+def _iter_pairs(products, rows, scores, batch_size: int = 64):
+    # doubling slices, so a consumer that stops early converts little
+    start = 0
+    while start < len(rows):
+        stop = start + batch_size
+        for i, score in zip(rows[start:stop].tolist(), scores[start:stop].tolist()):
+            yield products[i], score
+        start = stop
+        batch_size *= 2
+
+
+def _recommend(ranking: _Ranking, budget, household_size, allocation_method, lp_model, deadline,
+               timer: StageTimer):
+    solver_status = None
+    if allocation_method in ("knapsack", "lp"):
+        with timer.stage("rank"):
+            ranked = ranking.ranked()
+        time_left = deadline - time.perf_counter()
+        if time_left <= 0:
+            pass  # no time left for a solver
+        elif allocation_method == "knapsack":
+            with timer.stage("solve"):
+                allocations, remaining_budget, solver_status = solve_budget_knapsack(
+                    ranked, budget, household_size, time_limit=time_left
+                )
+        else:
+            # records its own "model" and "solve" stages
+            allocations, remaining_budget, solver_status = solve_budget_lp(
+                ranked, budget, household_size, model=lp_model, time_limit=time_left,
+                timer=timer,
+            )
+        if solver_status is None:
+            allocation_method = "greedy"
+            solver_status = "fallback"
+
+    if allocation_method == "greedy":
+        # greedy only looks at the top of the ranking: pull it lazily
+        # (so ranking time is part of "allocate")
+        with timer.stage("allocate"):
+            allocations, remaining_budget = allocate_budget(
+                ranking.lazy(), budget, household_size,
+                min_price=ranking.min_price(),
+            )
 
     # summary stats
     total_spent = sum(a["subtotal"] for a in allocations)
@@ -231,11 +543,12 @@ def get_recommendation(
             "budget": budget,
             "total_calories": round(total_calories, 2),
             "total_protein": round(total_protein, 2),
-            "products_considered": len(products),
-            "products_after_filter": len(filtered),
-            "health_condition": health_condition,
+            "products_considered": len(ranking.columns),
+            "products_after_filter": len(ranking),
+            "health_condition": ranking.health_condition,
             "household_size": household_size,
             "allocation_method": allocation_method,
+            "solver_status": solver_status,
         },
     }
 
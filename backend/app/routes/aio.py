@@ -0,0 +1,130 @@
+"""
+Async versions of the read endpoints, used when DB_ASYNC=1.
+
+main.py registers this router ahead of the sync ones, so these handlers
+shadow GET /products, GET /products/batch, GET /products/{id},
+GET /categories and POST /recommend. Database I/O awaits on the asyncio engine instead of
+holding a threadpool thread, so one worker can keep far more requests in
+flight than the threadpool size. CPU-bound recommendation work is still
+handed to the threadpool (or the process pool, see workers.py) so it
+never blocks the event loop. Write endpoints stay sync.
+"""
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from . import recommend as recommend_routes
+from .products import (
+    _check_health_condition,
+    _page_limit,
+    _parse_fields,
+    _parse_ids,
+    _product_batch,
+    _product_page,
+    _with_category,
+)
+from ..catalog import get_catalog_async, load_products
+from ..database import get_async_db
+from ..http_cache import catalog_not_modified_async
+from ..metrics import StageTimer
+from ..models import Category
+from ..queries import product_batch_statement, product_list_statement
+from ..schemas import (
+    CategoryResponse,
+    ProductBatchResponse,
+    ProductResponse,
+    RecommendRequest,
+    RecommendResponse,
+)
+
+router = APIRouter()
+
+
+@router.get("/products/", response_model=List[ProductResponse], tags=["products"])
+async def get_products(
+    request: Request,
+    response: Response,
+    category_id: int | None = None,
+    health_condition: str | None = None,
+    after_id: int | None = None,
+    limit: int | None = None,
+    fields: str | None = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Get products with category names, ordered by id (see routes/products.py)"""
+    _check_health_condition(health_condition)
+    limit = _page_limit(limit)
+    selected = _parse_fields(fields)
+    cached = await catalog_not_modified_async(request, response, db)
+    if cached is not None:
+        return cached
+
+    stmt = product_list_statement(category_id, health_condition, after_id, limit, selected)
+    return _product_page((await db.execute(stmt)).all(), selected, limit, response)
+
+
+# Declared before /products/{product_id} so "batch" isn't parsed as an id
+@router.get("/products/batch", response_model=ProductBatchResponse, tags=["products"])
+async def get_products_batch(ids: str, request: Request, response: Response,
+                             db: AsyncSession = Depends(get_async_db)):
+    """Get many products by ID in one query (see routes/products.py)"""
+    wanted = _parse_ids(ids)
+    cached = await catalog_not_modified_async(request, response, db)
+    if cached is not None:
+        return cached
+    return _product_batch((await db.execute(product_batch_statement(wanted))).all(), wanted)
+
+
+@router.get("/products/{product_id}", response_model=ProductResponse, tags=["products"])
+async def get_product(product_id: int, request: Request, response: Response,
+                      db: AsyncSession = Depends(get_async_db)):
+    """Get a single product by ID with category name"""
+    row = (await db.execute(product_batch_statement([product_id]))).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    cached = await catalog_not_modified_async(request, response, db)  # see routes/products.py
+    if cached is not None:
+        return cached
+    return _with_category(*row)
+
+
+@router.get("/categories/", response_model=List[CategoryResponse], tags=["categories"])
+async def get_categories(request: Request, response: Response,
+                         db: AsyncSession = Depends(get_async_db)):
+    """Get all categories"""
+    cached = await catalog_not_modified_async(request, response, db)
+    if cached is not None:
+        return cached
+    return (await db.scalars(select(Category))).all()
+
+
+@router.post("/recommend", response_model=RecommendResponse)
+async def recommend(
+    request: RecommendRequest,
+    response: Response,
+    use_lp: bool = True,
+    allocation_method: str | None = None,
+    time_limit: float | None = None,
+    timings: bool = False,
+    db: AsyncSession = Depends(get_async_db),
+):
+    # ── Validate inputs ──
+    options = recommend_routes._recommend_options(request, use_lp, allocation_method, time_limit)
+    timer = StageTimer()
+
+    # ── Run pipeline ──
+    if not recommend_routes.CATALOG_CACHE:
+        with timer.stage("db"):
+            products = await db.run_sync(load_products, request.health_condition)
+        return await run_in_threadpool(
+            recommend_routes._recommend_from_rows, products, response, options, timer, timings
+        )
+    with timer.stage("db"):
+        catalog = await get_catalog_async(db)
+    return await run_in_threadpool(
+        recommend_routes._recommend_from_catalog, catalog, request, response, options,
+        timer, timings,
+    )
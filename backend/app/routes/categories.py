@@ -1,7 +1,9 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request, Response
 from sqlalchemy.orm import Session
 from typing import List
+from ..catalog import record_change
 from ..database import get_db
+from ..http_cache import bump_catalog_version, catalog_not_modified
 from ..models import Category
 from ..schemas import CategoryBase, CategoryResponse
 from fastapi import HTTPException
@@ -9,8 +11,11 @@ from fastapi import HTTPException
 router = APIRouter(prefix="/categories", tags=["categories"])
 
 @router.get("/", response_model=List[CategoryResponse])
-def get_categories(db: Session = Depends(get_db)):
+def get_categories(request: Request, response: Response, db: Session = Depends(get_db)):
     """Get all categories"""
+    cached = catalog_not_modified(request, response, db)
+    if cached is not None:
+        return cached
     return db.query(Category).all()
 
 @router.post("/", response_model=CategoryResponse, status_code=201)
@@ -21,6 +26,8 @@ def create_category(category: CategoryBase, db: Session = Depends(get_db)):
         raise HTTPException(status_code=400, detail="Category with this name already exists")
     new_category = Category(name=category.name)
     db.add(new_category)
+    bump_catalog_version(db)
     db.commit()
     db.refresh(new_category)
+    record_change()  # a new category has no products yet
     return new_category
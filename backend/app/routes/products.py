@@ -1,44 +1,126 @@
-from fastapi import APIRouter, Depends, HTTPException
+import os
+from decimal import Decimal
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from typing import List
+from ..catalog import invalidate_catalog, record_change
 from ..database import get_db
+from ..encoding import response_headers
+from ..export import EXPORT_FORMATS, iter_export
+from ..http_cache import bump_catalog_version, catalog_not_modified
+from ..ingest import INGEST_FORMATS, ingest, parse_records
 from ..models import Product, Category
-from ..schemas import ProductBase, ProductResponse
+from ..queries import (
+    PRODUCT_FIELDS,
+    ProductRow,
+    product_batch_statement,
+    product_list_statement,
+)
+from ..recommendation import HEALTH_CONSTRAINTS
+from ..schemas import ProductBase, ProductBatchResponse, ProductResponse
 
 router = APIRouter(prefix="/products", tags=["products"])
 
+# Page size when GET /products is called without `limit` (0 = whole catalog)
+PRODUCTS_PAGE_SIZE = int(os.getenv("PRODUCTS_PAGE_SIZE", "0"))
+# Largest `limit` a client may ask for
+PRODUCTS_PAGE_MAX = int(os.getenv("PRODUCTS_PAGE_MAX", "1000"))
+# Max ids accepted by one GET /products/batch call
+PRODUCTS_BATCH_MAX = int(os.getenv("PRODUCTS_BATCH_MAX", "500"))
+
 
 @router.get("/", response_model=List[ProductResponse])
 def get_products(
+    request: Request,
+    response: Response,
     category_id: int | None = None,
+    health_condition: str | None = None,
+    after_id: int | None = None,
+    limit: int | None = None,
+    fields: str | None = None,
     db: Session = Depends(get_db),
 ):
-    """Get products, optionally filtered by category_id, with category names"""
-    query = db.query(Product)
-    if category_id:
-        query = query.filter(Product.category_id == category_id)
+    """
+    Get products with category names, ordered by id.
+
+    Optional filters: category_id, and the hard constraints of a
+    health_condition (applied in SQL). Keyset pagination: pass `limit`,
+    then the X-Next-After-Id response header as `after_id` for the next
+    page. `fields=id,name,...` returns only those fields. Supports
+    If-None-Match (see http_cache.py).
+    """
+    _check_health_condition(health_condition)
+    limit = _page_limit(limit)
+    selected = _parse_fields(fields)
+    cached = catalog_not_modified(request, response, db)
+    if cached is not None:
+        return cached
+
+    stmt = product_list_statement(category_id, health_condition, after_id, limit, selected)
+    return _product_page(db.execute(stmt).all(), selected, limit, response)
+
+
+# Declared before /{product_id} so "export" isn't parsed as an id
+@router.get("/export")
+def export_products(
+    format: str = "ndjson",
+    category_id: int | None = None,
+    health_condition: str | None = None,
+    fields: str | None = None,
+):
+    """
+    Stream the whole catalog as NDJSON (default) or CSV.
+
+    Rows are read and sent in batches, so memory use doesn't grow with the
+    catalog. Accepts the same filters and `fields` as GET /products.
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid format: '{format}'. Valid options: {', '.join(EXPORT_FORMATS)}",
+        )
+    _check_health_condition(health_condition)
+    selected = _parse_fields(fields)
+
+    return StreamingResponse(
+        iter_export(format, selected, category_id, health_condition),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="products.{format}"'},
+    )
 
-    products = query.all()
 
-    cat_map = {c.id: c.name for c in db.query(Category).all()}
-    for p in products:
-        p.category_name = cat_map.get(p.category_id)
-        p.sat_fat = p.saturated_fat
+# Declared before /{product_id} so "batch" isn't parsed as an id
+@router.get("/batch", response_model=ProductBatchResponse)
+def get_products_batch(ids: str, request: Request, response: Response,
+                       db: Session = Depends(get_db)):
+    """
+    Get many products by ID in one query: `?ids=3,1,2`.
 
-    return products
+    Products come back in the requested order (duplicates once); ids with
+    no product are listed in `missing`.
+    """
+    wanted = _parse_ids(ids)
+    cached = catalog_not_modified(request, response, db)
+    if cached is not None:
+        return cached
+    return _product_batch(db.execute(product_batch_statement(wanted)).all(), wanted)
 
 
 @router.get("/{product_id}", response_model=ProductResponse)
-def get_product(product_id: int, db: Session = Depends(get_db)):
+def get_product(product_id: int, request: Request, response: Response,
+                db: Session = Depends(get_db)):
     """Get a single product by ID with category name"""
-    product = db.query(Product).filter(Product.id == product_id).first()
-    if not product:
+    row = db.execute(product_batch_statement([product_id])).first()
+    if row is None:
         raise HTTPException(status_code=404, detail="Product not found")
-
-    category = db.query(Category).filter(Category.id == product.category_id).first()
-    product.category_name = category.name if category else None
-    product.sat_fat = product.saturated_fat
-    return product
+    # after the lookup: an unknown id is a 404, never a 304
+    cached = catalog_not_modified(request, response, db)
+    if cached is not None:
+        return cached
+    return _with_category(*row)
 
 
 @router.post("/", response_model=ProductResponse, status_code=201)
@@ -59,11 +141,42 @@ def create_product(product: ProductBase, db: Session = Depends(get_db)):
         image_url=product.image_url,
     )
     db.add(new_product)
+    bump_catalog_version(db)
     db.commit()
     db.refresh(new_product)
+    category = db.get(Category, new_product.category_id)
+    record_change(upserts=[ProductRow.from_product(new_product, category and category.name)])
     return new_product
 
 
+@router.post("/bulk")
+async def bulk_ingest_products(
+    request: Request,
+    format: str = "csv",
+    db: Session = Depends(get_db),
+):
+    """
+    Upsert many products from a CSV or NDJSON request body.
+
+    Rows with an `id` are upserted by id, rows without one by name. Invalid
+    rows are skipped and listed in the report's `errors` with their row
+    number; the rest are written in one transaction.
+    """
+    if format not in INGEST_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid format: '{format}'. Valid options: {', '.join(INGEST_FORMATS)}",
+        )
+    try:
+        body = (await request.body()).decode("utf-8")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Body must be UTF-8 text")
+
+    report = await run_in_threadpool(ingest, db, parse_records(body, format))
+    invalidate_catalog()
+    return report
+
+
 @router.delete("/{product_id}", status_code=204)
 def delete_product(product_id: int, db: Session = Depends(get_db)):
     """Delete a product by ID"""
@@ -71,5 +184,110 @@ def delete_product(product_id: int, db: Session = Depends(get_db)):
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     db.delete(product)
+    bump_catalog_version(db)
     db.commit()
+    record_change(deletes=[product_id])
     return None
+
+
+def _check_health_condition(health_condition: str | None):
+    if health_condition and health_condition not in HEALTH_CONSTRAINTS:
+        raise HTTPException(
+            status_code=400,
+            detail=(
+                f"Invalid health_condition: '{health_condition}'. "
+                f"Valid options: {', '.join(sorted(HEALTH_CONSTRAINTS))}"
+            ),
+        )
+
+
+def _page_limit(limit: int | None) -> int | None:
+    if limit is None:
+        return PRODUCTS_PAGE_SIZE or None
+    if not 1 <= limit <= PRODUCTS_PAGE_MAX:
+        raise HTTPException(
+            status_code=400,
+            detail=f"limit must be between 1 and {PRODUCTS_PAGE_MAX}",
+        )
+    return limit
+
+
+def _parse_fields(fields: str | None) -> list[str] | None:
+    """Requested field names, id first (it is the pagination cursor)."""
+    if not fields:
+        return None
+    selected = ["id"]
+    for field in (f.strip() for f in fields.split(",")):
+        if field and field not in selected:
+            selected.append(field)
+
+    unknown = [f for f in selected if f not in PRODUCT_FIELDS]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=(
+                f"Unknown fields: {', '.join(unknown)}. "
+                f"Valid options: {', '.join(PRODUCT_FIELDS)}"
+            ),
+        )
+    return selected
+
+
+def _parse_ids(ids: str) -> list[int]:
+    """Distinct ids of a comma-separated `ids` parameter, in order."""
+    try:
+        wanted = [int(i) for i in ids.split(",") if i.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be comma-separated integers")
+    wanted = list(dict.fromkeys(wanted))
+    if not wanted:
+        raise HTTPException(status_code=400, detail="ids must not be empty")
+    if len(wanted) > PRODUCTS_BATCH_MAX:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {PRODUCTS_BATCH_MAX} ids per batch",
+        )
+    return wanted
+
+
+def _product_batch(rows, ids: list[int]) -> dict:
+    """GET /products/batch body for product_batch_statement(ids) rows."""
+    found = {product.id: _with_category(product, category_name) for product, category_name in rows}
+    return {
+        "products": [found[i] for i in ids if i in found],
+        "missing": [i for i in ids if i not in found],
+    }
+
+
+def _with_category(product, category_name):
+    product.category_name = category_name
+    product.sat_fat = product.saturated_fat
+    return product
+
+
+def _product_page(rows, fields: list[str] | None, limit: int | None, response: Response):
+    """
+    Response body for a product_list_statement() result.
+
+    A full page gets an X-Next-After-Id header. Projections skip the
+    response model and are encoded the way it would encode them.
+    """
+    headers = {}
+    if limit and len(rows) == limit:
+        last = rows[-1].id if fields else rows[-1][0].id
+        headers["X-Next-After-Id"] = str(last)
+
+    if fields:
+        body = [
+            {field: _json_value(value) for field, value in zip(fields, row)}
+            for row in rows
+        ]
+        return JSONResponse(body, headers={**response_headers(response), **headers})
+
+    response.headers.update(headers)
+    return [_with_category(product, category_name) for product, category_name in rows]
+
+
+def _json_value(value):
+    # Same encoding ProductResponse uses for Decimal columns
+    return str(value) if isinstance(value, Decimal) else value
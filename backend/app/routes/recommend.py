@@ -1,61 +1,351 @@
-from fastapi import APIRouter, Depends, HTTPException
+import os
+
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.orm import Session
 
+from ..cache import LRUCache
+from ..catalog import get_catalog, load_products, on_invalidate
 from ..database import get_db
-from ..models import Product, Category
-from ..schemas import RecommendRequest, RecommendResponse
-from ..recommendation import get_recommendation
+from ..encoding import json_response, response_headers
+from ..metrics import (
+    RECOMMEND_STAGE_SECONDS,
+    SOLVER_STATUS,
+    StageTimer,
+    on_collect,
+    server_timing,
+)
+from ..schemas import (
+    BatchRecommendItem,
+    FrontierRequest,
+    FrontierResponse,
+    RecommendRequest,
+    RecommendResponse,
+)
+from ..recommendation import (
+    ALLOCATION_METHODS,
+    LP_TIME_LIMIT_SECONDS,
+    _resolve_method,
+    get_budget_frontier,
+    get_recommendation,
+    get_recommendations,
+)
+from ..workers import PoolBusy, get_pool
 
 router = APIRouter()
 
 VALID_CONDITIONS = {"diabetic", "hypertension", "weight_loss"}
 
+# Recommendation results are fully determined by the catalog version and the
+# request, so identical requests are answered from memory.
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "1024"))
+RESULT_CACHE_TTL_SECONDS = float(os.getenv("RESULT_CACHE_TTL_SECONDS", "600"))
+
+result_cache = LRUCache(RESULT_CACHE_SIZE, RESULT_CACHE_TTL_SECONDS)
+on_invalidate(result_cache.clear)
+
+
+@on_collect
+def _result_cache_metrics():
+    stats = result_cache.stats()
+    return [
+        ("nutrikart_result_cache_hits_total", "counter",
+         "POST /recommend answers served from the result cache.", stats["hits"]),
+        ("nutrikart_result_cache_misses_total", "counter",
+         "POST /recommend result cache lookups that missed.", stats["misses"]),
+        ("nutrikart_result_cache_hit_ratio", "gauge",
+         "Result cache hits / lookups since start.", stats["hit_rate"]),
+        ("nutrikart_result_cache_entries", "gauge",
+         "Entries held by the result cache.", stats["size"]),
+    ]
+
+
+# CATALOG_CACHE=0 makes POST /recommend query the database on every call,
+# with the health constraints pushed down into SQL, instead of using the
+# in-process catalog snapshot (useful with many workers and frequent writes).
+CATALOG_CACHE = os.getenv("CATALOG_CACHE", "1") != "0"
+
+# Max requests accepted by one POST /recommend/batch call
+RECOMMEND_BATCH_MAX = int(os.getenv("RECOMMEND_BATCH_MAX", "1000"))
+# Max budgets accepted by one POST /recommend/frontier call
+FRONTIER_MAX_POINTS = int(os.getenv("FRONTIER_MAX_POINTS", "200"))
+
+NO_MATCH_DETAIL = (
+    "No products match your criteria. "
+    "Try increasing your budget or removing health condition filters."
+)
+
 
 @router.post("/recommend", response_model=RecommendResponse)
 def recommend(
     request: RecommendRequest,
+    response: Response,
     use_lp: bool = True,
+    allocation_method: str | None = None,
+    time_limit: float | None = None,
+    timings: bool = False,
     db: Session = Depends(get_db),
 ):
+    """
+    Recommend a basket for a budget and health condition.
+
+    Stage timings are always sent in the Server-Timing header; with
+    ?timings=true they are also returned as summary.timings_ms.
+    """
     # ── Validate inputs ──
-    if request.health_condition and request.health_condition not in VALID_CONDITIONS:
+    options = _recommend_options(request, use_lp, allocation_method, time_limit)
+    timer = StageTimer()
+
+    # ── Run pipeline ──
+    if not CATALOG_CACHE:
+        # Only eligible rows leave the database; nothing is shared or memoized
+        with timer.stage("db"):
+            products = load_products(db, request.health_condition)
+        return _recommend_from_rows(products, response, options, timer, timings)
+    with timer.stage("db"):
+        catalog = get_catalog(db)
+    return _recommend_from_catalog(catalog, request, response, options, timer, timings)
+
+
+@router.post("/recommend/batch", response_model=list[BatchRecommendItem])
+def recommend_batch(
+    requests: list[RecommendRequest],
+    use_lp: bool = True,
+    allocation_method: str | None = None,
+    time_limit: float | None = None,
+    db: Session = Depends(get_db),
+):
+    """
+    Run many recommendation requests against one catalog snapshot.
+
+    Each entry gets its own status_code (200, 400 or 404) instead of failing
+    the whole batch. The catalog is filtered and ranked once per distinct
+    health_condition, and LP solves share one model.
+    """
+    _check_options(allocation_method, time_limit)
+    if len(requests) > RECOMMEND_BATCH_MAX:
         raise HTTPException(
             status_code=400,
-            detail=(
-                f"Invalid health_condition: '{request.health_condition}'. "
-                f"Valid options: {', '.join(sorted(VALID_CONDITIONS))} or null"
-            ),
+            detail=f"At most {RECOMMEND_BATCH_MAX} requests per batch",
         )
 
-    if request.budget <= 0:
-        raise HTTPException(status_code=400, detail="Budget must be greater than 0")
+    catalog = get_catalog(db)
+    items = [None] * len(requests)
+    pending = []  # (position, cache key, request)
+    for i, request in enumerate(requests):
+        error = _request_error(request)
+        if error:
+            items[i] = {"status_code": 400, "detail": error}
+            continue
+        key = _cache_key(catalog, request, use_lp, allocation_method)
+        cached = result_cache.get(key)
+        if cached is not None:
+            items[i] = _batch_item(cached)
+        else:
+            pending.append((i, key, request))
 
-    if request.household_size < 1:
-        raise HTTPException(status_code=400, detail="household_size must be at least 1")
+    results = get_recommendations(
+        catalog.columns,
+        [request.model_dump() for _, _, request in pending],
+        use_lp=use_lp,
+        lp_model=_lp_model(catalog, use_lp, allocation_method),
+        allocation_method=allocation_method,
+        time_limit=min(time_limit or LP_TIME_LIMIT_SECONDS, LP_TIME_LIMIT_SECONDS),
+    )
+    for (i, key, _), result in zip(pending, results):
+        _count_solve(result)
+        _remember(key, result)
+        items[i] = _batch_item(result)
+    return json_response(list[BatchRecommendItem], items)
 
-    # ── Run pipeline ──
-    all_products = db.query(Product).all()
-    result = get_recommendation(
-        products=all_products,
+
+@router.post("/recommend/frontier", response_model=FrontierResponse)
+def recommend_frontier(
+    request: FrontierRequest,
+    db: Session = Depends(get_db),
+):
+    """
+    Optimal baskets for a grid of budgets and the score-vs-budget curve.
+
+    All budgets are answered from one knapsack DP table, so a sweep costs
+    about as much as a single solve at the largest budget.
+    """
+    if not request.budgets:
+        raise HTTPException(status_code=400, detail="budgets must not be empty")
+    if len(request.budgets) > FRONTIER_MAX_POINTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {FRONTIER_MAX_POINTS} budgets per frontier",
+        )
+    for budget in request.budgets:
+        error = _request_error(RecommendRequest(
+            budget=budget,
+            health_condition=request.health_condition,
+            household_size=request.household_size,
+        ))
+        if error:
+            raise HTTPException(status_code=400, detail=error)
+
+    catalog = get_catalog(db)
+    return json_response(FrontierResponse, get_budget_frontier(
+        catalog.columns,
+        request.health_condition,
+        request.budgets,
+        request.household_size,
+    ))
+
+
+# ── Shared with the async handler in routes/aio.py ──
+
+
+def _recommend_options(
+    request: RecommendRequest,
+    use_lp: bool,
+    allocation_method: str | None,
+    time_limit: float | None,
+) -> dict:
+    """Validate a /recommend call; returns get_recommendation() keyword args."""
+    _check_options(allocation_method, time_limit)
+    error = _request_error(request)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+
+    return dict(
         health_condition=request.health_condition,
         budget=request.budget,
         household_size=request.household_size,
         use_lp=use_lp,
+        allocation_method=allocation_method,
+        # clients may ask for a tighter latency budget, never a looser one
+        time_limit=min(time_limit or LP_TIME_LIMIT_SECONDS, LP_TIME_LIMIT_SECONDS),
     )
 
+
+def _recommend_from_rows(products, response: Response, options: dict,
+                         timer: StageTimer, timings: bool = False) -> Response:
+    result = get_recommendation(products=products, timer=timer, **options)
+    _count_solve(result)
+    result = _report_timings(result, response, timer, timings)
+    if not result["recommendations"]:
+        raise HTTPException(status_code=404, detail=NO_MATCH_DETAIL)
+    return _send(result, response)
+
+
+def _recommend_from_catalog(catalog, request: RecommendRequest, response: Response, options: dict,
+                            timer: StageTimer, timings: bool = False) -> Response:
+    cache_key = _cache_key(catalog, request, options["use_lp"], options["allocation_method"])
+    with timer.stage("cache"):
+        result = result_cache.get(cache_key)
+    response.headers["X-Cache"] = "MISS" if result is None else "HIT"
+    if result is None:
+        result = _run_pipeline(catalog, options["use_lp"], options, timer)
+        _count_solve(result)
+        _remember(cache_key, result)
+    result = _report_timings(result, response, timer, timings)
+
     # ── Handle empty results ──
     if not result["recommendations"]:
+        raise HTTPException(status_code=404, detail=NO_MATCH_DETAIL)
+
+    return _send(result, response)
+
+
+def _send(result: dict, response: Response) -> Response:
+    """
+    The pipeline's result as JSON, without FastAPI re-validating it against
+    RecommendResponse (see encoding.py). Headers set on `response` are kept.
+    """
+    return json_response(RecommendResponse, result, headers=response_headers(response))
+
+
+def _count_solve(result: dict):
+    summary = result["summary"]
+    SOLVER_STATUS.inc(method=summary["allocation_method"], status=summary["solver_status"] or "none")
+
+
+def _report_timings(result: dict, response: Response, timer: StageTimer, include: bool) -> dict:
+    """Feed the stage histograms and Server-Timing; add timings_ms if asked."""
+    timer.add("total", timer.elapsed())
+    for stage, seconds in timer.seconds.items():
+        RECOMMEND_STAGE_SECONDS.observe(seconds, stage=stage)
+    stages = timer.as_ms()
+    response.headers["Server-Timing"] = server_timing(stages)
+    if include:
+        return {**result, "summary": {**result["summary"], "timings_ms": stages}}
+    return result
+
+
+def _check_options(allocation_method: str | None, time_limit: float | None):
+    if allocation_method and allocation_method not in ALLOCATION_METHODS:
         raise HTTPException(
-            status_code=404,
+            status_code=400,
             detail=(
-                "No products match your criteria. "
-                "Try increasing your budget or removing health condition filters."
+                f"Invalid allocation_method: '{allocation_method}'. "
+                f"Valid options: {', '.join(ALLOCATION_METHODS)}"
             ),
         )
 
-    # ── Add category names ──
-    cat_map = {c.id: c.name for c in db.query(Category).all()}
-    for rec in result["recommendations"]:
-        rec["category_name"] = cat_map.get(rec["category_id"])
+    if time_limit is not None and time_limit <= 0:
+        raise HTTPException(status_code=400, detail="time_limit must be greater than 0")
 
-    return result
\ No newline at end of file
+
+def _request_error(request: RecommendRequest) -> str | None:
+    if request.health_condition and request.health_condition not in VALID_CONDITIONS:
+        return (
+            f"Invalid health_condition: '{request.health_condition}'. "
+            f"Valid options: {', '.join(sorted(VALID_CONDITIONS))} or null"
+        )
+    if request.budget <= 0:
+        return "Budget must be greater than 0"
+    if request.household_size < 1:
+        return "household_size must be at least 1"
+    return None
+
+
+def _cache_key(catalog, request: RecommendRequest, use_lp: bool, allocation_method: str | None):
+    return (
+        catalog.version,
+        request.health_condition,
+        request.budget,
+        request.household_size,
+        allocation_method or ("lp" if use_lp else "greedy"),
+    )
+
+
+def _remember(key, result: dict):
+    # Answers cut short by the latency budget may be beaten next time
+    if result["summary"]["solver_status"] not in ("time_limited", "fallback"):
+        result_cache.set(key, result)
+
+
+def _batch_item(result: dict) -> dict:
+    if not result["recommendations"]:
+        return {"status_code": 404, "detail": NO_MATCH_DETAIL}
+    return {"status_code": 200, "result": result}
+
+
+def _lp_model(catalog, use_lp: bool, allocation_method: str | None):
+    # Only LP solves use the shared model; building it for a knapsack or
+    # greedy request would cost a full-catalog PuLP model for nothing.
+    if _resolve_method(use_lp, allocation_method) == "lp":
+        return catalog.lp_model
+    return None
+
+
+def _run_pipeline(catalog, use_lp: bool, options: dict, timer: StageTimer | None = None) -> dict:
+    """get_recommendation() in the process pool if enabled, else inline."""
+    pool = get_pool()
+    if pool is None:
+        return get_recommendation(
+            products=catalog.columns,
+            lp_model=_lp_model(catalog, use_lp, options["allocation_method"]),
+            timer=timer,
+            **options,
+        )
+    try:
+        return pool.run(catalog, timer=timer, **options)
+    except PoolBusy:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many recommendation requests in progress. Retry shortly.",
+            headers={"Retry-After": "1"},
+        )
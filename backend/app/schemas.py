@@ -22,6 +22,10 @@ class ProductResponse(ProductBase):
 
     model_config = ConfigDict(from_attributes=True)
 
+class ProductBatchResponse(BaseModel):
+    products: list[ProductResponse]   # in the requested order
+    missing: list[int]                # requested ids that don't exist
+
 class CategoryBase(BaseModel):
     name: str
 
@@ -69,7 +73,51 @@ class RecommendSummary(BaseModel):
     health_condition: str | None
     household_size: int
     allocation_method: str = "lp"
+    # "optimal", "time_limited" (solver's best answer when the time limit
+    # hit), "fallback" (greedy used, no solver answer in time) or None when
+    # greedy was requested
+    solver_status: str | None = None
+    # milliseconds per stage (db, cache, filter, rank, model, solve,
+    # allocate, total); only with ?timings=true
+    timings_ms: dict[str, float] | None = None
 
 class RecommendResponse(BaseModel):
     recommendations: list[RecommendProduct]
-    summary: RecommendSummary
\ No newline at end of file
+    summary: RecommendSummary
+
+
+class BatchRecommendItem(BaseModel):
+    """One entry of POST /recommend/batch, in request order."""
+    status_code: int
+    detail: str | None = None
+    result: RecommendResponse | None = None
+
+
+class FrontierRequest(BaseModel):
+    budgets: list[float]
+    health_condition: str | None = None
+    household_size: int = 1
+
+
+class FrontierPoint(BaseModel):
+    budget: float
+    total_products: int
+    total_spent: float
+    remaining_budget: float
+    objective: float
+    total_calories: float
+    total_protein: float
+    recommendations: list[RecommendProduct]
+
+
+class FrontierBreakpoint(BaseModel):
+    budget: float
+    objective: float
+
+
+class FrontierResponse(BaseModel):
+    health_condition: str | None
+    household_size: int
+    products_after_filter: int
+    points: list[FrontierPoint]
+    breakpoints: list[FrontierBreakpoint]
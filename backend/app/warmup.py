@@ -0,0 +1,130 @@
+"""
+Optional warm-up after startup, and the state reported by GET /ready.
+
+A cold process pays for everything on its first /recommend: the catalog
+query, building columns and rankings, importing PuLP, the CBC probe and
+the first CBC launch. With WARMUP=1 that work is done by a
+background thread as soon as the app starts:
+
+  1. db      load the catalog snapshot
+  2. columns build its columns and precomputed rankings
+  3. model   import PuLP and probe CBC (with LP_SHARED_MODEL, also build
+             the shared BudgetModel)
+  4. solve   one throwaway /recommend-style solve (not cached); with
+             RECOMMEND_WORKERS it runs in the pool, which starts it
+
+The server accepts requests meanwhile (GET / stays the liveness check);
+GET /ready answers 503 until warm-up has finished, so a load balancer can
+hold traffic until responses are fast. A failed attempt (e.g. database not
+reachable yet) is retried every WARMUP_RETRY_SECONDS. Without WARMUP the
+app reports ready straight away.
+"""
+import logging
+import os
+import threading
+import time
+
+from .metrics import StageTimer, on_collect
+
+# WARMUP=1 preloads the catalog and solver at startup
+WARMUP = os.getenv("WARMUP", "0") == "1"
+# Seconds between warm-up attempts after a failure
+WARMUP_RETRY_SECONDS = float(os.getenv("WARMUP_RETRY_SECONDS", "5"))
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_state = {"status": "disabled", "attempts": 0}
+_thread = None
+
+
+def status() -> dict:
+    """{"ready": bool, "status": ..., plus timings once warmed up}."""
+    with _lock:
+        state = dict(_state)
+    state["ready"] = state["status"] in ("disabled", "ready")
+    return state
+
+
+def start(session_factory=None):
+    """Run warm_up() in a daemon thread (once), retrying until it succeeds."""
+    global _thread
+    with _lock:
+        if _thread is not None:
+            return _thread
+        _state.update(status="warming_up")
+        _thread = threading.Thread(
+            target=_warm_up_until_ready, args=(session_factory,), name="warmup", daemon=True
+        )
+    _thread.start()
+    return _thread
+
+
+def _warm_up_until_ready(session_factory):
+    while True:
+        try:
+            warm_up(session_factory)
+            return
+        except Exception as e:  # keep serving; retry later
+            logger.warning("warm-up failed, retrying in %ss: %s", WARMUP_RETRY_SECONDS, e)
+            with _lock:
+                _state.update(status="warming_up", error=str(e))
+            time.sleep(WARMUP_RETRY_SECONDS)
+
+
+def warm_up(session_factory=None) -> dict:
+    """Do the warm-up steps now, in this thread; returns the status."""
+    from .catalog import get_catalog
+    from .recommendation import LP_AVAILABLE, get_recommendation
+    from .workers import get_pool
+
+    if session_factory is None:
+        from .database import SessionLocal as session_factory
+
+    with _lock:
+        _state["attempts"] += 1
+    timer = StageTimer()
+    with timer.stage("db"):
+        with session_factory() as db:
+            snapshot = get_catalog(db)
+    with timer.stage("columns"):
+        columns = snapshot.columns
+    with timer.stage("model"):
+        lp_model = snapshot.lp_model
+        if LP_AVAILABLE:
+            from .lp_optimizer import cbc_available
+            cbc_available()
+
+    with timer.stage("solve"):
+        cheapest = columns.min_price()
+        if cheapest is not None:
+            # a budget that buys a few items, so CBC really runs
+            options = dict(health_condition=None, budget=cheapest * 3, use_lp=True)
+            pool = get_pool()
+            if pool is not None:
+                pool.run(snapshot, **options)
+            else:
+                get_recommendation(columns, lp_model=lp_model, **options)
+
+    elapsed = timer.elapsed()
+    with _lock:
+        _state.update(
+            status="ready",
+            seconds=round(elapsed, 3),
+            timings_ms=timer.as_ms(),
+            catalog_version=snapshot.version,
+            products=len(snapshot),
+        )
+        _state.pop("error", None)
+    logger.info("warm-up finished in %.2fs: %s", elapsed, timer.as_ms())
+    return status()
+
+
+@on_collect
+def _warmup_metrics():
+    state = status()
+    metrics = [("nutrikart_ready", "gauge", "1 once GET /ready reports ready.", int(state["ready"]))]
+    if "seconds" in state:
+        metrics.append(("nutrikart_warmup_seconds", "gauge", "Duration of the startup warm-up.",
+                        state["seconds"]))
+    return metrics
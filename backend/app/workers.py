@@ -0,0 +1,224 @@
+"""
+Optional process pool for the CPU-bound stage of POST /recommend.
+
+`recommend` is a sync handler, so by default scoring and the solve run in
+Starlette's threadpool and contend for the GIL. With RECOMMEND_WORKERS > 0
+they run in a pool of worker processes instead:
+
+  - each pool is bound to one catalog version; the catalog is handed to the
+    workers once, through the pool initializer (with the default "fork"
+    start method on Linux that is a copy-on-write fork-time snapshot, with
+    "spawn"/"forkserver" it is pickled once per worker); a snapshot mapped
+    from CATALOG_FILE is passed as its mapping, which forked workers share
+  - workers build their own columns and LP model once and reuse them
+  - when the catalog version moves on by recorded changes (see
+    catalog.changes_since), the workers are kept: each job carries the
+    changes since the pool started, and a worker applies the ones it
+    hasn't seen to its columns, rankings and LP model, like the snapshot
+    did. After a reload, or MAX_REPLAYED_CHANGES changes, a new pool is
+    started and the old one finishes its in-flight jobs and exits
+  - admission control: at most RECOMMEND_QUEUE_SIZE jobs may be running or
+    queued; beyond that run() raises PoolBusy instead of queueing (0 = no
+    limit)
+"""
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from .metrics import StageTimer
+from .recommendation import LP_SHARED_MODEL, _resolve_method, get_recommendation
+
+# Worker processes for recommendation solves (0 = solve in the request thread)
+RECOMMEND_WORKERS = int(os.getenv("RECOMMEND_WORKERS", "0"))
+# Max jobs running or waiting in the pool before requests are turned away (0 = unbounded)
+RECOMMEND_QUEUE_SIZE = int(
+    os.getenv("RECOMMEND_QUEUE_SIZE", str(max(RECOMMEND_WORKERS, 1) * 4))
+)
+# multiprocessing start method ("fork", "spawn", "forkserver"); platform default if unset
+RECOMMEND_START_METHOD = os.getenv("RECOMMEND_START_METHOD") or None
+
+
+class PoolBusy(Exception):
+    """Raised when the pool already holds RECOMMEND_QUEUE_SIZE jobs."""
+
+
+class RecommendPool:
+    """Bounded process pool running get_recommendation() for one catalog."""
+
+    # Changes carried with every job before the workers are restarted instead
+    MAX_REPLAYED_CHANGES = 64
+
+    def __init__(self, workers: int, queue_size: int, start_method: str | None = None):
+        self.workers = workers
+        self._slots = threading.BoundedSemaphore(queue_size) if queue_size > 0 else None
+        self._context = multiprocessing.get_context(start_method)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._version = None
+        self._changes = ()  # applied since the workers were started
+
+    def run(self, catalog, timer=None, **kwargs) -> dict:
+        """
+        get_recommendation(catalog.products, **kwargs) in a worker process.
+
+        Blocks until the result is ready. Raises PoolBusy if the queue is full.
+        The worker's stage timings are added to `timer` (a StageTimer), and
+        kwargs["time_limit"] counts from when `timer` started.
+        """
+        if self._slots is not None and not self._slots.acquire(blocking=False):
+            raise PoolBusy()
+        try:
+            executor, changes = self._executor_for(catalog)
+            if timer is not None and kwargs.get("time_limit") is not None:
+                kwargs = dict(kwargs, time_limit=kwargs["time_limit"] - timer.elapsed())
+            future = executor.submit(_recommend, catalog.version, changes, kwargs, time.time())
+            result, timings_ms = future.result()
+        finally:
+            if self._slots is not None:
+                self._slots.release()
+        if timer is not None:
+            timer.update(timings_ms)
+        return result
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+            self._executor = None
+            self._version = None
+            self._changes = ()
+
+    def _executor_for(self, catalog):
+        """(executor, changes its workers replay) serving `catalog`'s version."""
+        with self._lock:
+            if self._version != catalog.version:
+                changes = self._replayable(catalog.version)
+                if changes is not None:
+                    self._changes += changes
+                    self._version = catalog.version
+            if self._version != catalog.version:
+                old = self._executor
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=self._context,
+                    initializer=_init_worker,
+                    initargs=(catalog.version, *_worker_catalog(catalog)),
+                )
+                self._version = catalog.version
+                self._changes = ()
+                if old is not None:
+                    old.shutdown(wait=False)  # in-flight jobs still complete
+            return self._executor, self._changes
+
+    def _replayable(self, version: int) -> tuple | None:
+        """Recorded changes from the workers' version up to `version`, if any lead there."""
+        from .catalog import changes_since
+
+        if self._executor is None or self._version is None or version < self._version:
+            return None
+        changes = changes_since(self._version)
+        if not changes:
+            return None
+        changes = tuple(change for change in changes if change.version <= version)
+        if not changes or changes[-1].version != version:
+            return None
+        if len(self._changes) + len(changes) > self.MAX_REPLAYED_CHANGES:
+            return None
+        return changes
+
+
+def _worker_catalog(catalog) -> tuple:
+    """What _init_worker() gets: the snapshot's CatalogFile and delta, else its rows."""
+    mapped = getattr(catalog, "catalog_file", None)
+    if mapped is not None:
+        return mapped, catalog.delta
+    return tuple(catalog.products), None
+
+
+_pool: RecommendPool | None = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> RecommendPool | None:
+    """The process-wide pool, or None when RECOMMEND_WORKERS is 0."""
+    global _pool
+    if RECOMMEND_WORKERS <= 0:
+        return None
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = RecommendPool(
+                    RECOMMEND_WORKERS, RECOMMEND_QUEUE_SIZE, RECOMMEND_START_METHOD
+                )
+    return _pool
+
+
+# ── Worker process side ──
+
+_worker_state = {}
+
+
+def _init_worker(version, products, delta=None):
+    from .catalog_file import CatalogFile
+    from .columnar import ProductColumns
+    from .recommendation import precompute_rankings
+
+    mapped = isinstance(products, CatalogFile)
+    columns = products.columns() if mapped else ProductColumns(products)
+    if delta is not None:
+        columns = delta.apply(columns)  # edits since the file was written
+    precompute_rankings(columns)
+    _worker_state["version"] = version
+    _worker_state["columns"] = columns
+    _worker_state["lp_model"] = None
+    # like CatalogSnapshot.lp_model: don't read every mapped row up front
+    _worker_state["mapped"] = mapped
+
+
+def _apply_changes(changes):
+    """Roll this worker's catalog forward by the changes it hasn't applied yet."""
+    from .recommendation import apply_rankings, precompute_rankings
+
+    for change in changes:
+        if change.version <= _worker_state["version"]:
+            continue
+        old = _worker_state["columns"]
+        columns = old.apply(change.upserts, change.deletes)
+        apply_rankings(old, columns, change.upserts, change.deletes)
+        precompute_rankings(columns)
+        lp_model = _worker_state["lp_model"]
+        if lp_model is not None:
+            lp_model.apply(change.upserts, change.deletes)
+        _worker_state["columns"] = columns
+        _worker_state["version"] = change.version
+
+
+def _recommend(version, changes, kwargs, submitted_at):
+    _apply_changes(changes)
+    if _worker_state.get("version") != version:
+        raise RuntimeError(f"worker holds catalog v{_worker_state.get('version')}, got v{version}")
+    if kwargs.get("time_limit") is not None:
+        # time spent waiting in the queue comes out of the latency budget
+        kwargs = dict(kwargs, time_limit=kwargs["time_limit"] - max(time.time() - submitted_at, 0.0))
+    columns = _worker_state["columns"]
+    lp_model = None
+    # the same choice of solver as get_recommendation() (and the route) makes
+    method = _resolve_method(kwargs.get("use_lp", True), kwargs.get("allocation_method"))
+    if LP_SHARED_MODEL and method == "lp":
+        lp_model = _worker_state["lp_model"]
+        if lp_model is None:
+            try:
+                from .lp_optimizer import BudgetModel
+            except ImportError:
+                pass
+            else:
+                if _worker_state["mapped"]:
+                    lp_model = BudgetModel(grow=True)
+                else:
+                    lp_model = BudgetModel(columns.products)
+                _worker_state["lp_model"] = lp_model
+    timer = StageTimer()
+    result = get_recommendation(products=columns, lp_model=lp_model, timer=timer, **kwargs)
+    return result, timer.as_ms()
@@ -0,0 +1,10 @@
+"""
+Benchmarks for the recommendation pipeline.
+
+    python -m benchmarks.run                       # 1k/10k/100k products
+    python -m benchmarks.run --sizes 1000 --out before.json
+    python -m benchmarks.run --compare before.json # exit 1 on regressions
+
+See benchmarks/run.py for the options. Catalogs are synthetic (see
+benchmarks/catalog.py) and nothing touches the database.
+"""
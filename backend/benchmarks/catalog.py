@@ -0,0 +1,67 @@
+"""
+Synthetic catalogs shaped like data/products.csv.
+
+Each numeric column is sampled from the values in the seed CSV: a value is
+missing with the same probability as in the CSV, otherwise it is a CSV
+value scaled by a log-normal jitter (so the health thresholds cut roughly
+the same share of products as on the real catalog). Category ids follow
+the CSV's category mix. The same (n, seed) always gives the same catalog.
+"""
+import csv
+from pathlib import Path
+
+import numpy as np
+
+from app.queries import ProductRow
+
+SEED_CSV = Path(__file__).resolve().parents[2] / "data" / "products.csv"
+
+NUMERIC_FIELDS = (
+    "price_per_unit", "calories", "sugar", "sodium",
+    "protein", "fat", "saturated_fat", "fiber",
+)
+
+# Spread of the multiplicative jitter around each sampled CSV value
+JITTER_SIGMA = 0.25
+
+
+def load_distributions(path=SEED_CSV) -> dict:
+    """{field: (values, missing_fraction)} plus "category_id": values."""
+    with open(path, encoding="utf-8", newline="") as f:
+        records = list(csv.DictReader(f))
+
+    distributions = {}
+    for field in NUMERIC_FIELDS:
+        values = [float(r[field]) for r in records if r[field]]
+        distributions[field] = (np.array(values), 1 - len(values) / len(records))
+    distributions["category_id"] = np.array([int(r["category_id"]) for r in records])
+    return distributions
+
+
+def synthetic_catalog(n: int, seed: int = 0, distributions=None) -> list[ProductRow]:
+    """`n` ProductRow records with ids 1..n."""
+    distributions = distributions or load_distributions()
+    rng = np.random.default_rng(seed)
+
+    columns = {}
+    for field in NUMERIC_FIELDS:
+        values, missing = distributions[field]
+        sampled = rng.choice(values, n) * rng.lognormal(0.0, JITTER_SIGMA, n)
+        column = np.round(sampled, 2).tolist()
+        if field != "price_per_unit":  # every product has a price
+            for i in np.flatnonzero(rng.random(n) < missing).tolist():
+                column[i] = None
+        columns[field] = column
+    category_ids = rng.choice(distributions["category_id"], n).tolist()
+
+    return [
+        ProductRow(
+            id=i + 1,
+            name=f"Synthetic product {i + 1}",
+            category_id=category_ids[i],
+            category_name=f"Category {category_ids[i]}",
+            image_url=None,
+            **{field: columns[field][i] for field in NUMERIC_FIELDS},
+        )
+        for i in range(n)
+    ]
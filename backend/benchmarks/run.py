@@ -0,0 +1,304 @@
+"""
+Latency and memory of the recommendation pipeline at several catalog sizes.
+
+    python -m benchmarks.run [--sizes 1000,10000,100000] [--budgets 500,2000,5000]
+                             [--stages filter,rank,...] [--out results.json]
+                             [--compare baseline.json [--current results.json]]
+
+Stages (each timed separately, on the same synthetic catalog):
+
+  columns    ProductColumns(products)               per size
+  filter     filter_products(columns, condition)    per condition
+  rank       rank_products(filtered, condition)     per condition
+  greedy     allocate_budget(ranked, budget)        per condition and budget
+  knapsack   allocate_budget_knapsack(...)          "
+  lp         allocate_budget_lp(...), fresh problem "
+  lp_model   allocate_budget_lp(..., model=shared BudgetModel)
+  recommend  get_recommendation() as /recommend runs it: precomputed
+             rankings, and the shared BudgetModel only with LP_SHARED_MODEL=1
+
+Every case reports p50/p95/p99/mean/min wall time over --repeat runs
+(--solver-repeat for knapsack/lp/lp_model/recommend, which take seconds at
+100k), plus the tracemalloc peak of one extra run. --compare matches cases
+with a baseline file and exits with 1 when a p50 or peak grew by more than
+--threshold.
+"""
+import argparse
+import gc
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+
+from app.columnar import ProductColumns
+from app.knapsack import allocate_budget_knapsack
+from app.recommendation import (
+    LP_AVAILABLE,
+    LP_SHARED_MODEL,
+    SCORING_WEIGHTS,
+    allocate_budget,
+    filter_products,
+    get_recommendation,
+    precompute_rankings,
+    rank_products,
+)
+
+from .catalog import synthetic_catalog
+
+if LP_AVAILABLE:
+    from app.lp_optimizer import BudgetModel, allocate_budget_lp
+
+STAGES = ("columns", "filter", "rank", "greedy", "knapsack", "lp", "lp_model", "recommend")
+SOLVER_STAGES = {"knapsack", "lp", "lp_model", "recommend"}
+LP_STAGES = {"lp", "lp_model"}
+CONDITIONS = (None, *SCORING_WEIGHTS)
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+DEFAULT_BUDGETS = (500.0, 2000.0, 5000.0)
+
+# Differences below this many milliseconds are never reported as regressions
+MIN_DELTA_MS = 0.05
+
+
+# ── Measuring ──
+
+
+def measure(fn, repeat: int, memory: bool = True) -> dict:
+    """Time `repeat` calls of fn(); optionally trace one more for peak memory."""
+    samples = []
+    gc.collect()
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+
+    result = summarize(samples)
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            fn()
+            result["peak_kib"] = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def summarize(samples) -> dict:
+    ms = np.array(samples) * 1000
+    return {
+        "runs": len(samples),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "mean_ms": round(float(ms.mean()), 3),
+        "min_ms": round(float(ms.min()), 3),
+    }
+
+
+def run(sizes=DEFAULT_SIZES, budgets=DEFAULT_BUDGETS, stages=STAGES,
+        repeat: int = 20, solver_repeat: int = 3, seed: int = 0,
+        memory: bool = True, progress=None) -> dict:
+    """Benchmark every stage for every size/condition/budget; returns the report."""
+    stages = set(stages)
+    if not LP_AVAILABLE:
+        stages -= LP_STAGES
+    results = []
+
+    def record(stage, size, condition, budget, fn):
+        if stage not in stages:
+            return
+        runs = solver_repeat if stage in SOLVER_STAGES else repeat
+        case = {"stage": stage, "size": size, "condition": condition, "budget": budget}
+        case.update(measure(fn, runs, memory))
+        results.append(case)
+        if progress:
+            progress(case)
+
+    for size in sizes:
+        products = synthetic_catalog(size, seed)
+        record("columns", size, None, None, lambda: ProductColumns(products))
+        columns = ProductColumns(products)
+        shared = "lp_model" in stages or (LP_SHARED_MODEL and "recommend" in stages)
+        model = BudgetModel(products) if LP_AVAILABLE and shared else None
+        catalog = ProductColumns(products)
+        precompute_rankings(catalog)
+
+        for condition in CONDITIONS:
+            record("filter", size, condition, None,
+                   lambda: filter_products(columns, condition))
+            filtered = filter_products(columns, condition)
+            record("rank", size, condition, None,
+                   lambda: rank_products(filtered, condition))
+            ranked = rank_products(filtered, condition)
+
+            for budget in budgets:
+                record("greedy", size, condition, budget,
+                       lambda: allocate_budget(ranked, budget))
+                record("knapsack", size, condition, budget,
+                       lambda: allocate_budget_knapsack(ranked, budget))
+                if LP_AVAILABLE:
+                    record("lp", size, condition, budget,
+                           lambda: allocate_budget_lp(ranked, budget))
+                    record("lp_model", size, condition, budget,
+                           lambda: allocate_budget_lp(ranked, budget, model=model))
+                record("recommend", size, condition, budget,
+                       lambda: get_recommendation(catalog, condition, budget,
+                                                  lp_model=model if LP_SHARED_MODEL else None))
+
+    return {"meta": _meta(seed, repeat, solver_repeat), "results": results}
+
+
+def _meta(seed: int, repeat: int, solver_repeat: int) -> dict:
+    try:
+        import pulp
+        pulp_version = pulp.__version__
+    except ImportError:
+        pulp_version = None
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pulp": pulp_version,
+        "machine": f"{platform.system()} {platform.machine()}",
+        "seed": seed,
+        "repeat": repeat,
+        "solver_repeat": solver_repeat,
+    }
+
+
+# ── Comparing ──
+
+
+def case_key(case: dict) -> tuple:
+    return case["stage"], case["size"], case["condition"], case["budget"]
+
+
+def compare(baseline: dict, current: dict, threshold: float = 0.2) -> list[dict]:
+    """
+    Cases present in both reports, with p50 and peak ratios (current / baseline).
+
+    "regression" is set when either grew by more than `threshold` (0.2 = 20%)
+    and, for time, by more than MIN_DELTA_MS.
+    """
+    before = {case_key(case): case for case in baseline["results"]}
+    rows = []
+    for case in current["results"]:
+        old = before.get(case_key(case))
+        if old is None:
+            continue
+        time_ratio = _ratio(case["p50_ms"], old["p50_ms"])
+        peak_ratio = _ratio(case.get("peak_kib"), old.get("peak_kib"))
+        slower = (time_ratio is not None and time_ratio > 1 + threshold
+                  and case["p50_ms"] - old["p50_ms"] > MIN_DELTA_MS)
+        bigger = peak_ratio is not None and peak_ratio > 1 + threshold
+        rows.append({
+            **{k: case[k] for k in ("stage", "size", "condition", "budget")},
+            "p50_ms": (old["p50_ms"], case["p50_ms"]),
+            "p50_ratio": time_ratio,
+            "peak_ratio": peak_ratio,
+            "regression": slower or bigger,
+        })
+    return rows
+
+
+def _ratio(new, old):
+    if new is None or not old:
+        return None
+    return round(new / old, 3)
+
+
+# ── Output ──
+
+
+def _label(case: dict) -> str:
+    budget = "" if case["budget"] is None else f" ₹{case['budget']:g}"
+    return f"{case['stage']:<9} {case['size']:>7} {case['condition'] or 'none':<12}{budget}"
+
+
+def format_case(case: dict) -> str:
+    peak = f"  peak {case['peak_kib']:>10.1f} KiB" if "peak_kib" in case else ""
+    return (f"{_label(case):<42} p50 {case['p50_ms']:>10.3f} ms  "
+            f"p95 {case['p95_ms']:>10.3f} ms  p99 {case['p99_ms']:>10.3f} ms{peak}")
+
+
+def format_comparison(rows: list[dict]) -> str:
+    lines = []
+    for row in rows:
+        old, new = row["p50_ms"]
+        peak = "" if row["peak_ratio"] is None else f"  peak x{row['peak_ratio']:.2f}"
+        flag = "  REGRESSION" if row["regression"] else ""
+        lines.append(f"{_label(row):<42} p50 {old:>10.3f} -> {new:>10.3f} ms "
+                     f"(x{row['p50_ratio']:.2f}){peak}{flag}")
+    regressions = sum(row["regression"] for row in rows)
+    lines.append(f"{len(rows)} cases compared, {regressions} regression(s)")
+    return "\n".join(lines)
+
+
+# ── CLI ──
+
+
+def _numbers(kind):
+    def parse(value):
+        return tuple(kind(v) for v in value.split(",") if v)
+    return parse
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.run",
+        description="Benchmark the recommendation pipeline on synthetic catalogs.",
+    )
+    parser.add_argument("--sizes", type=_numbers(int), default=DEFAULT_SIZES)
+    parser.add_argument("--budgets", type=_numbers(float), default=DEFAULT_BUDGETS)
+    parser.add_argument("--stages", type=_numbers(str), default=STAGES,
+                        help=f"comma-separated subset of: {','.join(STAGES)}")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--solver-repeat", type=int, default=3,
+                        help="runs per case for knapsack, lp, lp_model and recommend")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", action="store_true",
+                        help="skip the tracemalloc run of each case")
+    parser.add_argument("--out", help="write the JSON report here")
+    parser.add_argument("--compare", metavar="BASELINE",
+                        help="JSON report to compare against")
+    parser.add_argument("--current", metavar="REPORT",
+                        help="with --compare: compare this report instead of running")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="relative growth counted as a regression (default 0.2)")
+    args = parser.parse_args(argv)
+
+    unknown = set(args.stages) - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+    if args.current and not args.compare:
+        parser.error("--current needs --compare")
+
+    if args.current:
+        with open(args.current, encoding="utf-8") as f:
+            report = json.load(f)
+    else:
+        report = run(
+            args.sizes, args.budgets, set(args.stages), args.repeat,
+            args.solver_repeat, args.seed, memory=not args.no_memory,
+            progress=lambda case: print(format_case(case), flush=True),
+        )
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        rows = compare(baseline, report, args.threshold)
+        print(format_comparison(rows))
+        return 1 if any(row["regression"] for row in rows) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
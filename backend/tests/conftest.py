@@ -1,6 +1,13 @@
+import numpy as np
 import pytest
 from types import SimpleNamespace
 
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.queries import ProductRow
+
 def make_product(**kwargs):
     defaults = {
         "id": 1,
@@ -27,6 +34,83 @@ def make_product(**kwargs):
     defaults.update(kwargs)
     return SimpleNamespace(**defaults)
 
+def make_catalog(n=30):
+    """n varied products P0..P{n-1} over 4 categories, for solver comparisons."""
+    return [
+        make_product(id=i, name=f"P{i}", category_id=1 + i % 4,
+                     price_per_unit=[35, 49.5, 60, 99, 120, 150][i % 6] + i,
+                     sugar=i % 6, fiber=(i * 3) % 7, protein=(i * 5) % 13,
+                     calories=80 + i % 60, sodium=20 + (i * 7) % 150,
+                     fat=i % 5, saturated_fat=(i % 4) / 2)
+        for i in range(n)
+    ]
+
+
+# (low, high) of each random ProductRow column; nutrients are null 10% of the time
+ROW_RANGES = {
+    "price_per_unit": (10, 500), "calories": (20, 400), "sugar": (0, 30),
+    "sodium": (0, 800), "protein": (0, 30), "fat": (0, 25),
+    "saturated_fat": (0, 10), "fiber": (0, 12),
+}
+
+
+def make_rows(n, seed=0):
+    """n ProductRow records with ids 1..n and random two-decimal values."""
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for field, (low, high) in ROW_RANGES.items():
+        column = np.round(rng.uniform(low, high, n), 2).tolist()
+        if field != "price_per_unit":
+            for i in np.flatnonzero(rng.random(n) < 0.1).tolist():
+                column[i] = None
+        columns[field] = column
+    category_ids = rng.integers(1, 9, n).tolist()
+    return [
+        ProductRow(id=i + 1, name=f"P{i + 1}", category_id=category_ids[i],
+                   category_name=f"Category {category_ids[i]}", image_url=None,
+                   **{field: columns[field][i] for field in ROW_RANGES})
+        for i in range(n)
+    ]
+
+
+def _count_queries(engine, target):
+    """Keep target.queries at the number of statements sent to `engine`."""
+    target.queries = 0
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count(*args):
+        target.queries += 1
+
+
+@pytest.fixture
+def seed():
+    """ORM rows the in-memory database starts with; modules override this."""
+    return []
+
+
+@pytest.fixture
+def session_factory(seed):
+    """Sessions on a fresh in-memory database; .queries counts statements."""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine)
+    with factory() as session:
+        session.add_all(seed)
+        session.commit()
+    _count_queries(engine, factory)
+    yield factory
+    engine.dispose()
+
+
+@pytest.fixture
+def db(session_factory):
+    """A session on the in-memory database; db.queries counts statements."""
+    session = session_factory()
+    _count_queries(session.get_bind(), session)
+    yield session
+    session.close()
+
+
 @pytest.fixture
 def sample_products():
     return [
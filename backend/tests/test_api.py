@@ -1,3 +1,6 @@
+import json
+import uuid
+
 import pytest
 from fastapi.testclient import TestClient
 from app.main import app
@@ -59,4 +62,323 @@ def test_recommend_tiny_budget():
     """Budget too low for any product should return 404."""
     response = client.post("/recommend", json={"budget": 1})
     # Either 404 (no products affordable) or 200 with few items
-    assert response.status_code in (200, 404)
\ No newline at end of file
+    assert response.status_code in (200, 404)
+
+def test_recommend_knapsack_method():
+    response = client.post("/recommend?allocation_method=knapsack", json={"budget": 500})
+    assert response.status_code == 200
+    assert response.json()["summary"]["allocation_method"] == "knapsack"
+
+
+def test_recommend_invalid_method():
+    response = client.post("/recommend?allocation_method=magic", json={"budget": 500})
+    assert response.status_code == 400
+
+
+def test_recommend_repeat_is_cached():
+    payload = {"budget": 750, "health_condition": "hypertension", "household_size": 1}
+    first = client.post("/recommend?use_lp=false", json=payload)
+    second = client.post("/recommend?use_lp=false", json=payload)
+    if first.status_code == 200:
+        assert first.headers["X-Cache"] == "MISS"
+        assert second.headers["X-Cache"] == "HIT"
+        assert second.json() == first.json()
+
+
+def test_recommend_batch_per_item_status():
+    response = client.post("/recommend/batch?allocation_method=knapsack", json=[
+        {"budget": 500, "health_condition": "diabetic"},
+        {"budget": -1},
+        {"budget": 800, "health_condition": "alien_disease"},
+        {"budget": 900, "household_size": 2},
+    ])
+    assert response.status_code == 200
+    items = response.json()
+    assert [item["status_code"] for item in items[1:3]] == [400, 400]
+    assert items[0]["status_code"] in (200, 404)
+    assert items[3]["status_code"] == 200
+    assert items[3]["result"]["summary"]["budget"] == 900
+
+
+def test_recommend_frontier():
+    response = client.post("/recommend/frontier", json={
+        "budgets": [200, 500, 1000],
+        "health_condition": None,
+    })
+    assert response.status_code == 200
+    points = response.json()["points"]
+    assert [p["budget"] for p in points] == [200, 500, 1000]
+    objectives = [p["objective"] for p in points]
+    assert objectives == sorted(objectives)
+    assert all(p["total_spent"] <= p["budget"] for p in points)
+
+
+def test_recommend_frontier_rejects_bad_budget():
+    response = client.post("/recommend/frontier", json={"budgets": [100, -5]})
+    assert response.status_code == 400
+
+
+def test_products_filtered_by_health_condition():
+    everything = client.get("/products").json()
+    diabetic = client.get("/products", params={"health_condition": "diabetic"}).json()
+    assert 0 < len(diabetic) < len(everything)
+    assert all(p["sugar"] is None or float(p["sugar"]) <= 5 for p in diabetic)
+
+
+def test_products_invalid_health_condition():
+    response = client.get("/products", params={"health_condition": "alien_disease"})
+    assert response.status_code == 400
+
+
+def test_recommend_without_catalog_cache(monkeypatch):
+    from app.routes import recommend as recommend_route
+
+    body = {"budget": 500, "health_condition": "diabetic", "household_size": 2}
+    cached = client.post("/recommend", json=body).json()
+    monkeypatch.setattr(recommend_route, "CATALOG_CACHE", False)
+    response = client.post("/recommend", json=body)
+    assert response.status_code == 200
+    assert "X-Cache" not in response.headers
+    assert response.json()["recommendations"] == cached["recommendations"]
+
+
+def test_products_keyset_pagination():
+    everything = client.get("/products").json()
+    ids, after_id = [], None
+    while True:
+        params = {"limit": 7} if after_id is None else {"limit": 7, "after_id": after_id}
+        response = client.get("/products", params=params)
+        page = response.json()
+        assert len(page) <= 7
+        ids += [p["id"] for p in page]
+        after_id = response.headers.get("X-Next-After-Id")
+        if after_id is None:
+            break
+    assert ids == sorted(p["id"] for p in everything)
+
+
+def test_products_field_projection():
+    full = client.get("/products", params={"limit": 3}).json()
+    slim = client.get("/products", params={"limit": 3, "fields": "name,category_name,price_per_unit"}).json()
+    assert slim == [
+        {k: p[k] for k in ("id", "name", "category_name", "price_per_unit")} for p in full
+    ]
+
+
+def test_products_bad_page_options():
+    assert client.get("/products", params={"fields": "name,password"}).status_code == 400
+    assert client.get("/products", params={"limit": 0}).status_code == 400
+
+
+def test_export_ndjson_matches_products():
+    response = client.get("/products/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    exported = [json.loads(line) for line in response.text.splitlines()]
+    assert exported == sorted(client.get("/products").json(), key=lambda p: p["id"])
+
+
+def test_export_csv_streams_in_batches(monkeypatch):
+    import csv
+    from app import export
+
+    monkeypatch.setattr(export, "EXPORT_BATCH_SIZE", 4)
+    response = client.get("/products/export", params={"format": "csv", "fields": "name,sugar"})
+    assert response.status_code == 200
+    rows = list(csv.reader(response.text.splitlines()))
+    assert rows[0] == ["id", "name", "sugar"]
+    assert len(rows) - 1 == len(client.get("/products").json())
+
+
+def test_export_invalid_format():
+    assert client.get("/products/export", params={"format": "xml"}).status_code == 400
+
+
+def test_export_yields_one_chunk_per_batch(monkeypatch):
+    from app import export
+
+    monkeypatch.setattr(export, "EXPORT_BATCH_SIZE", 4)
+    chunks = list(export.iter_export("ndjson"))
+    total = len(client.get("/products").json())
+    assert len(chunks) == -(-total // 4)
+    assert all(chunk.count("\n") <= 4 for chunk in chunks)
+
+
+def test_bulk_ingest_endpoint():
+    existing = client.get("/products/1").json()
+    row = {k: existing[k] for k in ("id", "name", "category_id", "price_per_unit", "calories", "image_url")}
+    body = json.dumps(row) + "\n" + json.dumps({"name": "Orphan", "category_id": 123456}) + "\n"
+    response = client.post("/products/bulk", params={"format": "ndjson"}, content=body)
+    assert response.status_code == 200
+    report = response.json()
+    assert (report["received"], report["updated"], report["inserted"]) == (2, 1, 0)
+    assert report["errors"][0]["row"] == 2
+    assert client.get("/products/1").json() == existing
+
+
+def test_bulk_ingest_invalid_format():
+    assert client.post("/products/bulk", params={"format": "xlsx"}, content="").status_code == 400
+
+
+def test_recommend_server_timing_and_timings():
+    body = {"budget": 450, "health_condition": "hypertension"}
+    response = client.post("/recommend", json=body)
+    assert response.status_code == 200
+    stages = dict(part.split(";dur=") for part in response.headers["Server-Timing"].split(", "))
+    assert {"db", "cache", "total"} <= set(stages)
+    assert response.json()["summary"]["timings_ms"] is None
+
+    response = client.post("/recommend?timings=true", json=body)
+    assert response.headers["X-Cache"] == "HIT"
+    timings = response.json()["summary"]["timings_ms"]
+    assert "solve" not in timings  # answered from the cache
+    assert timings["total"] >= timings["cache"]
+
+
+def test_metrics_endpoint():
+    client.post("/recommend", json={"budget": 650, "health_condition": "weight_loss"})
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    text = response.text
+    assert 'nutrikart_recommend_stage_seconds_count{stage="total"}' in text
+    assert "nutrikart_solver_status_total{method=" in text
+    assert "nutrikart_result_cache_hit_ratio " in text
+
+
+@pytest.mark.parametrize("path", [
+    "/products", "/products/1", "/products/batch?ids=2,1", "/categories", "/products?fields=name",
+])
+def test_catalog_reads_are_conditional(path):
+    first = client.get(path)
+    etag = first.headers["ETag"]
+    assert etag.startswith('W/"')
+    assert first.headers["Cache-Control"] == "no-cache"
+
+    repeat = client.get(path, headers={"If-None-Match": etag})
+    assert repeat.status_code == 304
+    assert repeat.content == b""
+    assert repeat.headers["ETag"] == etag
+
+    other = client.get(path, headers={"If-None-Match": 'W/"stale", "also-stale"'})
+    assert other.status_code == 200
+    assert other.json() == first.json()
+
+
+def test_not_modified_reads_only_the_catalog_version():
+    from sqlalchemy import event
+    from app.catalog import invalidate_catalog
+    from app.database import get_engine
+
+    path = "/products/batch?ids=2,1"
+    etag = client.get(path).headers["ETag"]
+    invalidate_catalog()  # a cold snapshot must not be loaded to answer
+    statements = []
+    listener = lambda *args: statements.append(args[2])  # noqa: E731
+    event.listen(get_engine(), "before_cursor_execute", listener)
+    try:
+        assert client.get(path, headers={"If-None-Match": etag}).status_code == 304
+    finally:
+        event.remove(get_engine(), "before_cursor_execute", listener)
+    assert len(statements) == 1 and "FROM catalog_version" in statements[0]
+
+
+def test_bad_or_unknown_ids_never_get_a_304():
+    for path, status in [("/products/999999", 404), ("/products/batch?ids=1,x", 400)]:
+        assert client.get(path, headers={"If-None-Match": "*"}).status_code == status
+
+
+def test_missing_version_table_is_created(db, monkeypatch):
+    from types import SimpleNamespace
+
+    from fastapi import Response
+
+    from app import http_cache
+    from app.models import CatalogVersion
+
+    CatalogVersion.__table__.drop(db.get_bind())  # a database from before the table
+    monkeypatch.setattr(http_cache, "_version_table", None)
+    response = Response()
+    assert http_cache.catalog_not_modified(SimpleNamespace(headers={}), response, db) is None
+    assert response.headers["ETag"] == http_cache.catalog_etag(0)
+    http_cache.bump_catalog_version(db)
+    db.commit()
+    assert db.get(CatalogVersion, 1).version == 1
+
+
+def test_catalog_write_changes_etag():
+    etag = client.get("/categories").headers["ETag"]
+    name = f"ETag test {uuid.uuid4().hex[:8]}"
+    assert client.post("/categories", json={"name": name}).status_code == 201
+    response = client.get("/categories", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_catalog_max_age(monkeypatch):
+    from app import http_cache
+
+    monkeypatch.setattr(http_cache, "CATALOG_MAX_AGE_SECONDS", 30)
+    assert client.get("/categories").headers["Cache-Control"] == "max-age=30"
+    monkeypatch.setattr(http_cache, "CATALOG_ETAGS", False)
+    response = client.get("/categories", headers={"If-None-Match": "*"})
+    assert response.status_code == 200
+    assert "ETag" not in response.headers
+
+
+def test_products_batch_in_requested_order():
+    singles = {i: client.get(f"/products/{i}").json() for i in (3, 1, 2)}
+    response = client.get("/products/batch", params={"ids": "3,1,999999,2,1"})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["products"] == [singles[3], singles[1], singles[2]]
+    assert body["missing"] == [999999]
+
+
+def test_products_batch_is_one_query():
+    from sqlalchemy import event
+    from app.catalog import invalidate_catalog
+    from app.database import get_engine
+
+    invalidate_catalog()  # same queries whether or not a snapshot is loaded
+    statements = []
+    listener = lambda *args: statements.append(args[2])  # noqa: E731
+    event.listen(get_engine(), "before_cursor_execute", listener)
+    try:
+        ids = ",".join(str(i) for i in range(1, 21))
+        assert client.get("/products/batch", params={"ids": ids}).status_code == 200
+    finally:
+        event.remove(get_engine(), "before_cursor_execute", listener)
+    version, products = statements  # the ETag's catalog_version lookup, then the batch
+    assert "FROM catalog_version" in version and "FROM products" in products
+
+
+def test_products_batch_bad_ids(monkeypatch):
+    from app.routes import products as products_route
+
+    assert client.get("/products/batch", params={"ids": "1,x"}).status_code == 400
+    assert client.get("/products/batch", params={"ids": ""}).status_code == 400
+    assert client.get("/products/batch").status_code == 422
+    monkeypatch.setattr(products_route, "PRODUCTS_BATCH_MAX", 2)
+    response = client.get("/products/batch", params={"ids": "1,2,3"})
+    assert response.status_code == 400
+    assert "At most 2" in response.json()["detail"]
+
+
+def test_lp_requests_build_no_shared_model_by_default():
+    from app import catalog
+
+    catalog.invalidate_catalog()
+    assert client.post("/recommend?allocation_method=lp", json={"budget": 323}).status_code == 200
+    assert catalog._snapshot._lp_model is None
+
+
+@pytest.mark.parametrize("query", ["allocation_method=knapsack", "allocation_method=greedy", "use_lp=false"])
+def test_non_lp_requests_skip_the_lp_model(query, monkeypatch):
+    from app import catalog
+
+    monkeypatch.setattr(catalog, "LP_SHARED_MODEL", True)
+    catalog.invalidate_catalog()
+    assert client.post(f"/recommend?{query}", json={"budget": 321}).status_code == 200
+    assert client.post(f"/recommend/batch?{query}", json=[{"budget": 322}]).status_code == 200
+    assert catalog._snapshot._lp_model is None
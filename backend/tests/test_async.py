@@ -0,0 +1,92 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.catalog import invalidate_catalog
+from app.database import async_database_url
+from app.main import app as sync_app
+from app.routes import aio, categories, products, recommend
+
+pytest.importorskip("aiosqlite")
+
+
+@pytest.fixture(scope="module")
+def clients():
+    app = FastAPI()
+    app.include_router(aio.router)
+    app.include_router(categories.router)
+    app.include_router(products.router)
+    app.include_router(recommend.router)
+    with TestClient(app) as async_client:
+        yield async_client, TestClient(sync_app)
+
+
+@pytest.fixture(autouse=True)
+def fresh_catalog():
+    invalidate_catalog()
+    yield
+    invalidate_catalog()
+
+
+def test_async_url():
+    assert async_database_url("postgresql://u:p@h:5432/db") == "postgresql+asyncpg://u:p@h:5432/db"
+    assert async_database_url("sqlite:////tmp/x.db") == "sqlite+aiosqlite:////tmp/x.db"
+
+
+@pytest.mark.parametrize("path,params", [
+    ("/products", {}),
+    ("/products", {"health_condition": "diabetic", "category_id": 1}),
+    ("/products", {"after_id": 5, "limit": 4, "fields": "name,sugar"}),
+    ("/products/1", {}),
+    ("/products/batch", {"ids": "4,2,999999"}),
+    ("/categories", {}),
+])
+def test_reads_match_sync(clients, path, params):
+    async_client, sync_client = clients
+    a, s = async_client.get(path, params=params), sync_client.get(path, params=params)
+    assert a.status_code == s.status_code == 200
+    key = lambda item: item["id"]
+    if isinstance(a.json(), list):
+        assert sorted(a.json(), key=key) == sorted(s.json(), key=key)
+    else:
+        assert a.json() == s.json()
+
+
+@pytest.mark.parametrize("path", ["/products", "/products/1", "/categories"])
+def test_conditional_reads_share_the_sync_etag(clients, path):
+    async_client, sync_client = clients
+    etag = sync_client.get(path).headers["ETag"]
+    assert async_client.get(path).headers["ETag"] == etag
+    assert async_client.get(path, headers={"If-None-Match": etag}).status_code == 304
+
+
+def test_missing_product(clients):
+    async_client, _ = clients
+    assert async_client.get("/products/999999").status_code == 404
+
+
+@pytest.mark.parametrize("catalog_cache", [True, False])
+def test_recommend_matches_sync(clients, monkeypatch, catalog_cache):
+    monkeypatch.setattr(recommend, "CATALOG_CACHE", catalog_cache)
+    async_client, sync_client = clients
+    body = {"budget": 400, "health_condition": "hypertension", "household_size": 2}
+    a = async_client.post("/recommend", json=body, params={"allocation_method": "knapsack"})
+    s = sync_client.post("/recommend", json=body, params={"allocation_method": "knapsack"})
+    assert a.status_code == s.status_code == 200
+    assert a.json()["recommendations"] == s.json()["recommendations"]
+
+
+def test_recommend_validation(clients):
+    async_client, _ = clients
+    response = async_client.post("/recommend", json={"budget": -1})
+    assert response.status_code == 400
+
+
+def test_version_table_checked_through_the_async_session(clients, monkeypatch):
+    from app import http_cache
+
+    async_client, sync_client = clients
+    monkeypatch.setattr(http_cache, "_version_table", None)
+    etag = async_client.get("/categories").headers["ETag"]
+    assert http_cache._version_table is True
+    assert sync_client.get("/categories").headers["ETag"] == etag
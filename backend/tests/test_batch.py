@@ -0,0 +1,31 @@
+from app.recommendation import get_recommendation, get_recommendations
+from tests.conftest import make_catalog
+
+
+REQUESTS = [
+    {"health_condition": "diabetic", "budget": 300, "household_size": 1},
+    {"health_condition": None, "budget": 800, "household_size": 3},
+    {"health_condition": "diabetic", "budget": 1200, "household_size": 2},
+    {"health_condition": "hypertension", "budget": 150},
+]
+
+
+def test_batch_matches_individual_calls():
+    products = make_catalog(60)
+    for method in ("greedy", "knapsack"):
+        batch = get_recommendations(products, REQUESTS, allocation_method=method)
+        single = [get_recommendation(products, allocation_method=method, **r) for r in REQUESTS]
+        assert batch == single
+
+
+def test_batch_lp_shares_a_model():
+    products = make_catalog(60)
+    batch = get_recommendations(products, REQUESTS, use_lp=True)
+    assert [r["summary"]["budget"] for r in batch] == [r["budget"] for r in REQUESTS]
+    for result, request in zip(batch, REQUESTS):
+        assert result["summary"]["allocation_method"] == "lp"
+        assert result["summary"]["total_spent"] <= request["budget"]
+
+
+def test_empty_batch():
+    assert get_recommendations(make_catalog(60), []) == []
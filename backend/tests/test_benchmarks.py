@@ -0,0 +1,55 @@
+from benchmarks.catalog import NUMERIC_FIELDS, load_distributions, synthetic_catalog
+from benchmarks.run import STAGES, compare, run
+
+
+def test_synthetic_catalog_is_reproducible():
+    first = synthetic_catalog(200, seed=3)
+    again = synthetic_catalog(200, seed=3)
+    other = synthetic_catalog(200, seed=4)
+    fields = ("id", "category_id", *NUMERIC_FIELDS)
+    rows = lambda catalog: [tuple(getattr(p, f) for f in fields) for p in catalog]
+    assert rows(first) == rows(again)
+    assert rows(first) != rows(other)
+    assert [p.id for p in first] == list(range(1, 201))
+
+
+def test_synthetic_catalog_follows_seed_csv():
+    distributions = load_distributions()
+    catalog = synthetic_catalog(2000)
+    assert all(p.price_per_unit > 0 for p in catalog)
+    assert {p.category_id for p in catalog} <= set(distributions["category_id"].tolist())
+    # missing nutrients appear about as often as in the CSV
+    _, missing = distributions["sugar"]
+    share = sum(p.sugar is None for p in catalog) / len(catalog)
+    assert abs(share - missing) < 0.05
+
+
+def test_run_reports_every_case():
+    report = run(sizes=(50,), budgets=(100.0, 300.0), stages={"filter", "greedy"},
+                 repeat=2, memory=False)
+    cases = {(c["stage"], c["condition"], c["budget"]) for c in report["results"]}
+    assert len(cases) == 4 + 4 * 2
+    case = report["results"][0]
+    assert case["runs"] == 2
+    assert case["min_ms"] <= case["p50_ms"] <= case["p95_ms"] <= case["p99_ms"]
+    assert "peak_kib" not in case
+    assert set(STAGES) >= {c["stage"] for c in report["results"]}
+
+
+def test_compare_flags_slower_and_larger_cases():
+    def report(*cases):
+        return {"results": [
+            {"stage": stage, "size": 1000, "condition": None, "budget": None,
+             "p50_ms": p50, "peak_kib": peak}
+            for stage, p50, peak in cases
+        ]}
+
+    baseline = report(("filter", 1.0, 10.0), ("rank", 1.0, 10.0),
+                      ("greedy", 0.01, 1.0), ("columns", 5.0, 100.0))
+    current = report(("filter", 1.5, 10.0), ("rank", 1.1, 20.0),
+                     ("greedy", 0.03, 1.0), ("knapsack", 9.0, 1.0))
+    rows = {row["stage"]: row for row in compare(baseline, current, threshold=0.2)}
+    assert set(rows) == {"filter", "rank", "greedy"}
+    assert rows["filter"]["regression"] and rows["filter"]["p50_ratio"] == 1.5
+    assert rows["rank"]["regression"]        # peak doubled
+    assert not rows["greedy"]["regression"]  # 3x, but only 0.02 ms
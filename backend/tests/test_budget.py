@@ -1,4 +1,4 @@
-from app.recommendation import allocate_budget, rank_products
+from app.recommendation import allocate_budget, iter_ranked_products, rank_products
 from tests.conftest import make_product
 
 
@@ -53,4 +53,29 @@ def test_very_low_budget_returns_few_items():
 def test_empty_ranked_list():
     allocations, remaining = allocate_budget([], budget=500, household_size=1)
     assert len(allocations) == 0
-    assert remaining == 500
\ No newline at end of file
+    assert remaining == 500
+
+def test_lazy_ranking_gives_same_allocation():
+    products = [
+        make_product(id=i, name=f"P{i}", price_per_unit=20 + (i * 37) % 300,
+                     sugar=i % 7, fiber=i % 5, protein=i % 11)
+        for i in range(200)
+    ]
+    eager, eager_left = allocate_budget(rank_products(products, "diabetic"), budget=700, household_size=2)
+    lazy, lazy_left = allocate_budget(
+        iter_ranked_products(products, "diabetic"), budget=700, household_size=2, min_price=20,
+    )
+    assert lazy == eager
+    assert lazy_left == eager_left
+
+
+def test_min_price_stops_pulling_candidates():
+    pulled = []
+
+    def ranked():
+        for i in range(100):
+            pulled.append(i)
+            yield make_product(id=i, price_per_unit=100), 0.0
+
+    allocate_budget(ranked(), budget=250, household_size=1, min_price=100)
+    assert len(pulled) == 3
@@ -0,0 +1,38 @@
+from app.cache import LRUCache
+
+
+def test_hit_and_miss_counters():
+    cache = LRUCache(maxsize=2)
+    assert cache.get("a") is None
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+    assert cache.stats()["hit_rate"] == 0.5
+
+
+def test_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_expired_entries_miss(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("app.cache.time.monotonic", lambda: now[0])
+    cache = LRUCache(maxsize=4, ttl=10)
+    cache.set("a", 1)
+    now[0] += 11
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_zero_size_disables():
+    cache = LRUCache(maxsize=0)
+    cache.set("a", 1)
+    assert cache.get("a") is None
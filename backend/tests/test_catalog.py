@@ -0,0 +1,106 @@
+import pickle
+
+import pytest
+
+from app import catalog
+from app.catalog import get_catalog, invalidate_catalog
+from app.models import Product, Category
+from app.queries import ProductRow
+
+
+@pytest.fixture(autouse=True)
+def fresh_catalog():
+    invalidate_catalog()
+    yield
+    invalidate_catalog()
+
+
+@pytest.fixture
+def seed():
+    return [
+        Category(id=1, name="Breakfast"),
+        Category(id=2, name="Snacks"),
+        Product(id=1, name="Oats", category_id=1, price_per_unit="49.50", sugar=1),
+        Product(id=2, name="Chips", category_id=2, price_per_unit=20, sugar=None),
+    ]
+
+
+def test_loaded_once_while_fresh(db):
+    first = get_catalog(db)
+    queries = db.queries
+    second = get_catalog(db)
+    assert second is first
+    assert db.queries == queries
+
+
+def test_category_names_attached(db):
+    snapshot = get_catalog(db)
+    names = {p.name: p.category_name for p in snapshot.products}
+    assert names == {"Oats": "Breakfast", "Chips": "Snacks"}
+
+
+def test_invalidate_reloads_with_new_version(db):
+    first = get_catalog(db)
+    db.add(Product(id=3, name="Bar", category_id=1))
+    db.commit()
+    invalidate_catalog()
+    second = get_catalog(db)
+    assert second.version > first.version
+    assert len(second) == 3
+
+
+def test_expired_snapshot_reloads(db, monkeypatch):
+    first = get_catalog(db)
+    monkeypatch.setattr(catalog, "CATALOG_TTL_SECONDS", 1)
+    monkeypatch.setattr(first, "loaded_at", first.loaded_at - 5)
+    assert get_catalog(db) is not first
+
+
+def test_rows_are_light_records_with_floats(db):
+    oats, chips = get_catalog(db).products
+    assert isinstance(oats, ProductRow)
+    assert not hasattr(oats, "__dict__")
+    assert oats.price_per_unit == 49.5 and type(oats.price_per_unit) is float
+    assert chips.sugar is None
+
+
+def test_rows_pickle_for_worker_processes(db):
+    oats = get_catalog(db).products[0]
+    copy = pickle.loads(pickle.dumps(oats))
+    assert (copy.id, copy.name, copy.category_name) == (1, "Oats", "Breakfast")
+
+
+def test_change_rolls_snapshot_forward_without_reload(db, monkeypatch):
+    from app.catalog import changes_since, record_change
+    from app.recommendation import get_recommendation
+
+    monkeypatch.setattr(catalog, "LP_SHARED_MODEL", True)
+    first = get_catalog(db)
+    first.columns, first.lp_model  # built before the change
+    queries = db.queries
+
+    added = ProductRow(id=3, name="Bar", category_id=1, category_name="Breakfast",
+                       price_per_unit=30.0, protein=12.0)
+    change = record_change(upserts=[added], deletes=[2])
+    second = get_catalog(db)
+    assert db.queries == queries
+    assert second.version == change.version > first.version
+    assert [p.name for p in second.products] == ["Oats", "Bar"]
+    assert [p.name for p in second.columns.products] == ["Oats", "Bar"]
+    assert second.lp_model is first.lp_model and len(second.lp_model) == 2
+    assert [p.name for p in first.products] == ["Oats", "Chips"]  # old snapshot intact
+
+    result = get_recommendation(second.columns, None, 200, lp_model=second.lp_model)
+    assert {r["name"] for r in result["recommendations"]} == {"Oats", "Bar"}
+
+    assert changes_since(first.version) == [change]
+    assert changes_since(change.version) == []
+
+
+def test_change_log_reset_by_invalidation(db):
+    from app.catalog import changes_since, record_change
+
+    first = get_catalog(db)
+    record_change(deletes=[1])
+    invalidate_catalog()
+    assert changes_since(first.version) is None
@@ -0,0 +1,316 @@
+import pickle
+
+import numpy as np
+import pytest
+
+from app import catalog, catalog_file
+from app.catalog import CatalogSnapshot, get_catalog, invalidate_catalog, record_change
+from app.catalog_file import open_catalog_file, write_catalog_file
+from app.columnar import NUTRIENT_FIELDS, ProductColumns
+from app.models import Category, Product
+from app.queries import ProductRow
+from app.recommendation import _ranking_for, get_recommendation, precompute_rankings
+from tests.conftest import make_rows
+
+
+def _fields(row):
+    return {name: getattr(row, name) for name in ProductRow.__slots__}
+
+
+ROWS = [
+    ProductRow(1, "Oats", 1, "Breakfast", 49.5, 120.0, 1.0, None, 10.0, 2.5, 0.4, 10.0,
+               "https://example.com/oats.jpg"),
+    ProductRow(2, "Chips", 2, "Snacks", 20.0, None, None, 500.0, None, None, None, None, None),
+    ProductRow(3, "Dahi 🥛", 1, "Breakfast", None, 60.25, 4.75, 45.0, 3.1, 3.3, 2.0, 0.0, None),
+]
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "catalog.bin")
+
+
+def test_rows_round_trip(path):
+    mapped = write_catalog_file(path, ROWS)
+    assert len(mapped) == 3
+    assert [_fields(row) for row in mapped.products] == [_fields(row) for row in ROWS]
+    assert open_catalog_file(path).products[2].name == "Dahi 🥛"
+
+
+def test_strings_are_interned(path):
+    mapped = write_catalog_file(path, ROWS)
+    # 3 names, 2 category names, 1 image url
+    assert len(mapped.arrays["str_offsets"]) == 6 + 1
+
+
+def test_columns_match_rows(path):
+    rows = make_rows(500, seed=3)
+    columns = write_catalog_file(path, rows).columns()
+    expected = ProductColumns(rows)
+    for field in NUTRIENT_FIELDS:
+        np.testing.assert_array_equal(columns.columns[field], expected.columns[field])
+    np.testing.assert_array_equal(columns.price, expected.price)
+
+
+def test_recommendations_match_in_memory_catalog(path):
+    rows = make_rows(500, seed=3)
+    mapped = write_catalog_file(path, rows).columns()
+    expected = ProductColumns(rows)
+    precompute_rankings(mapped)
+    for condition in (None, "diabetic"):
+        for method in ("greedy", "knapsack"):
+            assert get_recommendation(mapped, condition, 200, allocation_method=method) == \
+                get_recommendation(expected, condition, 200, allocation_method=method)
+
+
+def test_lp_model_reads_only_ranked_rows(path, monkeypatch):
+    monkeypatch.setattr(catalog, "LP_SHARED_MODEL", True)
+    mapped = write_catalog_file(path, make_rows(300, seed=4))
+    snapshot = CatalogSnapshot.from_file(1, mapped)
+    model = snapshot.lp_model
+    assert len(model) == 0 and mapped.products._rows == {}
+    result = get_recommendation(snapshot.columns, "diabetic", 300, lp_model=model)
+    assert result["summary"]["allocation_method"] == "lp"
+    eligible = len(_ranking_for(snapshot.columns, "diabetic"))
+    assert len(model) == len(mapped.products._rows) == eligible < 300
+
+
+def test_rows_are_built_lazily_and_once(path):
+    products = write_catalog_file(path, ROWS).products
+    assert products._rows == {}
+    assert products[1] is products[1] is products[-2]
+    assert list(products._rows) == [1]
+    with pytest.raises(IndexError):
+        products[3]
+
+
+def test_columns_are_read_only_views_of_the_file(path):
+    mapped = write_catalog_file(path, ROWS)
+    ids = mapped.arrays["id"]
+    assert not ids.flags.writeable
+    assert not ids.flags.owndata
+
+
+def test_more_than_two_decimals_rejected(path):
+    with pytest.raises(ValueError, match="two decimals"):
+        write_catalog_file(path, [ProductRow(1, "X", 1, "C", 2.499)])
+
+
+def test_not_a_catalog_file(path):
+    with open(path, "wb") as f:
+        f.write(b"x" * 100)
+    with pytest.raises(ValueError):
+        open_catalog_file(path)
+
+
+def test_rewrite_is_an_atomic_swap(path, tmp_path):
+    old = write_catalog_file(path, ROWS)
+    new = write_catalog_file(path, ROWS[:1])
+    assert new.file_id != old.file_id
+    assert catalog_file.file_id(path) == new.file_id
+    # the old mapping still reads the old version; no temporary files remain
+    assert len(old.products) == 3 and old.products[2].name == "Dahi 🥛"
+    assert [p.name for p in tmp_path.iterdir()] == ["catalog.bin"]
+
+
+def test_pickles_as_a_copy(path):
+    mapped = pickle.loads(pickle.dumps(write_catalog_file(path, ROWS)))
+    assert [_fields(row) for row in mapped.products] == [_fields(row) for row in ROWS]
+
+
+# ── Shared through the catalog snapshot ──
+
+
+@pytest.fixture
+def shared(path, monkeypatch):
+    monkeypatch.setattr(catalog, "CATALOG_FILE", path)
+    invalidate_catalog()
+    yield path
+    invalidate_catalog()
+
+
+@pytest.fixture
+def seed():
+    return [
+        Category(id=1, name="Breakfast"),
+        Product(id=1, name="Oats", category_id=1, price_per_unit="49.50", sugar=1),
+        Product(id=2, name="Bar", category_id=1, price_per_unit=20),
+    ]
+
+
+class NoDatabase:
+    def execute(self, *args, **kwargs):
+        raise AssertionError("queried the database")
+
+
+def _other_worker():
+    """Forget this process' snapshot, as if another worker were asking."""
+    catalog._snapshot = None
+
+
+def test_load_writes_the_shared_file(shared, db):
+    snapshot = get_catalog(db)
+    assert snapshot.catalog_file is not None
+    assert [p.name for p in open_catalog_file(shared).products] == ["Oats", "Bar"]
+
+
+def test_other_workers_map_the_file_without_querying(shared, db):
+    first = get_catalog(db)
+    _other_worker()
+    second = get_catalog(NoDatabase())
+    assert second is not first
+    assert [_fields(p) for p in second.products] == [_fields(p) for p in first.products]
+
+
+def test_stale_file_is_reloaded(shared, db, monkeypatch):
+    get_catalog(db)
+    _other_worker()
+    monkeypatch.setattr(catalog, "CATALOG_TTL_SECONDS", 1)
+    monkeypatch.setattr(catalog_file.CatalogFile, "age", lambda self: 5.0)
+    with pytest.raises(AssertionError, match="queried"):
+        get_catalog(NoDatabase())
+
+
+def test_change_is_published_to_other_workers(shared, db):
+    first = get_catalog(db)
+    record_change(upserts=[ProductRow(3, "Milk", 1, "Breakfast", 60.0)])
+    writer = get_catalog(NoDatabase())
+    assert writer.version > first.version and len(writer) == 3
+
+    _other_worker()
+    reader = get_catalog(NoDatabase())
+    assert reader.catalog_file is not None
+    assert [p.name for p in reader.products] == ["Oats", "Bar", "Milk"]
+
+
+def test_interleaved_writes_from_two_workers_are_kept(shared, db):
+    get_catalog(db)
+    first = catalog._snapshot
+    _other_worker()
+    get_catalog(NoDatabase())
+    second = catalog._snapshot  # both map the same file
+
+    catalog._snapshot = first
+    record_change(upserts=[ProductRow(3, "Milk", 1, "Breakfast", 60.0)])
+    catalog._snapshot = second  # behind the file the first worker wrote
+    record_change(upserts=[ProductRow(4, "Tea", 1, "Breakfast", 80.0)], deletes=[2])
+
+    _other_worker()
+    assert [p.name for p in get_catalog(NoDatabase()).products] == ["Oats", "Milk", "Tea"]
+
+
+def test_change_from_a_worker_without_a_snapshot_is_published(shared, db):
+    get_catalog(db)
+    _other_worker()  # the writing worker hasn't served a catalog read yet
+    record_change(upserts=[ProductRow(3, "Milk", 1, "Breakfast", 60.0)], deletes=[2])
+
+    _other_worker()
+    assert [p.name for p in get_catalog(NoDatabase()).products] == ["Oats", "Milk"]
+
+
+def test_change_without_a_current_file_removes_it(shared, db, monkeypatch):
+    get_catalog(db)
+    _other_worker()
+    monkeypatch.setattr(catalog, "CATALOG_TTL_SECONDS", 1)
+    monkeypatch.setattr(catalog_file.CatalogFile, "age", lambda self: 5.0)
+    record_change(upserts=[ProductRow(3, "Milk", 1, "Breakfast", 60.0)])
+    assert catalog_file.file_id(shared) is None
+
+
+def test_change_writes_only_the_delta(shared, db):
+    get_catalog(db)
+    base = catalog_file.file_id(shared)
+    record_change(upserts=[ProductRow(3, "Milk", 1, "Breakfast", 60.0)], deletes=[1])
+    assert catalog_file.file_id(shared) == base
+    assert catalog_file.file_id(catalog_file.delta_path(shared)) is not None
+
+    _other_worker()
+    reader = get_catalog(NoDatabase())
+    assert reader.catalog_file.file_id == base
+    assert [p.name for p in reader.products] == ["Bar", "Milk"]
+
+
+def test_long_delta_is_folded_into_the_file(shared, db, monkeypatch):
+    monkeypatch.setattr(catalog_file, "CATALOG_DELTA_MAX_ROWS", 1)
+    get_catalog(db)
+    base = catalog_file.file_id(shared)
+    record_change(upserts=[ProductRow(3, "Milk", 1, "Breakfast", 60.0)])
+    assert catalog_file.file_id(shared) == base
+    record_change(upserts=[ProductRow(4, "Tea", 1, "Breakfast", 80.0)])
+    assert catalog_file.file_id(shared) != base
+    assert catalog_file.file_id(catalog_file.delta_path(shared)) is None
+    assert [p.name for p in open_catalog_file(shared).products] == ["Oats", "Bar", "Milk", "Tea"]
+
+    record_change(deletes=[1])  # starts a new delta on the rewritten file
+    _other_worker()
+    assert [p.name for p in get_catalog(NoDatabase()).products] == ["Bar", "Milk", "Tea"]
+
+
+def test_delta_keeps_the_writer_row_order(shared, db):
+    get_catalog(db)
+    record_change(upserts=[ProductRow(3, "Milk", 1, "Breakfast", 60.0)])
+    record_change(deletes=[1, 3])
+    record_change(upserts=[ProductRow(1, "Oats", 1, "Breakfast", 45.0),
+                           ProductRow(2, "Bar", 1, "Breakfast", 25.0)])
+    record_change(upserts=[ProductRow(3, "Milk", 1, "Breakfast", 55.0)])
+    writer = get_catalog(NoDatabase())
+
+    _other_worker()
+    reader = get_catalog(NoDatabase())
+    assert [_fields(p) for p in reader.products] == [_fields(p) for p in writer.products]
+    assert [p.id for p in reader.products] == [2, 1, 3]
+
+
+def test_unreadable_delta_is_ignored(shared, db):
+    get_catalog(db)
+    with open(catalog_file.delta_path(shared), "w") as f:
+        f.write("{")
+    _other_worker()
+    assert len(get_catalog(db)) == 2  # reloaded, and the bad delta dropped
+    _other_worker()
+    assert len(get_catalog(NoDatabase())) == 2
+
+
+def test_published_file_keeps_the_load_time(shared, db, monkeypatch):
+    monkeypatch.setattr(catalog_file, "CATALOG_DELTA_MAX_ROWS", 0)  # rewrite on every change
+    snapshot = get_catalog(db)
+    snapshot.loaded_at -= 100  # loaded from the database 100 s ago
+    record_change(upserts=[ProductRow(3, "Milk", 1, "Breakfast", 60.0)])
+    assert open_catalog_file(shared).age() == pytest.approx(100, abs=1)
+
+
+def test_change_to_a_mapped_catalog_reads_only_changed_rows(shared):
+    write_catalog_file(shared, make_rows(300, seed=4))
+    snapshot = get_catalog(NoDatabase())
+    rows = snapshot.catalog_file.products
+    first_id, second_id = (int(i) for i in snapshot.catalog_file.arrays["id"][:2])
+    record_change(upserts=[ProductRow(first_id, "Renamed", 1, "C", 10.0)], deletes=[second_id])
+    assert rows._rows == {}
+
+    _other_worker()
+    reader = get_catalog(NoDatabase())
+    assert len(reader) == 299 and reader.products[0].name == "Renamed"
+
+
+def test_swapped_file_replaces_the_snapshot(shared, db):
+    first = get_catalog(db)
+    write_catalog_file(shared, ROWS)  # e.g. another worker reloaded
+    second = get_catalog(NoDatabase())
+    assert second is not first
+    assert len(second) == 3
+
+
+def test_invalidate_removes_the_file(shared, db):
+    get_catalog(db)
+    record_change(upserts=[ProductRow(3, "Milk", 1, "Breakfast", 60.0)])
+    invalidate_catalog()
+    assert catalog_file.file_id(shared) is None
+    assert catalog_file.file_id(catalog_file.delta_path(shared)) is None
+
+
+def test_unshareable_rows_fall_back_to_memory(shared, db):
+    db.add(Product(id=3, name="Odd", category_id=1, price_per_unit=1.005))
+    db.commit()
+    snapshot = get_catalog(db)
+    assert snapshot.catalog_file is None and len(snapshot) == 3
+    assert catalog_file.file_id(shared) is None
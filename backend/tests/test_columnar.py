@@ -0,0 +1,156 @@
+import random
+from decimal import Decimal
+
+import numpy as np
+
+from app.columnar import ProductColumns, round2
+from app.recommendation import (
+    CONSTRAINT_FIELD_MAP,
+    HEALTH_CONSTRAINTS,
+    SCORING_WEIGHTS,
+    filter_products,
+    get_recommendation,
+    rank_products,
+    score_product,
+)
+from tests.conftest import make_product
+
+NUTRIENTS = ["calories", "sugar", "sodium", "protein", "fat", "saturated_fat", "fiber"]
+
+
+def random_catalog(n, seed=7):
+    rng = random.Random(seed)
+    products = []
+    for i in range(n):
+        values = {}
+        for field in NUTRIENTS:
+            if rng.random() < 0.15:
+                values[field] = None
+            else:
+                values[field] = Decimal(f"{rng.uniform(0, 300):.2f}")
+        products.append(make_product(id=i, name=f"P{i}", price_per_unit=rng.randint(10, 400), **values))
+    # exact duplicates to exercise tie ordering
+    products += [make_product(**{**vars(products[0]), "id": n + k}) for k in range(3)]
+    return products
+
+
+def reference_filter(products, condition):
+    if not condition or condition not in HEALTH_CONSTRAINTS:
+        return list(products)
+    out = []
+    for p in products:
+        ok = True
+        for key, max_value in HEALTH_CONSTRAINTS[condition].items():
+            value = getattr(p, CONSTRAINT_FIELD_MAP[key], None)
+            if value is not None and value > max_value:
+                ok = False
+                break
+        if ok:
+            out.append(p)
+    return out
+
+
+def reference_rank(products, condition):
+    scored = [(p, score_product(p, condition)) for p in products]
+    scored.sort(key=lambda x: x[1], reverse=True)
+    return scored
+
+
+def test_filter_matches_reference():
+    products = random_catalog(500)
+    for condition in [None, "diabetic", "hypertension", "weight_loss", "bogus"]:
+        assert filter_products(products, condition) == reference_filter(products, condition)
+
+
+def test_rank_matches_reference_including_ties():
+    products = random_catalog(500)
+    for condition in [None, "diabetic", "hypertension", "weight_loss"]:
+        got = rank_products(products, condition)
+        expected = reference_rank(products, condition)
+        assert [p.id for p, _ in got] == [p.id for p, _ in expected]
+        assert [s for _, s in got] == [s for _, s in expected]
+
+
+def test_round2_matches_python_round():
+    raw = np.array([0.285, 1.005, 2.675, -0.125, -94.0, 1e-9, 123.455, -7.345])
+    raw = np.concatenate([raw, np.random.default_rng(0).uniform(-500, 500, 10_000)])
+    assert round2(raw).tolist() == [round(x, 2) for x in raw.tolist()]
+
+
+def test_columns_accepted_by_pipeline():
+    products = random_catalog(50)
+    columns = ProductColumns(products)
+    from_list = get_recommendation(products, "diabetic", 500, use_lp=False)
+    from_columns = get_recommendation(columns, "diabetic", 500, use_lp=False)
+    assert from_list == from_columns
+
+
+def test_iter_ranked_matches_rank_with_boundary_ties():
+    # coarse values -> many equal scores straddling batch boundaries
+    rng = random.Random(3)
+    products = [
+        make_product(id=i, sugar=rng.choice([1, 2, None]), fiber=rng.choice([1, 2]),
+                     protein=1, sodium=1, calories=1, saturated_fat=1)
+        for i in range(300)
+    ]
+    columns = ProductColumns(products)
+    weights = {"sugar": -1.0, "fiber": 1.0}
+    lazy = list(columns.iter_ranked(weights, batch_size=7))
+    assert [(p.id, s) for p, s in lazy] == [(p.id, s) for p, s in columns.rank(weights)]
+
+
+def test_iter_ranked_is_lazy():
+    columns = ProductColumns(random_catalog(1000))
+    it = columns.iter_ranked({"protein": 1.0}, batch_size=10)
+    first = [next(it) for _ in range(5)]
+    assert [p.id for p, _ in first] == [p.id for p, _ in columns.rank({"protein": 1.0})[:5]]
+
+
+def test_apply_matches_rebuilt_columns():
+    products = random_catalog(300)
+    columns = ProductColumns(products)
+    changed = make_product(**{**vars(products[10]), "sugar": None, "price_per_unit": 1})
+    added = [make_product(id=1000 + i, name=f"N{i}", sugar=i, price_per_unit=20) for i in range(3)]
+    deleted = {products[0].id, products[150].id, products[299].id}
+
+    edited = columns.apply(upserts=[changed, *added], deletes=deleted)
+    expected = ProductColumns(
+        [changed if p is products[10] else p for p in products if p.id not in deleted] + added
+    )
+    assert edited.products == expected.products
+    for field, col in expected.columns.items():
+        np.testing.assert_array_equal(edited.columns[field], col)
+    np.testing.assert_array_equal(edited.price, expected.price)
+    weights = SCORING_WEIGHTS["diabetic"]
+    assert edited.rank(weights) == expected.rank(weights)
+    assert columns.products == tuple(products)  # the original is untouched
+
+
+def test_apply_over_lazy_products_layers_the_edits():
+    products = random_catalog(300)
+    eager = ProductColumns(products)
+    lazy = ProductColumns.from_columns(
+        LazyList(products), eager.columns, eager.price, np.array([p.id for p in products])
+    )
+    changed = make_product(**{**vars(products[10]), "protein": 99})
+    added = [make_product(id=1000 + i, name=f"N{i}", price_per_unit=20) for i in range(3)]
+    edits = dict(upserts=[changed, *added], deletes={products[0].id, products[200].id})
+
+    edited = lazy.apply(**edits).apply(upserts=[make_product(id=1001, name="M")], deletes={1000})
+    assert lazy.products.read == set()  # no row was read to edit
+    expected = eager.apply(**edits).apply(upserts=[make_product(id=1001, name="M")], deletes={1000})
+    assert list(edited.products) == list(expected.products)
+    assert edited.index == expected.index
+    np.testing.assert_array_equal(edited.columns["protein"], expected.columns["protein"])
+
+
+class LazyList(list):
+    """A list that records which rows were read."""
+
+    def __init__(self, items):
+        super().__init__(items)
+        self.read = set()
+
+    def __getitem__(self, i):
+        self.read.add(i)
+        return super().__getitem__(i)
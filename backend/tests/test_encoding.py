@@ -0,0 +1,72 @@
+import json
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from app import encoding
+from app.encoding import dumps, json_response, shaper
+from app.recommendation import get_budget_frontier, get_recommendation, get_recommendations
+from app.schemas import BatchRecommendItem, FrontierResponse, RecommendResponse
+from tests.conftest import make_product
+
+
+def products():
+    return [
+        make_product(id=i, name=f"Prodütto {i}", price_per_unit=25 * i, category_id=1,
+                     sugar=i or None, fiber=None, protein=12 - i, calories=80 + i)
+        for i in range(1, 8)
+    ]
+
+
+def fastapi_bytes(annotation, content) -> bytes:
+    """What FastAPI sends for `content` through response_model=annotation."""
+    validated = TypeAdapter(annotation).validate_python(content)
+    return json.dumps(
+        jsonable_encoder(validated), ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def recommend_result():
+    # greedy leaves ints (0 for missing nutrients, budget) for the schema to coerce
+    return get_recommendation(products(), None, 300, household_size=2, use_lp=False)
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_recommend_bytes_match_response_model(monkeypatch, use_orjson):
+    if not use_orjson:
+        monkeypatch.setattr(encoding, "orjson", None)
+    result = recommend_result()
+    assert dumps(shaper(RecommendResponse)(result)) == fastapi_bytes(RecommendResponse, result)
+
+
+def test_batch_and_frontier_bytes_match_response_model():
+    results = get_recommendations(products(), [{"budget": 100}, {"budget": 250, "health_condition": "diabetic"}])
+    items = [{"status_code": 400, "detail": "Budget must be greater than 0"}] + [
+        {"status_code": 200, "result": result} for result in results
+    ]
+    annotation = list[BatchRecommendItem]
+    assert dumps(shaper(annotation)(items)) == fastapi_bytes(annotation, items)
+
+    frontier = get_budget_frontier(products(), None, [50, 200])
+    assert dumps(shaper(FrontierResponse)(frontier)) == fastapi_bytes(FrontierResponse, frontier)
+
+
+def test_shaper_fills_defaults_and_requires_the_rest():
+    summary = dict(recommend_result()["summary"])
+    del summary["solver_status"]
+    shaped = shaper(RecommendResponse)({"recommendations": [], "summary": summary})
+    assert shaped["summary"]["solver_status"] is None
+    assert shaped["summary"]["timings_ms"] is None
+    assert isinstance(shaped["summary"]["budget"], float)
+
+    del summary["budget"]
+    with pytest.raises(KeyError):
+        shaper(RecommendResponse)({"recommendations": [], "summary": summary})
+
+
+def test_json_response_headers():
+    response = json_response(RecommendResponse, recommend_result(), headers={"X-Cache": "HIT"})
+    assert response.media_type == "application/json"
+    assert response.headers["x-cache"] == "HIT"
+    assert int(response.headers["content-length"]) == len(response.body)
@@ -0,0 +1,92 @@
+import json
+from pathlib import Path
+
+import pytest
+from sqlalchemy import select
+
+from app import database
+from app.ingest import ingest, main, parse_records
+from app.models import Category, CatalogVersion, Product
+
+PRODUCTS_CSV = Path(__file__).resolve().parents[2] / "data" / "products.csv"
+
+
+@pytest.fixture
+def seed():
+    return [Category(id=i, name=f"Category {i}") for i in range(1, 10)]
+
+
+def test_loads_catalog_csv_and_reloads_as_updates(db):
+    data = PRODUCTS_CSV.read_text()
+    first = ingest(db, parse_records(data, "csv"), batch_size=10)
+    assert first["errors"] == []
+    assert first["inserted"] == first["received"] == db.query(Product).count()
+
+    second = ingest(db, parse_records(data, "csv"), batch_size=7)
+    assert (second["inserted"], second["updated"]) == (0, first["received"])
+    assert db.query(Product).count() == first["received"]
+    oats = db.get(Product, 2)
+    assert float(oats.sugar) == 1.5 and oats.serving_size is not None
+
+
+def test_rows_without_id_upsert_by_name(db):
+    db.add(Product(id=5, name="Oats", category_id=1, price_per_unit=50))
+    db.commit()
+    lines = "\n".join(json.dumps(r) for r in [
+        {"name": "Oats", "category_id": 1, "price_per_unit": 45},
+        {"name": "Lentils", "category_id": 2, "price_per_unit": 120},
+    ])
+    report = ingest(db, parse_records(lines, "ndjson"))
+    assert (report["inserted"], report["updated"]) == (1, 1)
+    assert float(db.get(Product, 5).price_per_unit) == 45
+    assert db.scalar(select(Product.category_id).where(Product.name == "Lentils")) == 2
+
+
+def test_invalid_rows_reported_and_skipped(db):
+    lines = "\n".join([
+        json.dumps({"name": "Good", "category_id": 1, "price_per_unit": 10}),
+        json.dumps({"name": "No category", "category_id": 99}),
+        "{not json",
+        json.dumps({"category_id": 1, "price_per_unit": "cheap"}),
+        json.dumps({"id": "x", "name": "Bad id", "category_id": 1}),
+    ])
+    report = ingest(db, parse_records(lines, "ndjson"))
+    assert report["received"] == 5 and report["inserted"] == 1
+    assert [e["row"] for e in report["errors"]] == [2, 3, 4, 5]
+    assert "category_id" in report["errors"][0]["errors"][0]
+    assert {m.split(":")[0] for m in report["errors"][2]["errors"]} == {"name", "price_per_unit"}
+    assert db.query(Product).count() == 1
+
+
+def test_writes_bump_the_catalog_version(db):
+    def version():
+        return db.scalar(select(CatalogVersion.version))
+
+    ingest(db, parse_records(json.dumps({"name": "Bad", "category_id": 99}), "ndjson"))
+    assert version() is None  # nothing written
+    ingest(db, parse_records(json.dumps({"name": "Oats", "category_id": 1}), "ndjson"))
+    ingest(db, parse_records(json.dumps({"name": "Oats", "category_id": 2}), "ndjson"))
+    assert version() == 2
+
+
+def test_values_overflowing_their_columns_are_row_errors(db):
+    lines = "\n".join([
+        json.dumps({"name": "Fits", "category_id": 1, "price_per_unit": "99999999.99", "sugar": "9999.99"}),
+        json.dumps({"name": "Sugar", "category_id": 1, "sugar": "10000"}),
+        json.dumps({"name": "Rounds up", "category_id": 1, "fiber": "9999.995"}),
+        json.dumps({"name": "Price", "category_id": 1, "price_per_unit": "1e30"}),
+        json.dumps({"id": 2**31, "name": "Big id", "category_id": 1}),
+    ])
+    report = ingest(db, parse_records(lines, "ndjson"))
+    assert report["inserted"] == 1
+    assert [(e["row"], e["errors"][0].split(":")[0]) for e in report["errors"]] == [
+        (2, "sugar"), (3, "fiber"), (4, "price_per_unit"), (5, "id"),
+    ]
+
+
+def test_cli(db, tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(database, "SessionLocal", lambda: db)
+    path = tmp_path / "scrape.ndjson"
+    path.write_text(json.dumps({"name": "Tea", "category_id": 3}) + "\n")
+    assert main([str(path)]) == 0
+    assert json.loads(capsys.readouterr().out)["inserted"] == 1
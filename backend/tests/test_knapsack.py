@@ -0,0 +1,112 @@
+import pytest
+from app import knapsack
+from app.knapsack import allocate_budget_knapsack, budget_frontier, solve_budget_knapsack
+from app.lp_optimizer import allocate_budget_lp
+from app.recommendation import filter_products, get_recommendation, rank_products
+from tests.conftest import make_catalog, make_product
+
+
+def objective(allocations, ranked):
+    offset = abs(min(s for _, s in ranked)) + 1.0
+    return sum((a["score_raw"] + offset) * a["quantity"] for a in allocations)
+
+
+@pytest.mark.parametrize("condition,budget,household", [
+    (None, 500, 1), ("diabetic", 320.5, 2), ("hypertension", 1000, 3), ("weight_loss", 75, 1),
+])
+def test_matches_lp_optimum(condition, budget, household):
+    products = make_catalog()
+    ranked = rank_products(filter_products(products, condition), condition)
+    ks_alloc, ks_left = allocate_budget_knapsack(ranked, budget, household)
+    lp_alloc, _ = allocate_budget_lp(ranked, budget, household)
+    assert objective(ks_alloc, ranked) == pytest.approx(objective(lp_alloc, ranked))
+    spent = sum(a["subtotal"] for a in ks_alloc)
+    assert spent <= budget + 1e-9
+    assert ks_left == round(budget - spent, 2)
+    assert all(1 <= a["quantity"] <= household for a in ks_alloc)
+    assert all(isinstance(a["quantity"], int) for a in ks_alloc)
+
+
+def test_empty_and_zero_budget():
+    assert allocate_budget_knapsack([], budget=500) == ([], 500)
+    ranked = rank_products([make_product(price_per_unit=100)], None)
+    assert allocate_budget_knapsack(ranked, budget=0) == ([], 0.0)
+
+
+def test_nothing_affordable():
+    ranked = rank_products([make_product(price_per_unit=100)], None)
+    assert allocate_budget_knapsack(ranked, budget=50) == ([], 50)
+
+
+def test_category_constraints_use_cbc():
+    products = [
+        make_product(id=1, category_id=1, price_per_unit=50, sugar=1, fiber=8, protein=15),
+        make_product(id=2, category_id=2, price_per_unit=80, sugar=2, fiber=5, protein=10),
+        make_product(id=3, category_id=3, price_per_unit=70, sugar=3, fiber=4, protein=8),
+    ]
+    ranked = rank_products(products, "diabetic")
+    allocations, _ = allocate_budget_knapsack(ranked, 500, 1, min_categories=3)
+    assert len({a["category_id"] for a in allocations}) >= 3
+
+
+def test_oversized_table_falls_back_to_cbc(monkeypatch):
+    monkeypatch.setattr(knapsack, "KNAPSACK_MAX_CELLS", 1)
+    ranked = rank_products(make_catalog(), None)
+    ks_alloc, _ = allocate_budget_knapsack(ranked, 400, 1)
+    lp_alloc, _ = allocate_budget_lp(ranked, 400, 1)
+    assert objective(ks_alloc, ranked) == pytest.approx(objective(lp_alloc, ranked))
+
+
+def test_dp_stops_at_the_time_limit():
+    ranked = rank_products(make_catalog(), None)
+    allocations, remaining, status = solve_budget_knapsack(ranked, 500, time_limit=0)
+    assert (allocations, remaining, status) == ([], 500, None)
+    assert solve_budget_knapsack(ranked, 500, time_limit=5)[2] == "optimal"
+
+
+def test_dp_out_of_time_falls_back_to_greedy(monkeypatch):
+    monkeypatch.setattr(knapsack, "_solve", lambda *args: None)
+    result = get_recommendation(make_catalog(), None, 500, allocation_method="knapsack")
+    assert result["summary"]["allocation_method"] == "greedy"
+    assert result["summary"]["solver_status"] == "fallback"
+    assert result["recommendations"]
+
+
+def test_selectable_in_pipeline():
+    result = get_recommendation(make_catalog(), "diabetic", 500, allocation_method="knapsack")
+    assert result["summary"]["allocation_method"] == "knapsack"
+    assert result["summary"]["total_spent"] <= 500
+
+
+def test_frontier_matches_individual_solves():
+    products = make_catalog()
+    ranked = rank_products(products, None)
+    budgets = [600, 80, 250.5, 0, 1000]
+    frontier = budget_frontier(ranked, budgets, household_size=2)
+    objectives = [objective for _, _, objective in frontier["points"]]
+    for budget, (allocations, remaining, value) in zip(budgets, frontier["points"]):
+        single, single_left = allocate_budget_knapsack(ranked, budget, 2)
+        assert allocations == single
+        assert remaining == single_left
+        if allocations:
+            assert value == pytest.approx(objective(allocations, ranked))
+    assert objectives[1] <= objectives[2] <= objectives[0] <= objectives[4]
+
+
+def test_frontier_breakpoints_are_increasing():
+    ranked = rank_products(make_catalog(), "diabetic")
+    breakpoints = budget_frontier(ranked, [500])["breakpoints"]
+    assert breakpoints
+    budgets = [b for b, _ in breakpoints]
+    values = [v for _, v in breakpoints]
+    assert budgets == sorted(budgets) and budgets[-1] <= 500
+    assert all(a < b for a, b in zip(values, values[1:]))
+
+
+def test_frontier_without_dp_uses_cbc(monkeypatch):
+    monkeypatch.setattr(knapsack, "KNAPSACK_MAX_CELLS", 1)
+    ranked = rank_products(make_catalog(), None)
+    frontier = budget_frontier(ranked, [200, 400])
+    assert frontier["breakpoints"] == []
+    assert all(sum(a["subtotal"] for a in allocs) <= b
+               for b, (allocs, _, _) in zip([200, 400], frontier["points"]))
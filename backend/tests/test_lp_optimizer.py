@@ -1,7 +1,10 @@
 import pytest
-from app.lp_optimizer import allocate_budget_lp
-from app.recommendation import rank_products
-from tests.conftest import make_product
+from types import SimpleNamespace
+from app import lp_optimizer, recommendation
+from app.metrics import StageTimer
+from app.lp_optimizer import BudgetModel, _solver_status, allocate_budget_lp, solve_budget_lp
+from app.recommendation import filter_products, get_recommendation, rank_products
+from tests.conftest import make_catalog, make_product
 
 class TestLPBasics:
     """Core LP allocation behavior."""
@@ -113,3 +116,139 @@ class TestLPDiversity:
         )
         # Should still return something (fallback to no diversity)
         assert len(allocations) > 0
+
+class TestBudgetModel:
+    """Reusable model gives the same optimum as a freshly built problem."""
+
+    @staticmethod
+    def objective(allocations, ranked):
+        offset = abs(min(s for _, s in ranked)) + 1.0
+        return sum((a["score_raw"] + offset) * a["quantity"] for a in allocations)
+
+    def test_reuse_matches_fresh_solve(self):
+        products = make_catalog(40)
+        model = BudgetModel(products)
+        for condition, budget, household in [
+            ("diabetic", 400, 1), (None, 900, 2), ("hypertension", 250, 3), ("diabetic", 600, 1),
+        ]:
+            ranked = rank_products(filter_products(products, condition), condition)
+            fresh, fresh_left = allocate_budget_lp(ranked, budget, household)
+            reused, reused_left = allocate_budget_lp(ranked, budget, household, model=model)
+            assert self.objective(reused, ranked) == pytest.approx(self.objective(fresh, ranked))
+            assert sum(a["subtotal"] for a in reused) <= budget
+            assert round(budget - sum(a["subtotal"] for a in reused), 2) == reused_left
+
+    def test_filtered_out_products_are_not_bought(self):
+        products = make_catalog(40)
+        model = BudgetModel(products)
+        allocate_budget_lp(rank_products(products, None), 2000, 3, model=model)
+        ranked = rank_products(products[:5], None)
+        allocations, _ = allocate_budget_lp(ranked, 2000, 1, model=model)
+        assert {a["id"] for a in allocations} <= {p.id for p in products[:5]}
+        assert all(a["quantity"] <= 1 for a in allocations)
+
+    def test_applied_edits_match_fresh_model(self):
+        products = make_catalog(40)
+        model = BudgetModel(products)
+        allocate_budget_lp(rank_products(products, None), 900, 2, model=model)
+
+        cheaper = make_product(**{**vars(products[3]), "price_per_unit": 5})
+        added = make_product(id=100, name="New", price_per_unit=30, fiber=9, protein=12)
+        with model.lock:
+            model.apply(upserts=[cheaper, added], deletes=[products[7].id, products[8].id])
+        edited = [cheaper if p is products[3] else p for p in products
+                  if p.id not in (products[7].id, products[8].id)] + [added]
+
+        ranked = rank_products(edited, None)
+        fresh, _ = allocate_budget_lp(ranked, 900, 2)
+        reused, _ = allocate_budget_lp(ranked, 900, 2, model=model)
+        assert self.objective(reused, ranked) == pytest.approx(self.objective(fresh, ranked))
+        assert sum(a["subtotal"] for a in reused) <= 900
+        assert len(model) == len(edited)
+
+    def test_diversity_constraints_bypass_model(self):
+        products = [
+            make_product(id=1, category_id=1, price_per_unit=50, sugar=1, fiber=8, protein=15),
+            make_product(id=2, category_id=2, price_per_unit=80, sugar=2, fiber=5, protein=10),
+            make_product(id=3, category_id=3, price_per_unit=70, sugar=3, fiber=4, protein=8),
+        ]
+        ranked = rank_products(products, "diabetic")
+        allocations, _ = allocate_budget_lp(
+            ranked, 500, 1, min_categories=3, model=BudgetModel(products),
+        )
+        assert len({a["category_id"] for a in allocations}) >= 3
+
+class TestSolverStatus:
+    """Time limits and the greedy fallback."""
+
+    @staticmethod
+    def products():
+        return [
+            make_product(id=i, name=f"P{i}", price_per_unit=40 + i * 10,
+                         sugar=1, fiber=i % 5, protein=i % 7)
+            for i in range(10)
+        ]
+
+    def test_status_mapping(self):
+        assert _solver_status(SimpleNamespace(sol_status=1)) == "optimal"
+        assert _solver_status(SimpleNamespace(sol_status=2)) == "time_limited"
+        assert _solver_status(SimpleNamespace(sol_status=0)) is None
+        assert _solver_status(SimpleNamespace(sol_status=-1)) is None
+
+    def test_small_problem_is_optimal(self):
+        ranked = rank_products(self.products(), None)
+        allocations, _, status = solve_budget_lp(ranked, budget=300, time_limit=5)
+        assert status == "optimal"
+        assert allocations
+
+    def test_pipeline_reports_status(self):
+        result = get_recommendation(self.products(), None, 300)
+        assert result["summary"]["allocation_method"] == "lp"
+        assert result["summary"]["solver_status"] == "optimal"
+
+    def test_no_solution_falls_back_to_greedy(self, monkeypatch):
+        monkeypatch.setattr(
+            recommendation, "solve_budget_lp",
+            lambda ranked, budget, *a, **k: ([], round(budget, 2), None),
+        )
+        result = get_recommendation(self.products(), None, 300)
+        assert result["summary"]["allocation_method"] == "greedy"
+        assert result["summary"]["solver_status"] == "fallback"
+        assert result["recommendations"]
+
+    def test_exhausted_latency_budget_skips_solver(self):
+        result = get_recommendation(self.products(), None, 300, time_limit=1e-9)
+        assert result["summary"]["solver_status"] == "fallback"
+        assert result["recommendations"]
+
+    def test_build_time_comes_out_of_the_limit(self):
+        products = self.products()
+        ranked = rank_products(products, None)
+        allocations, _, status = solve_budget_lp(ranked, budget=300, time_limit=1e-9)
+        assert status is None and allocations == []
+        model = BudgetModel(products)
+        _, _, status = solve_budget_lp(ranked, budget=300, model=model, time_limit=1e-9)
+        assert status is None
+
+    def test_latency_budget_counts_from_timer_start(self):
+        timer = StageTimer()
+        timer.started -= 10  # e.g. a slow catalog load earlier in the request
+        result = get_recommendation(self.products(), None, 300, time_limit=5, timer=timer)
+        assert result["summary"]["solver_status"] == "fallback"
+        assert result["recommendations"]
+
+    def test_expected_overhead_comes_out_of_the_limit(self, monkeypatch):
+        # e.g. a large model whose MPS file alone takes longer than the limit
+        monkeypatch.setattr(lp_optimizer, "_overhead_per_column", 1.0)
+        ranked = rank_products(self.products(), None)
+        _, _, status = solve_budget_lp(ranked, budget=300, time_limit=5)
+        assert status is None
+
+    def test_overhead_is_learned_from_solves(self, monkeypatch):
+        monkeypatch.setattr(lp_optimizer, "_overhead_per_column", 0.0)
+        lp_optimizer._record_overhead(StageTimer(), 1.5, 1.0, 100, "time_limited")
+        assert lp_optimizer._overhead_per_column == pytest.approx(0.005)
+        assert lp_optimizer._cbc_time_limit(1.0, 100) == pytest.approx(0.5)
+        # a solve finishing early caps it
+        lp_optimizer._record_overhead(StageTimer(), 0.2, 1.0, 100, "optimal")
+        assert lp_optimizer._overhead_per_column == pytest.approx(0.002)
@@ -0,0 +1,81 @@
+import pytest
+
+from app import metrics
+from app.lp_optimizer import BudgetModel, solve_budget_lp
+from app.metrics import Counter, Histogram, StageTimer, server_timing
+from app.recommendation import get_recommendation, rank_products
+from tests.conftest import make_product
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """Metrics created in a test don't leak into the app's registry."""
+    monkeypatch.setattr(metrics, "_registry", [])
+    monkeypatch.setattr(metrics, "_collectors", [])
+
+
+def products():
+    return [
+        make_product(id=i, name=f"P{i}", price_per_unit=20 + 10 * i, sugar=i, protein=10 - i)
+        for i in range(1, 6)
+    ]
+
+
+def test_histogram_buckets_are_cumulative(registry):
+    h = Histogram("latency_seconds", "Latency.", labels=("stage",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        h.observe(value, stage="solve")
+    assert h.count(stage="solve") == 4
+    assert metrics.render().splitlines()[2:] == [
+        'latency_seconds_bucket{stage="solve",le="0.1"} 1',
+        'latency_seconds_bucket{stage="solve",le="1"} 3',
+        'latency_seconds_bucket{stage="solve",le="+Inf"} 4',
+        'latency_seconds_sum{stage="solve"} 4.05',
+        'latency_seconds_count{stage="solve"} 4',
+    ]
+
+
+def test_counter_and_collectors_render(registry):
+    c = Counter("solves_total", "Solves.", labels=("method", "status"))
+    c.inc(method="lp", status="optimal")
+    c.inc(method="lp", status="optimal")
+    metrics.on_collect(lambda: [
+        ("cache_hit_ratio", "gauge", "Hit ratio.", 0.25),
+        ("pool_jobs", "gauge", "Jobs.", {(("state", "queued"),): 3}),
+    ])
+    text = metrics.render()
+    assert 'solves_total{method="lp",status="optimal"} 2' in text
+    assert "# TYPE cache_hit_ratio gauge\ncache_hit_ratio 0.25" in text
+    assert 'pool_jobs{state="queued"} 3' in text
+
+
+def test_stage_timer_and_server_timing():
+    timer = StageTimer()
+    with timer.stage("rank"):
+        pass
+    timer.update({"solve": 12.5, "rank": 1.0})
+    stages = timer.as_ms()
+    assert set(stages) == {"rank", "solve"}
+    assert stages["solve"] == 12.5 and stages["rank"] >= 1.0
+    assert server_timing({"db": 0.4, "solve": 12.5}) == "db;dur=0.4, solve;dur=12.5"
+
+
+@pytest.mark.parametrize("method,stages", [
+    ("greedy", {"filter", "allocate"}),
+    ("knapsack", {"filter", "rank", "solve"}),
+    ("lp", {"filter", "rank", "model", "solve"}),
+])
+def test_get_recommendation_records_stages(method, stages):
+    timer = StageTimer()
+    result = get_recommendation(products(), None, 100, allocation_method=method, timer=timer)
+    assert result["recommendations"]
+    assert set(timer.seconds) == stages
+    assert "timings_ms" not in result["summary"]
+
+
+def test_lp_model_and_fresh_problem_both_timed():
+    ranked = rank_products(products(), None)
+    for model in (None, BudgetModel([p for p, _ in ranked])):
+        timer = StageTimer()
+        solve_budget_lp(ranked, 100, model=model, timer=timer)
+        assert set(timer.seconds) == {"model", "solve"}
@@ -0,0 +1,42 @@
+import pytest
+
+from app.catalog import load_products
+from app.models import Category, Product
+from app.queries import health_filter_clause
+from app.recommendation import filter_products
+
+
+@pytest.fixture
+def seed():
+    rows = [
+        dict(sugar=1, calories=120, sodium=50, fat=2, saturated_fat=1),
+        dict(sugar=15, calories=150, sodium=300, fat=6, saturated_fat=4),
+        dict(sugar=5, calories=200, sodium=200, fat=5, saturated_fat=3),  # on every limit
+        dict(sugar=2, calories=300, sodium=500, fat=1, saturated_fat=0.5),
+        dict(sugar=None, calories=None, sodium=None, fat=None, saturated_fat=None),
+        dict(sugar=7.5, calories=140, sodium=None, fat=8, saturated_fat=2),
+    ]
+    return [Category(id=1, name="Snacks")] + [
+        Product(id=i, name=f"P{i}", category_id=1, price_per_unit=50, **row)
+        for i, row in enumerate(rows, start=1)
+    ]
+
+
+@pytest.mark.parametrize("condition", ["diabetic", "hypertension", "weight_loss", None])
+def test_sql_filter_matches_python(db, condition):
+    in_sql = load_products(db, condition)
+    in_python = filter_products(db.query(Product).all(), condition)
+    assert sorted(p.id for p in in_sql) == sorted(p.id for p in in_python)
+
+
+def test_missing_data_passes(db):
+    assert 5 in {p.id for p in load_products(db, "diabetic")}
+
+
+def test_category_names_attached(db):
+    assert {p.category_name for p in load_products(db, "hypertension")} == {"Snacks"}
+
+
+def test_no_clause_without_known_condition():
+    assert health_filter_clause(None) is None
+    assert health_filter_clause("unknown") is None
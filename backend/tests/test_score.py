@@ -44,4 +44,67 @@ def test_default_weights_used_when_no_condition(sample_products):
     # Both should use DEFAULT_WEIGHTS → same order
     names_none = [p.name for p, _ in ranked_none]
     names_unknown = [p.name for p, _ in ranked_unknown]
-    assert names_none == names_unknown
\ No newline at end of file
+    assert names_none == names_unknown
+
+def test_precomputed_rankings_match_per_request_ranking(sample_products):
+    from app.columnar import ProductColumns
+    from app.recommendation import SCORING_WEIGHTS, filter_products, precompute_rankings
+
+    columns = ProductColumns(sample_products)
+    precompute_rankings(columns)
+    for condition in (*SCORING_WEIGHTS, None):
+        ranking = columns.memo[("ranking", condition)]
+        expected = rank_products(filter_products(sample_products, condition), condition)
+        assert list(ranking.lazy()) == expected
+        assert ranking.ranked() == expected
+
+
+def test_recommendations_read_precomputed_rankings(sample_products, monkeypatch):
+    from app.columnar import ProductColumns
+    from app.recommendation import get_recommendation, precompute_rankings
+
+    products = [make_product(**{**vars(p), "price_per_unit": 40 + 15 * i})
+                for i, p in enumerate(sample_products)]
+    columns = ProductColumns(products)
+    expected = get_recommendation(products, "diabetic", 500, use_lp=False)
+    precompute_rankings(columns)
+
+    def no_scoring(*args, **kwargs):
+        raise AssertionError("scored again")
+
+    monkeypatch.setattr(columns, "scores", no_scoring)
+    monkeypatch.setattr(columns, "mask", no_scoring)
+    for method in ("greedy", "knapsack", "lp"):
+        result = get_recommendation(columns, "diabetic", 500, allocation_method=method)
+        assert result["summary"]["products_after_filter"] == expected["summary"]["products_after_filter"]
+    greedy = get_recommendation(columns, "diabetic", 500, use_lp=False)
+    assert greedy["recommendations"] == expected["recommendations"]
+
+
+def test_edited_rankings_match_a_fresh_sort():
+    import numpy as np
+
+    from app.columnar import ProductColumns
+    from app.queries import ProductRow
+    from app.recommendation import SCORING_WEIGHTS, apply_rankings, precompute_rankings
+    from tests.conftest import make_rows
+
+    rows = make_rows(2000, seed=5)
+    columns = ProductColumns(rows)
+    precompute_rankings(columns)
+    tied = rows[10]  # same nutrients as another row: lands among equal scores
+    upserts = [
+        ProductRow(rows[7].id, "Edited", 1, "C", 10.0, 50.0, 0.5, 10.0, 30.0, 1.0, 0.2, 8.0),
+        ProductRow(99999, "New", 1, "C", 12.0, *(getattr(tied, f) for f in ProductRow.__slots__[5:12])),
+    ]
+    deletes = [rows[3].id, rows[1500].id]
+    edited = columns.apply(upserts, deletes)
+    apply_rankings(columns, edited, upserts, deletes)
+
+    fresh = ProductColumns(edited.products)
+    precompute_rankings(fresh)
+    for condition in (*SCORING_WEIGHTS, None):
+        merged = edited.memo[("ranking", condition)]._order
+        expected = fresh.memo[("ranking", condition)]._order
+        np.testing.assert_array_equal(merged[0], expected[0])
+        np.testing.assert_array_equal(merged[1], expected[1])
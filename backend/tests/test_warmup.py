@@ -0,0 +1,89 @@
+import os
+import subprocess
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import lp_optimizer, warmup
+from app.catalog import get_catalog, invalidate_catalog
+from app.main import app
+from app.models import Category, Product
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    monkeypatch.setattr(warmup, "_state", {"status": "disabled", "attempts": 0})
+    invalidate_catalog()
+    yield
+    invalidate_catalog()
+
+
+@pytest.fixture
+def seed():
+    return [
+        Category(id=1, name="Breakfast"),
+        Product(id=1, name="Oats", category_id=1, price_per_unit=50, protein=10),
+        Product(id=2, name="Bar", category_id=1, price_per_unit=30, protein=12),
+    ]
+
+
+def test_warm_up_preloads_catalog_and_solver(session_factory):
+    state = warmup.warm_up(session_factory)
+    assert state["ready"] and state["status"] == "ready"
+    assert state["products"] == 2
+    assert set(state["timings_ms"]) == {"db", "columns", "model", "solve"}
+
+    queries = session_factory.queries
+    with session_factory() as db:
+        snapshot = get_catalog(db)
+    assert session_factory.queries == queries  # served from the warm snapshot
+    assert snapshot.version == state["catalog_version"]
+    assert snapshot._columns is not None
+    assert lp_optimizer._cbc_available is not None  # PuLP imported, CBC probed
+    assert snapshot._lp_model is None  # LP_SHARED_MODEL is off
+
+
+def test_ready_endpoint_reflects_warm_up():
+    client = TestClient(app)
+    assert client.get("/ready").status_code == 200  # warm-up disabled
+
+    warmup._state.update(status="warming_up", error="connection refused")
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json()["ready"] is False
+
+    warmup._state.update(status="ready", seconds=0.5)
+    assert client.get("/ready").json()["ready"] is True
+    assert "nutrikart_warmup_seconds 0.5" in client.get("/metrics").text
+
+
+def test_app_imports_without_database_or_pulp():
+    env = {k: v for k, v in os.environ.items() if k != "DATABASE_URL"}
+    code = (
+        "import sys, app.main\n"
+        "from app import database\n"
+        "assert database._engine is None\n"
+        "assert 'pulp' not in sys.modules\n"
+    )
+    result = subprocess.run([sys.executable, "-c", code], env=env, cwd=os.getcwd(),
+                            capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+
+
+def test_cbc_probe_runs_once(monkeypatch):
+    calls = []
+
+    class Probe:
+        def __init__(self, **kwargs):
+            pass
+
+        def available(self):
+            calls.append(1)
+            return False
+
+    monkeypatch.setattr(lp_optimizer, "_cbc_available", None)
+    monkeypatch.setattr(lp_optimizer.pulp, "PULP_CBC_CMD", Probe)
+    assert not lp_optimizer.cbc_available()
+    assert not lp_optimizer.cbc_available()
+    assert len(calls) == 1
@@ -0,0 +1,161 @@
+import threading
+from concurrent.futures import Future
+from types import SimpleNamespace
+
+import pytest
+
+from app.catalog import get_catalog, invalidate_catalog, record_change
+from app.metrics import StageTimer
+from app.models import Category, Product
+from app.queries import ProductRow
+from app.recommendation import get_recommendation
+from app.workers import PoolBusy, RecommendPool
+from tests.conftest import make_catalog
+
+
+def catalog(version=1):
+    return SimpleNamespace(version=version, products=make_catalog(20))
+
+
+@pytest.fixture(autouse=True)
+def fresh_catalog():
+    invalidate_catalog()
+    yield
+    invalidate_catalog()
+
+
+@pytest.fixture
+def seed():
+    return [Category(id=1, name="Breakfast")] + [
+        Product(id=i, name=f"P{i}", category_id=1, price_per_unit=20 + i, protein=i % 7, sugar=i % 3)
+        for i in range(1, 41)
+    ]
+
+
+@pytest.fixture
+def pool():
+    pool = RecommendPool(workers=1, queue_size=2)
+    yield pool
+    pool.shutdown()
+
+
+def test_worker_result_matches_in_process(pool):
+    cat = catalog()
+    options = dict(health_condition="diabetic", budget=400, household_size=2, use_lp=True)
+    assert pool.run(cat, **options) == get_recommendation(cat.products, **options)
+
+
+def test_new_catalog_version_gets_new_workers(pool):
+    pool.run(catalog(1), health_condition=None, budget=200, use_lp=False)
+    updated = catalog(2)
+    updated.products = updated.products[:3]
+    result = pool.run(updated, health_condition=None, budget=200, use_lp=False)
+    assert result["summary"]["products_considered"] == 3
+
+
+@pytest.mark.parametrize("options, shared", [
+    (dict(use_lp=False, allocation_method="lp"), True),
+    (dict(use_lp=True), True),
+    (dict(use_lp=True, allocation_method="knapsack"), False),
+    (dict(use_lp=False), False),
+])
+def test_worker_picks_the_lp_model_like_the_route(options, shared, monkeypatch):
+    import time
+
+    from app import workers
+
+    monkeypatch.setattr(workers, "LP_SHARED_MODEL", True)
+    monkeypatch.setattr(workers, "_worker_state", {})
+    workers._init_worker(1, make_catalog(20))
+    workers._recommend(1, (), dict(health_condition=None, budget=200, **options), time.time())
+    assert (workers._worker_state["lp_model"] is not None) == shared
+
+
+def test_recorded_changes_are_replayed_in_the_same_workers(pool, db):
+    options = dict(health_condition="diabetic", budget=300, household_size=2, use_lp=True)
+    pool.run(get_catalog(db), **options)
+    executor = pool._executor
+
+    record_change(upserts=[ProductRow(41, "Lentils", 1, "Breakfast", 25.0, protein=24.0)])
+    record_change(upserts=[ProductRow(3, "P3", 1, "Breakfast", 23.0, sugar=9.0)], deletes=[5])
+    current = get_catalog(db)
+    result = pool.run(current, **options)
+    assert pool._executor is executor
+    assert result == get_recommendation(current.columns, **options)
+    assert "Lentils" in {r["name"] for r in result["recommendations"]}
+
+    invalidate_catalog()  # a reload can't be replayed
+    pool.run(get_catalog(db), **options)
+    assert pool._executor is not executor
+
+
+def test_mapped_catalog_matches_in_process(pool, tmp_path):
+    from app.catalog import CatalogSnapshot
+    from app.catalog_file import write_catalog_file
+    from app.queries import ProductRow
+
+    rows = [
+        ProductRow(p.id, p.name, p.category_id, "Snacks", float(p.price_per_unit), *(
+            float(getattr(p, field)) for field in ProductRow.__slots__[5:12]
+        ))
+        for p in catalog().products
+    ]
+    snapshot = CatalogSnapshot.from_file(3, write_catalog_file(str(tmp_path / "catalog.bin"), rows))
+    options = dict(health_condition="diabetic", budget=400, household_size=2, use_lp=True)
+    assert pool.run(snapshot, **options) == get_recommendation(rows, **options)
+
+
+def test_mapped_catalog_with_a_delta_matches_in_process(pool, tmp_path):
+    from app.catalog import CatalogSnapshot
+    from app.catalog_file import CatalogDelta, write_catalog_file
+    from app.queries import ProductRow
+
+    rows = [ProductRow(p.id, p.name, p.category_id, "Snacks", float(p.price_per_unit))
+            for p in catalog().products]
+    mapped = write_catalog_file(str(tmp_path / "catalog.bin"), rows)
+    delta = CatalogDelta(mapped.file_id).add(
+        upserts=[ProductRow(41, "Lentils", 1, "Snacks", 25.0, protein=24.0)], deletes=[rows[0].id],
+    )
+    snapshot = CatalogSnapshot.from_file(3, mapped, delta)
+    options = dict(health_condition=None, budget=400, household_size=2, use_lp=True)
+    result = pool.run(snapshot, **options)
+    assert result == get_recommendation(snapshot.columns, **options)
+    assert "Lentils" in {r["name"] for r in result["recommendations"]}
+
+
+def test_time_before_submission_counts_against_the_limit(pool):
+    timer = StageTimer()
+    timer.started -= 10
+    result = pool.run(catalog(), timer=timer, health_condition=None, budget=400, time_limit=5)
+    assert result["summary"]["solver_status"] == "fallback"
+
+
+def test_full_queue_rejects():
+    pool = RecommendPool(workers=1, queue_size=1)
+    submitted, job = threading.Event(), Future()
+
+    def submit(*args):
+        submitted.set()
+        return job
+
+    # a job that stays in flight until the test finishes it
+    pool._executor_for = lambda catalog: (SimpleNamespace(submit=submit), ())
+    running = threading.Thread(
+        target=pool.run, args=(catalog(),), kwargs=dict(health_condition=None, budget=200)
+    )
+    running.start()
+    assert submitted.wait(5)
+    with pytest.raises(PoolBusy):
+        pool.run(catalog(), health_condition=None, budget=200)
+    job.set_result(({}, {}))
+    running.join()
+    assert pool.run(catalog(), health_condition=None, budget=200) == {}
+
+
+def test_zero_queue_size_is_unbounded():
+    pool = RecommendPool(workers=1, queue_size=0)
+    try:
+        result = pool.run(catalog(), health_condition=None, budget=200, use_lp=False)
+    finally:
+        pool.shutdown()
+    assert result["recommendations"]